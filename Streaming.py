@@ -1,14 +1,15 @@
 import asyncio
 import threading
-import aiohttp
-from streaming_conversation import StreamingConversation
-from base_transcriber import BaseTranscriber, TranscriberConfig
+from http_session import KeepAliveSession
+from streaming_conversation import InterruptibleEvent, StreamingConversation
+from base_transcriber import BaseTranscriber, EndpointingConfig, TranscriberConfig
 from lemonfox_synthesizer import LemonFoxSynthesizer, LemonFoxSynthesizerConfig
 from chat_gpt_agent import ChatGPTAgent, ChatGPTAgentConfig
 from default_factory import DefaultAgentFactory
 from audio_pipeline import create_microphone_input_and_speaker_output
-from whisper_transcriber import WhisperTranscriber, WhisperTranscriberConfig
-from conversation_state_manager import ConversationStateManager
+from groq_transcriber import WhisperTranscriber, WhisperTranscriberConfig
+from provider_routing import RoutingTranscriber
+from state_manager import ConversationStateManager
 
 # Custom Grok Transcriber
 class GrokTranscriber(BaseTranscriber):
@@ -18,6 +19,7 @@ class GrokTranscriber(BaseTranscriber):
         self.endpoint = "https://api.x.ai/stt"  # Replace with actual Grok STT endpoint
         self.is_speech = False
         self.is_running = False
+        self.http_session = KeepAliveSession()
 
     async def start(self):
         self.is_running = True
@@ -26,33 +28,39 @@ class GrokTranscriber(BaseTranscriber):
     async def process(self, audio_chunk):
         if not self.is_running:
             return None
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                self.endpoint,
-                headers={"Authorization": f"Bearer {self.api_key}"},
-                data=audio_chunk
-            ) as response:
-                result = await response.json()
-                transcription = result.get("transcription", "")
-                self.is_speech = result.get("is_speech", len(transcription) > 0)
-                if self.is_speech and transcription:
-                    return {"message": transcription, "is_final": True, "is_interrupt": self.is_speech}
-                return None
+        result = await self._post_audio(audio_chunk)
+        transcription = result.get("transcription", "")
+        self.is_speech = result.get("is_speech", len(transcription) > 0)
+        if self.is_speech and transcription:
+            return {"message": transcription, "is_final": True, "is_interrupt": self.is_speech}
+        return None
+
+    async def transcribe_audio(self, audio):
+        result = await self._post_audio(audio)
+        return result.get("transcription", "")
+
+    async def _post_audio(self, audio):
+        async with self.http_session.get().post(
+            self.endpoint,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            data=audio
+        ) as response:
+            if response.status != 200:
+                error = await response.text()
+                raise Exception(f"Grok STT API error: {response.status} - {error}")
+            return await response.json()
+
+    async def prewarm(self):
+        await self.http_session.prewarm(self.endpoint)
 
     async def stop(self):
         self.is_running = False
+        await self.http_session.close()
         print("GrokTranscriber stopped")
 
     async def terminate(self):
         await self.stop()  # Align with BaseTranscriber interface
 
-# Simplified Configurations
-class EndpointingConfig:
-    def __init__(self, min_speech_duration=0.3, min_silence_duration=0.5, sensitivity=0.8):
-        self.min_speech_duration = min_speech_duration
-        self.min_silence_duration = min_silence_duration
-        self.sensitivity = sensitivity
-
 async def main():
     # Audio input/output
     microphone_input, speaker_output = create_microphone_input_and_speaker_output(use_default_devices=True)
@@ -60,25 +68,27 @@ async def main():
     # Configure endpointing for interruption detection
     endpointing_config = EndpointingConfig()
 
-    # Initialize transcriber (toggle between Grok and Whisper)
-    use_whisper = True  # Set to False to use Grok STT
-    if use_whisper:
-        transcriber = WhisperTranscriber(
-            transcriber_config=WhisperTranscriberConfig(
-                api_key="your_openai_api_key",
-                endpointing_config=endpointing_config
-            )
-        )
-    else:
-        transcriber = GrokTranscriber(
-            config=TranscriberConfig(endpointing_config=endpointing_config),
-            api_key="your_grok_api_key"
-        )
+    # Route each utterance to whichever of Whisper and Grok is currently fastest and healthy
+    transcriber = RoutingTranscriber(
+        config=TranscriberConfig(endpointing_config=endpointing_config),
+        transcribers={
+            "whisper": WhisperTranscriber(
+                transcriber_config=WhisperTranscriberConfig(
+                    api_key="your_openai_api_key",
+                    endpointing_config=endpointing_config
+                )
+            ),
+            "grok": GrokTranscriber(
+                config=TranscriberConfig(endpointing_config=endpointing_config),
+                api_key="your_grok_api_key"
+            ),
+        },
+        race_below_seconds=1.5,
+    )
 
     agent_config = ChatGPTAgentConfig(model_name="gpt-4", max_tokens=500, temperature=0.7)
     factory = DefaultAgentFactory()
-    agent = factory.create_agent(agent_config)
-    agent.openai_api_key = "your_openai_api_key"
+    agent = factory.create_agent(agent_config, openai_api_key="your_openai_api_key")
 
     synthesizer = LemonFoxSynthesizer(
         synthesizer_config=LemonFoxSynthesizerConfig(
@@ -92,20 +102,47 @@ async def main():
         output_device=speaker_output,
         transcriber=transcriber,
         agent=agent,
-        synthesizer=synthesizer
+        synthesizer=synthesizer,
+        component_factory=factory,
     )
     state_manager = ConversationStateManager(conversation)
     agent.agent_responses_consumer = conversation  # Link agent to conversation for response handling
 
+    negotiated = conversation.negotiate_audio_formats(microphone_input.audio_formats)
+    print(f"Using {negotiated.wire_format} with {negotiated.num_conversions()} conversion(s)")
+    conversation.enable_barge_in()
+
     # Start the conversation
     await conversation.start()
     print(f"Conversation started. ID: {conversation.id}. Initial transcript: {state_manager.transcript}")
 
     # Simple loop to handle interruptions
     stop_event = threading.Event()
+    response_task = None
+
+    async def respond(agent_input):
+        synthesis_result = await agent.process(InterruptibleEvent(payload=agent_input))
+        if synthesis_result and conversation.synthesis_enabled:
+            success, _ = await conversation.send_speech_to_output(
+                synthesis_result.message,
+                synthesis_result,
+                stop_event
+            )
+            if not success:
+                print("Speech interrupted")
+
+    async def stop_response(task):
+        """Cancels a reply that is still running and reports any error it raised."""
+        if task is None:
+            return
+        task.cancel()
+        result, = await asyncio.gather(task, return_exceptions=True)
+        if isinstance(result, Exception):
+            print(f"Response failed: {result}")
+
     while conversation.is_active():
         audio_chunk = await microphone_input.read()
-        transcription_result = await transcriber.process(audio_chunk)
+        transcription_result = await conversation.process_input_audio(audio_chunk)
         if transcription_result:
             transcription = type('Transcription', (), transcription_result)  # Dynamic class for compatibility
             conversation.transcript += f" {transcription_result['message']}"  # Update transcript
@@ -123,18 +160,14 @@ async def main():
                         self.conversation_id = conversation_id
                         self.is_interrupt = transcription_result.get("is_interrupt", False)
                 agent_input = AgentInput(transcription, conversation.id)
-                synthesis_result = await agent.process(InterruptibleEvent(payload=agent_input))
-                if synthesis_result and conversation.synthesis_enabled:
-                    success, _ = await conversation.send_speech_to_output(
-                        synthesis_result.message,
-                        synthesis_result,
-                        stop_event
-                    )
-                    if not success:
-                        print("Speech interrupted")
+                # A new turn supersedes the previous reply, so two replies never overlap
+                await stop_response(response_task)
+                # Responding runs alongside the mic loop so barge-in is still detected while the agent speaks
+                response_task = asyncio.create_task(respond(agent_input))
 
         await asyncio.sleep(0.1)
 
+    await stop_response(response_task)
     await conversation.terminate()
 
 if __name__ == "__main__":
@@ -4,7 +4,7 @@ import random
 import secrets
 import wave
 from string import ascii_letters, digits
-from typing import Any, AsyncGenerator, AsyncIterator, Callable, List, Tuple, TypeVar
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, List, Optional, Tuple, TypeVar
 
 from vocode.streaming.models.audio import AudioEncoding
 
@@ -144,3 +144,183 @@ async def enumerate_async_iter(
     async for item in async_iter:
         yield i, item
         i += 1
+
+
+class _StreamEnd:
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+async def _pump_into_queue(
+    async_iter: AsyncIterator[AsyncIteratorGenericType],
+    queue: asyncio.Queue,
+):
+    error = None
+    try:
+        async for item in async_iter:
+            await queue.put(item)  # blocks while the consumer is behind
+    except Exception as e:
+        error = e
+    await queue.put(_StreamEnd(error))
+
+
+async def generate_from_queue(
+    queue: asyncio.Queue,
+    sentinel: Any = None,
+) -> AsyncGenerator[Any, None]:
+    """Yield items from `queue` until `sentinel` is received."""
+    while True:
+        item = await queue.get()
+        if item is sentinel:
+            return
+        yield item
+
+
+async def batch_async_iter(
+    async_iter: AsyncIterator[AsyncIteratorGenericType],
+    max_size: int,
+    max_delay: float,
+) -> AsyncGenerator[List[AsyncIteratorGenericType], None]:
+    """Yield lists of up to `max_size` items, flushing early `max_delay` seconds after a batch's first item.
+
+    At most `max_size` items are read ahead of the consumer.
+    """
+    assert max_size > 0
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+    pump = asyncio.create_task(_pump_into_queue(async_iter, queue))
+    try:
+        end: Optional[_StreamEnd] = None
+        while end is None:
+            item = await queue.get()
+            if isinstance(item, _StreamEnd):
+                end = item
+                break
+            batch = [item]
+            deadline = loop.time() + max_delay
+            while len(batch) < max_size:
+                if queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    # Avoid wait_for's per-call task when items are already buffered
+                    item = queue.get_nowait()
+                if isinstance(item, _StreamEnd):
+                    end = item
+                    break
+                batch.append(item)
+            yield batch
+        if end.error:
+            raise end.error
+    finally:
+        pump.cancel()
+
+
+async def merge_async_iters(
+    *async_iters: AsyncIterator[AsyncIteratorGenericType],
+    max_buffered: int = 1,
+) -> AsyncGenerator[AsyncIteratorGenericType, None]:
+    """Fan-in: yield items from all iterators as they arrive.
+
+    At most `max_buffered` items wait in the shared buffer; faster producers block until
+    the consumer catches up. An error in any iterator stops the merge and is re-raised.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered)
+    pumps = [asyncio.create_task(_pump_into_queue(async_iter, queue)) for async_iter in async_iters]
+    remaining = len(pumps)
+    try:
+        while remaining:
+            item = await queue.get()
+            if isinstance(item, _StreamEnd):
+                if item.error:
+                    raise item.error
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        for pump in pumps:
+            pump.cancel()
+
+
+def tee_async_iter(
+    async_iter: AsyncIterator[AsyncIteratorGenericType],
+    n: int = 2,
+    max_lag: int = 16,
+) -> List[AsyncGenerator[AsyncIteratorGenericType, None]]:
+    """Split one async iterator into `n` independent ones.
+
+    The fastest consumer can be at most `max_lag` items ahead of the slowest one. A consumer
+    that stops iterating (or is closed) no longer holds the others back.
+    """
+    assert n > 0 and max_lag > 0
+    queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=max_lag) for _ in range(n)]
+    detached = [False] * n
+    pump: Optional[asyncio.Task] = None
+
+    async def distribute():
+        error = None
+        try:
+            async for item in async_iter:
+                for i, queue in enumerate(queues):
+                    if not detached[i]:
+                        await queue.put(item)
+        except Exception as e:
+            error = e
+        for i, queue in enumerate(queues):
+            if not detached[i]:
+                await queue.put(_StreamEnd(error))
+
+    async def consume(i: int) -> AsyncGenerator[AsyncIteratorGenericType, None]:
+        nonlocal pump
+        if pump is None:
+            pump = asyncio.create_task(distribute())
+        try:
+            while True:
+                item = await queues[i].get()
+                if isinstance(item, _StreamEnd):
+                    if item.error:
+                        raise item.error
+                    return
+                yield item
+        finally:
+            detached[i] = True
+            while not queues[i].empty():
+                queues[i].get_nowait()  # unblock the pump if it is waiting on this queue
+            if all(detached):
+                pump.cancel()
+
+    return [consume(i) for i in range(n)]
+
+
+async def pace_async_iter(
+    async_iter: AsyncIterator[AsyncIteratorGenericType],
+    rate: float,
+    burst: float = 1.0,
+    cost: Optional[Callable[[AsyncIteratorGenericType], float]] = None,
+) -> AsyncGenerator[AsyncIteratorGenericType, None]:
+    """Rate-limit an async iterator with a token bucket of `rate` tokens per second and capacity `burst`.
+
+    Each item costs one token, or `cost(item)` tokens, e.g. the seconds of audio in a chunk.
+    Items are pulled one at a time, so the source is never read ahead of the pacing.
+    """
+    assert rate > 0 and burst > 0
+    loop = asyncio.get_running_loop()
+    tokens = burst
+    last_refill = loop.time()
+    async for item in async_iter:
+        item_cost = cost(item) if cost else 1.0
+        now = loop.time()
+        tokens = min(burst, tokens + (now - last_refill) * rate)
+        last_refill = now
+        if tokens < item_cost:
+            await asyncio.sleep((item_cost - tokens) / rate)
+            now = loop.time()
+            tokens = min(burst, tokens + (now - last_refill) * rate)
+            last_refill = now
+        tokens -= item_cost
+        yield item
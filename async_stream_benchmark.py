@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import json
+import time
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict
+
+from __init__ import (
+    batch_async_iter,
+    generate_from_async_iter_with_lookahead,
+    merge_async_iters,
+    pace_async_iter,
+    tee_async_iter,
+)
+
+
+async def _source(n: int) -> AsyncGenerator[int, None]:
+    for i in range(n):
+        yield i
+
+
+async def _drain(async_iter: AsyncIterator) -> int:
+    count = 0
+    async for _ in async_iter:
+        count += 1
+    return count
+
+
+async def _time_it(make_run: Callable[[], AsyncIterator], items: int) -> Dict[str, float]:
+    start = time.perf_counter()
+    await _drain(make_run())
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "items_per_second": items / elapsed if elapsed else float("inf")}
+
+
+async def _tee_run(items: int, n: int, max_lag: int) -> Dict[str, float]:
+    start = time.perf_counter()
+    await asyncio.gather(*(_drain(it) for it in tee_async_iter(_source(items), n=n, max_lag=max_lag)))
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "items_per_second": items / elapsed if elapsed else float("inf")}
+
+
+async def run_benchmarks(items: int, lookahead: int) -> Dict[str, Dict[str, float]]:
+    return {
+        "lookahead": await _time_it(lambda: generate_from_async_iter_with_lookahead(_source(items), lookahead), items),
+        "batch_64": await _time_it(lambda: batch_async_iter(_source(items), 64, 0.01), items),
+        "merge_4": await _time_it(
+            lambda: merge_async_iters(*(_source(items // 4) for _ in range(4)), max_buffered=64), items
+        ),
+        "tee_2": await _tee_run(items, n=2, max_lag=64),
+        # With a burst as large as the stream this measures the bucket's bookkeeping, not the sleeps
+        "pace_unthrottled": await _time_it(lambda: pace_async_iter(_source(items), rate=1e9, burst=items), items),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the async stream operators in __init__.py.")
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--lookahead", type=int, default=32)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run_benchmarks(args.items, args.lookahead)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
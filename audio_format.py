@@ -0,0 +1,164 @@
+import audioop
+from typing import Iterable, List, Optional, Tuple
+
+from __init__ import get_chunk_size_per_second
+
+LINEAR16 = "linear16"
+MULAW = "mulaw"
+
+
+class AudioFormat:
+    def __init__(self, sampling_rate: int, encoding: str = LINEAR16):
+        self.sampling_rate = sampling_rate
+        self.encoding = encoding
+
+    @property
+    def byte_rate(self) -> int:
+        return get_chunk_size_per_second(self.encoding, self.sampling_rate)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, AudioFormat)
+            and self.sampling_rate == other.sampling_rate
+            and self.encoding == other.encoding
+        )
+
+    def __hash__(self):
+        return hash((self.sampling_rate, self.encoding))
+
+    def __repr__(self):
+        return f"AudioFormat({self.sampling_rate}, {self.encoding!r})"
+
+
+def frame_rms(audio_chunk: bytes, encoding: str = LINEAR16) -> int:
+    if encoding == MULAW:
+        audio_chunk = audioop.ulaw2lin(audio_chunk, 2)
+    else:
+        audio_chunk = audio_chunk[:len(audio_chunk) & ~1]
+    return audioop.rms(audio_chunk, 2) if audio_chunk else 0
+
+
+def audio_formats(sampling_rates: Iterable[int], encodings: Iterable[str] = (LINEAR16,)) -> List[AudioFormat]:
+    return [AudioFormat(sampling_rate, encoding) for encoding in encodings for sampling_rate in sampling_rates]
+
+
+def preferred_first(preferred: AudioFormat, formats: Iterable[AudioFormat]) -> List[AudioFormat]:
+    """Returns `formats` with `preferred` moved to the front (formats are ordered by preference)."""
+    return [preferred] + [audio_format for audio_format in formats if audio_format != preferred]
+
+
+def common_audio_formats(format_lists: List[List[AudioFormat]]) -> List[AudioFormat]:
+    """Formats every list supports, in the first list's order; falls back to the first list if there are none."""
+    first, rest = format_lists[0], format_lists[1:]
+    return [audio_format for audio_format in first if all(audio_format in formats for formats in rest)] or first
+
+
+class AudioConverter:
+    """Streaming converter between two formats; keeps resampler state across chunks.
+
+    Chunks can split a 16-bit sample (network reads aren't frame aligned), so a trailing odd
+    byte is held back and prepended to the next chunk.
+    """
+
+    def __init__(self, from_format: AudioFormat, to_format: AudioFormat):
+        self.from_format = from_format
+        self.to_format = to_format
+        self._ratecv_state = None
+        self._remainder = b""
+
+    def convert(self, chunk: bytes) -> bytes:
+        if self.from_format.encoding == LINEAR16:
+            if self._remainder:
+                chunk = self._remainder + chunk
+            if len(chunk) % 2:
+                chunk, self._remainder = chunk[:-1], bytes(chunk[-1:])
+            else:
+                self._remainder = b""
+        if self.from_format.encoding == MULAW:
+            chunk = audioop.ulaw2lin(chunk, 2)
+        if self.from_format.sampling_rate != self.to_format.sampling_rate:
+            chunk, self._ratecv_state = audioop.ratecv(
+                chunk,
+                2,
+                1,
+                self.from_format.sampling_rate,
+                self.to_format.sampling_rate,
+                self._ratecv_state,
+            )
+        if self.to_format.encoding == MULAW:
+            chunk = audioop.lin2ulaw(chunk, 2)
+        return chunk
+
+    def __repr__(self):
+        return f"AudioConverter({self.from_format!r} -> {self.to_format!r})"
+
+
+class NegotiatedAudioFormats:
+    def __init__(
+        self,
+        wire_format: AudioFormat,
+        input_format: AudioFormat,
+        transcriber_format: AudioFormat,
+        synthesizer_format: AudioFormat,
+        output_format: AudioFormat,
+    ):
+        self.wire_format = wire_format
+        self.input_format = input_format
+        self.transcriber_format = transcriber_format
+        self.synthesizer_format = synthesizer_format
+        self.output_format = output_format
+
+    def create_input_converter(self) -> Optional[AudioConverter]:
+        """Converter from the input device to the transcriber, or None if they already agree."""
+        if self.input_format == self.transcriber_format:
+            return None
+        return AudioConverter(self.input_format, self.transcriber_format)
+
+    def create_output_converter(self) -> Optional[AudioConverter]:
+        """Converter from the synthesizer to the output device, or None if they already agree."""
+        if self.synthesizer_format == self.output_format:
+            return None
+        return AudioConverter(self.synthesizer_format, self.output_format)
+
+    def num_conversions(self) -> int:
+        return (self.input_format != self.transcriber_format) + (self.synthesizer_format != self.output_format)
+
+
+def _pick(candidate: AudioFormat, formats: List[AudioFormat]) -> Tuple[AudioFormat, int]:
+    """The component's format to use for `candidate`, and how far down its preference list that is."""
+    if candidate in formats:
+        return candidate, formats.index(candidate)
+    return formats[0], len(formats)
+
+
+def negotiate_audio_format(
+    input_formats: List[AudioFormat],
+    transcriber_formats: List[AudioFormat],
+    synthesizer_formats: List[AudioFormat],
+    output_formats: List[AudioFormat],
+) -> NegotiatedAudioFormats:
+    """Picks one wire format for the conversation that needs the fewest conversions.
+
+    Every format any component supports is a candidate. Each component uses the candidate
+    if it supports it and its own preferred format otherwise; a converter is only needed
+    where the two ends of a path (mic -> transcriber, synthesizer -> speaker) then disagree.
+    Ties are broken by how preferred the chosen formats are for each component.
+    """
+    components = [input_formats, transcriber_formats, synthesizer_formats, output_formats]
+    assert all(components), "Every component must support at least one audio format"
+    candidates = []
+    for formats in components:
+        for audio_format in formats:
+            if audio_format not in candidates:
+                candidates.append(audio_format)
+
+    best = None
+    for candidate in candidates:
+        (input_format, a), (transcriber_format, b), (synthesizer_format, c), (output_format, d) = [
+            _pick(candidate, formats) for formats in components
+        ]
+        negotiated = NegotiatedAudioFormats(candidate, input_format, transcriber_format, synthesizer_format, output_format)
+        score = (negotiated.num_conversions(), a + b + c + d)
+        if best is None or score < best[0]:
+            best = (score, negotiated)
+    return best[1]
@@ -1,8 +1,11 @@
 import asyncio
 
+from audio_format import LINEAR16, AudioFormat
+
 class OutputDeviceType:
-    def __init__(self):
+    def __init__(self, sampling_rate: int = 16000, audio_encoding: str = LINEAR16):
         self.is_active = True
+        self.audio_formats = [AudioFormat(sampling_rate, audio_encoding)]
 
     def start(self):
         self.is_active = True
@@ -12,12 +15,17 @@ class OutputDeviceType:
 
     def consume_nonblocking(self, item):
         # Simulate playing audio (replace with actual speaker output if needed)
-        print("Playing audio chunk:", item.data if hasattr(item, 'data') else item)
+        print("Playing audio chunk:", bytes(item.data) if hasattr(item, 'data') else item)
+        if hasattr(item, 'release'):
+            item.release()
 
     async def terminate(self):
         self.is_active = False
 
 class MicrophoneInput:
+    def __init__(self, sampling_rate: int = 16000, audio_encoding: str = LINEAR16):
+        self.audio_formats = [AudioFormat(sampling_rate, audio_encoding)]
+
     async def read(self):
         # Simulate reading audio chunks (replace with actual microphone input)
         await asyncio.sleep(0.1)
@@ -0,0 +1,189 @@
+import bisect
+import math
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from audio_format import AudioFormat, frame_rms
+
+
+class BargeInDetector:
+    """Detects the human talking over the agent from mic frame energy, without waiting for a transcript.
+
+    The agent's playback is kept as a timeline of (start, end, rms) so the echo expected in
+    each mic frame is known. A frame counts as speech only if it is louder than the noise
+    floor and than the expected echo, each by a margin; `min_speech_seconds` of consecutive
+    speech triggers. The echo gain (mic energy per unit of playback energy) and the noise
+    floor are learnt from frames that aren't speech.
+
+    The delay from the output device to the mic is estimated by cross-correlating the energy
+    of recent non-speech mic frames with the playback timeline, for delays up to
+    `max_echo_delay_seconds`. Until the estimate is trusted, the expected echo is the loudest
+    playback anywhere in that range; afterwards it is the playback at the estimated delay,
+    give or take `echo_tail_seconds`.
+    """
+
+    def __init__(
+        self,
+        input_format: AudioFormat,
+        output_format: AudioFormat,
+        energy_threshold: int = 500,
+        noise_margin: float = 3.0,
+        echo_margin: float = 2.0,
+        initial_echo_gain: float = 0.5,
+        echo_tail_seconds: float = 0.04,
+        max_echo_delay_seconds: float = 0.5,
+        delay_estimation_seconds: float = 1.0,
+        min_delay_correlation: float = 0.5,
+        reference_frame_seconds: float = 0.02,
+        min_speech_seconds: float = 0.04,
+        adaptation_rate: float = 0.05,
+    ):
+        self.input_format = input_format
+        self.output_format = output_format
+        self.energy_threshold = energy_threshold
+        self.noise_margin = noise_margin
+        self.echo_margin = echo_margin
+        self.echo_gain = initial_echo_gain
+        self.echo_tail_seconds = echo_tail_seconds
+        self.max_echo_delay_seconds = max_echo_delay_seconds
+        self.delay_estimation_seconds = delay_estimation_seconds
+        self.min_delay_correlation = min_delay_correlation
+        self.reference_frame_seconds = reference_frame_seconds
+        self.reference_frame_bytes = max(2, int(output_format.byte_rate * reference_frame_seconds) & ~1)
+        self.min_speech_seconds = min_speech_seconds
+        self.adaptation_rate = adaptation_rate
+        self.noise_floor = 0.0
+        # The playback timeline, as parallel lists so a time can be bisected
+        self.playback_starts: List[float] = []
+        self.playback_ends: List[float] = []
+        self.playback_rms: List[int] = []
+        self.playback_until = 0.0
+        self.echo_frames: Deque[Tuple[float, int]] = deque()  # (mid time, rms) of recent non-speech mic frames
+        self.estimated_at = 0.0
+        self.echo_delay: Optional[float] = None  # None until estimated; kept across utterances
+        self.speech_seconds = 0.0
+        self.triggers = 0
+
+    def add_playback(self, audio_chunk, now: Optional[float] = None):
+        """Schedules an output chunk on the playback timeline, right after what is already queued.
+
+        The chunk is measured in short frames so the echo reference follows the agent's syllables.
+        """
+        now = time.monotonic() if now is None else now
+        start = max(now, self.playback_until)
+        byte_rate = self.output_format.byte_rate
+        for offset in range(0, len(audio_chunk), self.reference_frame_bytes):
+            frame = audio_chunk[offset:offset + self.reference_frame_bytes]
+            end = start + len(frame) / byte_rate
+            self.playback_starts.append(start)
+            self.playback_ends.append(end)
+            self.playback_rms.append(frame_rms(frame, self.output_format.encoding))
+            start = end
+        self.playback_until = start
+
+    def echo_window(self) -> Tuple[float, float]:
+        """How long ago, at the least and the most, playback that can be echoing now was played."""
+        if self.echo_delay is None:
+            return 0.0, self.max_echo_delay_seconds + self.echo_tail_seconds
+        return max(0.0, self.echo_delay - self.echo_tail_seconds), self.echo_delay + self.echo_tail_seconds
+
+    def is_agent_speaking(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return now < self.playback_until + self.echo_window()[1]
+
+    def playback_reference(self, now: float, frame_seconds: float = 0.0) -> int:
+        """Loudest playback energy that can be echoing into a mic frame of `frame_seconds` ending at `now`."""
+        self._forget_playback_before(now - self.max_echo_delay_seconds - self.echo_tail_seconds - self.delay_estimation_seconds)
+        min_delay, max_delay = self.echo_window()
+        return self._loudest_playback(now - frame_seconds - max_delay, now - min_delay)
+
+    def _loudest_playback(self, start: float, end: float) -> int:
+        i = max(0, bisect.bisect_right(self.playback_starts, start) - 1)
+        reference = 0
+        while i < len(self.playback_starts) and self.playback_starts[i] <= end:
+            if self.playback_ends[i] > start:
+                reference = max(reference, self.playback_rms[i])
+            i += 1
+        return reference
+
+    def _forget_playback_before(self, cutoff: float):
+        i = bisect.bisect_left(self.playback_ends, cutoff)
+        if i > 256:  # trimmed in batches, since deleting from the front of a list is O(n)
+            del self.playback_starts[:i], self.playback_ends[:i], self.playback_rms[:i]
+
+    def process(self, audio_chunk: bytes, now: Optional[float] = None) -> bool:
+        """Feeds one mic frame; returns True when the human has started talking over the agent."""
+        now = time.monotonic() if now is None else now
+        rms = frame_rms(audio_chunk, self.input_format.encoding)
+        frame_seconds = len(audio_chunk) / self.input_format.byte_rate
+        if not self.is_agent_speaking(now):
+            self.noise_floor += self.adaptation_rate * (rms - self.noise_floor)
+            self.speech_seconds = 0.0
+            return False
+        reference = self.playback_reference(now, frame_seconds)
+        threshold = max(
+            self.energy_threshold,
+            self.noise_floor * self.noise_margin,
+            self.echo_gain * reference * self.echo_margin,
+        )
+        if rms < threshold:
+            if reference > 0:
+                self.echo_gain += self.adaptation_rate * (rms / reference - self.echo_gain)
+            self._add_echo_frame(now - frame_seconds / 2, rms)
+            self.speech_seconds = 0.0
+            return False
+        self.speech_seconds += frame_seconds
+        if self.speech_seconds < self.min_speech_seconds:
+            return False
+        self.triggers += 1
+        self.reset()
+        return True
+
+    def _add_echo_frame(self, mid_time: float, rms: int):
+        self.echo_frames.append((mid_time, rms))
+        while self.echo_frames[0][0] < mid_time - self.delay_estimation_seconds:
+            self.echo_frames.popleft()
+        # Estimated every 100ms until there is an estimate, then refreshed every second in case the path changes
+        if abs(mid_time - self.estimated_at) >= (0.1 if self.echo_delay is None else 1.0):
+            self.estimated_at = mid_time
+            self.estimate_echo_delay()
+
+    def _playback_rms_at(self, when: float) -> int:
+        i = bisect.bisect_right(self.playback_starts, when) - 1
+        return self.playback_rms[i] if i >= 0 and when < self.playback_ends[i] else 0
+
+    def estimate_echo_delay(self) -> Optional[float]:
+        """Picks the delay at which playback energy best correlates with the mic's; keeps the old one if none is clear."""
+        if len(self.echo_frames) < 2 or self.echo_frames[-1][0] - self.echo_frames[0][0] < self.delay_estimation_seconds / 2:
+            return self.echo_delay
+        mic = [rms for _, rms in self.echo_frames]
+        mic_mean = sum(mic) / len(mic)
+        mic_deviations = [rms - mic_mean for rms in mic]
+        mic_norm = math.sqrt(sum(d * d for d in mic_deviations))
+        if mic_norm == 0:
+            return self.echo_delay
+        best_delay, best_correlation = None, self.min_delay_correlation
+        for step in range(int(self.max_echo_delay_seconds / self.reference_frame_seconds) + 1):
+            delay = step * self.reference_frame_seconds
+            reference = [self._playback_rms_at(mid_time - delay) for mid_time, _ in self.echo_frames]
+            reference_mean = sum(reference) / len(reference)
+            reference_deviations = [rms - reference_mean for rms in reference]
+            reference_norm = math.sqrt(sum(d * d for d in reference_deviations))
+            if reference_norm == 0:
+                continue
+            correlation = sum(m * r for m, r in zip(mic_deviations, reference_deviations)) / (mic_norm * reference_norm)
+            if correlation > best_correlation:
+                best_delay, best_correlation = delay, correlation
+        if best_delay is not None:
+            self.echo_delay = best_delay
+        return self.echo_delay
+
+    def reset(self):
+        """Forgets the playback timeline, e.g. after the agent's speech has been interrupted."""
+        self.playback_starts.clear()
+        self.playback_ends.clear()
+        self.playback_rms.clear()
+        self.playback_until = 0.0
+        self.echo_frames.clear()
+        self.speech_seconds = 0.0
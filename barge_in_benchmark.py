@@ -0,0 +1,133 @@
+import argparse
+import audioop
+import json
+import math
+import random
+from typing import Dict, Optional
+
+from audio_format import AudioFormat
+from barge_in import BargeInDetector
+from latency_tracing import LatencyHistogram
+
+SAMPLING_RATE = 16000
+BYTES_PER_SAMPLE = 2
+
+
+def _speech_like(rng: random.Random, seconds: float, level: float, frame_seconds: float) -> bytes:
+    """Noise at up to `level` of full scale, shaped into syllables of random length (0.1-0.35s) and loudness.
+
+    The syllables are irregular like real speech, so the echo delay can't be mistaken for a
+    whole number of syllables later.
+    """
+    frame_bytes = int(SAMPLING_RATE * frame_seconds) * BYTES_PER_SAMPLE
+    frames = []
+    num_frames = int(seconds / frame_seconds)
+    while len(frames) < num_frames:
+        syllable_frames = max(1, int(rng.uniform(0.1, 0.35) / frame_seconds))
+        peak = rng.uniform(0.4, 1.0)
+        for i in range(syllable_frames):
+            envelope = 0.1 + 0.9 * peak * math.sin(math.pi * (i + 0.5) / syllable_frames)
+            frames.append(audioop.mul(rng.randbytes(frame_bytes), BYTES_PER_SAMPLE, level * envelope))
+    return b"".join(frames[:num_frames])
+
+
+def run_trial(
+    rng: random.Random,
+    barge_in: bool,
+    playback_seconds: float = 3.0,
+    frame_seconds: float = 0.02,
+    echo_gain: float = 0.3,
+    echo_delay_seconds: float = 0.04,
+    agent_level: float = 0.3,
+    user_level: float = 0.25,
+    noise_level: float = 0.01,
+    **detector_kwargs,
+) -> Optional[float]:
+    """Plays one agent utterance into a simulated echoing mic; returns seconds from user onset to trigger.
+
+    Without `barge_in` the mic only hears echo and background noise, so any trigger is a false
+    positive and is returned as its time from the start of playback.
+    """
+    audio_format = AudioFormat(SAMPLING_RATE)
+    detector = BargeInDetector(audio_format, audio_format, **detector_kwargs)
+    playback = _speech_like(rng, playback_seconds, agent_level, frame_seconds)
+    delay_bytes = int(SAMPLING_RATE * echo_delay_seconds) * BYTES_PER_SAMPLE
+    mic = audioop.mul(bytes(delay_bytes) + playback[:len(playback) - delay_bytes], BYTES_PER_SAMPLE, echo_gain)
+    mic = audioop.add(mic, audioop.mul(rng.randbytes(len(mic)), BYTES_PER_SAMPLE, noise_level), BYTES_PER_SAMPLE)
+    onset = rng.uniform(0.3, playback_seconds - 0.5) if barge_in else None
+    if onset is not None:
+        onset_bytes = int(SAMPLING_RATE * onset) * BYTES_PER_SAMPLE
+        # The user's first syllable starts at the onset
+        user = bytes(onset_bytes) + _speech_like(rng, playback_seconds - onset, user_level, frame_seconds)
+        mic = audioop.add(mic, user[:len(mic)].ljust(len(mic), b"\0"), BYTES_PER_SAMPLE)
+
+    # Like send_speech_to_output, the whole utterance is queued for playback up front
+    chunk_bytes = SAMPLING_RATE * BYTES_PER_SAMPLE // 8
+    for offset in range(0, len(playback), chunk_bytes):
+        detector.add_playback(playback[offset:offset + chunk_bytes], now=0.0)
+    frame_bytes = int(SAMPLING_RATE * frame_seconds) * BYTES_PER_SAMPLE
+    for offset in range(0, len(mic), frame_bytes):
+        now = (offset + frame_bytes) / (SAMPLING_RATE * BYTES_PER_SAMPLE)
+        if detector.process(mic[offset:offset + frame_bytes], now=now):
+            return now - onset if onset is not None else now
+    return None
+
+
+def run_barge_in_benchmark(trials: int = 200, seed: int = 0, **trial_kwargs) -> Dict:
+    rng = random.Random(seed)
+    latency = LatencyHistogram()
+    detected = missed = false_positives = 0
+    for _ in range(trials):
+        if run_trial(rng, barge_in=False, **trial_kwargs) is not None:
+            false_positives += 1
+        result = run_trial(rng, barge_in=True, **trial_kwargs)
+        if result is None or result < 0:
+            # A trigger before the user started talking is a false positive, not a detection
+            missed += 1
+            false_positives += result is not None
+        else:
+            detected += 1
+            latency.record(result * 1e6)
+    return {
+        "trials": trials,
+        "detection_rate": detected / trials,
+        "miss_rate": missed / trials,
+        "false_positive_rate": false_positives / (2 * trials),
+        "latency_ms": {
+            "p50": latency.percentile(0.5) / 1000,
+            "p95": latency.percentile(0.95) / 1000,
+            "p99": latency.percentile(0.99) / 1000,
+            "max": latency.max_value / 1000,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure local barge-in detection latency and false positives against simulated echo.")
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frame-seconds", type=float, default=0.02)
+    parser.add_argument("--echo-gain", type=float, default=0.3)
+    parser.add_argument("--user-level", type=float, default=0.25)
+    parser.add_argument("--noise-level", type=float, default=0.01)
+    parser.add_argument("--echo-delay-seconds", type=float, default=0.04)
+    parser.add_argument("--min-speech-seconds", type=float, default=0.04)
+    parser.add_argument("--echo-tail-seconds", type=float, default=0.04)
+    parser.add_argument("--max-echo-delay-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+    print(json.dumps(run_barge_in_benchmark(
+        args.trials,
+        args.seed,
+        frame_seconds=args.frame_seconds,
+        echo_gain=args.echo_gain,
+        user_level=args.user_level,
+        noise_level=args.noise_level,
+        echo_delay_seconds=args.echo_delay_seconds,
+        min_speech_seconds=args.min_speech_seconds,
+        echo_tail_seconds=args.echo_tail_seconds,
+        max_echo_delay_seconds=args.max_echo_delay_seconds,
+    ), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,6 @@ import asyncio
 import json
 from typing import AsyncGenerator, Optional, Tuple
 
-from chat_gpt_agent import ChatGPTAgentConfig
-
 class AgentResponseType:
     MESSAGE = "agent_response_message"
     STOP = "agent_response_stop"
@@ -45,6 +43,24 @@ class BaseAgent(AbstractAgent):
         self.agent_responses_consumer = None
         self.is_muted = False
 
+    async def start(self):
+        pass
+
+    async def terminate(self):
+        pass
+
+    async def prewarm(self):
+        pass
+
+    def update_last_bot_message_on_cut_off(self, message: str):
+        """Called when the human interrupted the agent, with the part of its last message that was played."""
+        pass
+
+    def reset(self):
+        """Clears per-call state so a pooled agent can serve another conversation."""
+        self.agent_responses_consumer = None
+        self.is_muted = False
+
     async def respond(self, human_input: str, conversation_id: str, is_interrupt: bool = False) -> Tuple[Optional[str], bool]:
         raise NotImplementedError
 
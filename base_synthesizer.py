@@ -1,5 +1,167 @@
 import asyncio
-from typing import AsyncGenerator, Callable, Optional
+import bisect
+import re
+from typing import AsyncGenerator, Callable, List, Optional, Tuple
+
+from audio_format import AudioFormat, frame_rms
+from __init__ import get_chunk_size_per_second
+
+DEFAULT_CHARS_PER_SECOND = 15.0  # roughly 150 words per minute
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "st", "jr", "sr", "vs", "etc", "e.g", "i.e", "approx"}
+
+
+def _ends_sentence(message: str, match: "re.Match") -> bool:
+    """False for the period of an abbreviation or initial ("Dr. Smith", "J. Doe") or before a lowercase word."""
+    following = message[match.end():match.end() + 1]
+    if following.islower():
+        return False
+    if message[match.start() - 1] != ".":
+        return True
+    preceding = message[max(0, match.start() - 16):match.start() - 1].split()  # abbreviations are short
+    word = preceding[-1] if preceding else ""
+    return word.lower() not in _ABBREVIATIONS and not (len(word) == 1 and word.isupper())
+
+
+def sentence_spans(message: str) -> List[Tuple[int, int]]:
+    """(start, end) character offsets of each sentence; together they cover the whole message."""
+    spans = []
+    start = 0
+    for match in _SENTENCE_END.finditer(message):
+        if not _ends_sentence(message, match):
+            continue
+        spans.append((start, match.end()))
+        start = match.end()
+    if start < len(message) or not spans:
+        spans.append((start, len(message)))
+    return spans
+
+
+class TextAlignmentIndex:
+    """Maps byte offsets in synthesized audio to character offsets in the message.
+
+    The synthesizer adds an entry each time the audio for a span of text (a sentence, or a
+    word if the provider reports word timings) is complete. Lookups bisect the entries; inside
+    a span the position is interpolated and rounded down to a word boundary, so a cutoff never
+    includes a word the listener didn't hear.
+    """
+
+    def __init__(self, message: str, bytes_per_char: float):
+        self.message = message
+        self.bytes_per_char = bytes_per_char  # only used until the first span has been measured
+        self.audio_offsets: List[int] = [0]
+        self.text_offsets: List[int] = [0]
+        self.pending_text_offset = len(message)
+
+    def begin_span(self, text_offset: int):
+        """Marks where the span currently being synthesized ends in the text."""
+        self.pending_text_offset = text_offset
+
+    def add(self, audio_offset: int, text_offset: int):
+        """Records that the audio for the text up to `text_offset` ends at `audio_offset`."""
+        self.audio_offsets.append(audio_offset)
+        self.text_offsets.append(text_offset)
+
+    def text_offset_at(self, audio_offset: int) -> int:
+        i = bisect.bisect_right(self.audio_offsets, audio_offset) - 1
+        start_audio, start_text = self.audio_offsets[i], self.text_offsets[i]
+        if i + 1 < len(self.audio_offsets):
+            end_audio, end_text = self.audio_offsets[i + 1], self.text_offsets[i + 1]
+        else:
+            # Past the last finished span: estimate the length of the one still being synthesized
+            end_text = max(self.pending_text_offset, start_text)
+            bytes_per_char = start_audio / start_text if start_text else self.bytes_per_char
+            end_audio = start_audio + (end_text - start_text) * bytes_per_char
+        if audio_offset >= end_audio or end_text == start_text:
+            return end_text
+        position = start_text + int((audio_offset - start_audio) / (end_audio - start_audio) * (end_text - start_text))
+        word_boundary = self.message.rfind(" ", start_text, position + 1)
+        return word_boundary if word_boundary > start_text else start_text
+
+    def message_up_to(self, audio_offset: int) -> str:
+        return self.message[:self.text_offset_at(audio_offset)].rstrip()
+
+
+class PauseAligner:
+    """Maps the sentence ends of a message onto audio synthesized for it in a single request.
+
+    Voices leave a pause between sentences, so the audio is scanned as it streams in for runs
+    of at least `min_pause_seconds` below `pause_rms`. A pause is taken as the end of the
+    current sentence once at least `min_sentence_fraction` of the sentence's expected length
+    (at the bytes per char measured so far) has been heard, which skips pauses at commas
+    early in a sentence. Sentences whose pause isn't found are interpolated by the index.
+    """
+
+    def __init__(
+        self,
+        alignment: TextAlignmentIndex,
+        audio_format: AudioFormat,
+        min_pause_seconds: float = 0.25,
+        min_sentence_fraction: float = 0.5,
+        pause_rms: int = 200,
+    ):
+        self.alignment = alignment
+        self.encoding = audio_format.encoding
+        self.frame_size = audio_format.byte_rate // 100  # 10ms
+        self.min_pause_bytes = int(min_pause_seconds * audio_format.byte_rate)
+        self.min_sentence_fraction = min_sentence_fraction
+        self.pause_rms = pause_rms
+        self.sentence_ends = [end for _, end in sentence_spans(alignment.message)[:-1]]
+        self.audio_offset = 0
+        self.pending = b""
+        self.pause_start: Optional[int] = None
+        self.heard_speech = False
+        self.last_audio_offset = 0
+        self.last_text_offset = 0
+        alignment.begin_span(self._next_sentence_end())
+
+    def _next_sentence_end(self) -> int:
+        return self.sentence_ends[0] if self.sentence_ends else len(self.alignment.message)
+
+    def feed(self, chunk: bytes):
+        data = self.pending + chunk
+        usable = len(data) - len(data) % self.frame_size
+        for start in range(0, usable, self.frame_size):
+            if frame_rms(data[start:start + self.frame_size], self.encoding) < self.pause_rms:
+                if self.pause_start is None:
+                    self.pause_start = self.audio_offset
+            else:
+                if self.pause_start is not None and self.audio_offset - self.pause_start >= self.min_pause_bytes:
+                    self._end_sentence_at(self.pause_start)
+                self.pause_start = None
+                self.heard_speech = True
+            self.audio_offset += self.frame_size
+        self.pending = data[usable:]
+
+    def _end_sentence_at(self, audio_offset: int):
+        if not self.sentence_ends or not self.heard_speech:
+            return
+        if self.last_text_offset:
+            bytes_per_char = self.last_audio_offset / self.last_text_offset
+        else:
+            bytes_per_char = self.alignment.bytes_per_char
+        heard = audio_offset - self.last_audio_offset
+        # The pause belongs to the sentence end it's nearest to, so a missed pause doesn't shift the rest
+        best = None
+        for i, text_offset in enumerate(self.sentence_ends):
+            expected = (text_offset - self.last_text_offset) * bytes_per_char
+            if heard < self.min_sentence_fraction * expected:
+                break
+            if best is None or abs(heard - expected) < best[0]:
+                best = (abs(heard - expected), i)
+        if best is None:
+            return
+        text_offset = self.sentence_ends[best[1]]
+        del self.sentence_ends[:best[1] + 1]
+        self.alignment.add(audio_offset, text_offset)
+        self.last_audio_offset, self.last_text_offset = audio_offset, text_offset
+        self.heard_speech = False
+        self.alignment.begin_span(self._next_sentence_end())
+
+    def finish(self):
+        """Marks the end of the audio, which is the end of the message."""
+        self.alignment.add(self.audio_offset + len(self.pending), len(self.alignment.message))
+
 
 class SynthesisResult:
     class ChunkResult:
@@ -11,9 +173,11 @@ class SynthesisResult:
         self,
         chunk_generator: AsyncGenerator[ChunkResult, None],
         get_message_up_to: Callable[[Optional[float]], str],
+        alignment: Optional[TextAlignmentIndex] = None,
     ):
         self.chunk_generator = chunk_generator
         self.get_message_up_to = get_message_up_to
+        self.alignment = alignment
 
 class SynthesizerConfig:
     def __init__(self, sampling_rate: int = 16000, audio_encoding: str = "linear16"):
@@ -30,6 +194,35 @@ class BaseSynthesizer:
     async def create_speech(self, message: str, chunk_size: int) -> SynthesisResult:
         raise NotImplementedError
 
+    def get_audio_formats(self) -> List[AudioFormat]:
+        """Formats this synthesizer can produce, most preferred first."""
+        return [AudioFormat(self.synthesizer_config.sampling_rate, self.synthesizer_config.audio_encoding)]
+
+    def set_audio_format(self, audio_format: AudioFormat):
+        self.synthesizer_config.sampling_rate = audio_format.sampling_rate
+        self.synthesizer_config.audio_encoding = audio_format.encoding
+
+    def get_byte_rate(self) -> int:
+        return get_chunk_size_per_second(self.synthesizer_config.audio_encoding, self.synthesizer_config.sampling_rate)
+
+    def create_alignment_index(self, message: str) -> TextAlignmentIndex:
+        return TextAlignmentIndex(message, self.get_byte_rate() / DEFAULT_CHARS_PER_SECOND)
+
+    def get_message_cutoff_from_alignment(self, alignment: TextAlignmentIndex, seconds: Optional[float]) -> str:
+        if seconds is None:
+            return alignment.message
+        return alignment.message_up_to(int(seconds * self.get_byte_rate()))
+
+    async def start(self):
+        pass
+
+    async def prewarm(self):
+        pass
+
+    def reset(self):
+        """Clears per-call state so a pooled synthesizer can serve another conversation."""
+        self.streaming_conversation = None
+
     async def stop(self):
         pass
 
@@ -45,7 +238,8 @@ class BaseSynthesizer:
     ) -> str:
         if not message or seconds is None:
             return message
-        estimated_output_seconds = size_of_output / synthesizer_config.sampling_rate
+        byte_rate = get_chunk_size_per_second(synthesizer_config.audio_encoding, synthesizer_config.sampling_rate)
+        estimated_output_seconds = size_of_output / byte_rate
         if estimated_output_seconds <= 0:
             return message
         estimated_chars_per_second = len(message) / estimated_output_seconds
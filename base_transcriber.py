@@ -1,5 +1,18 @@
 import asyncio
+import audioop
 from abc import ABC, abstractmethod
+from typing import List
+
+from audio_format import MULAW, AudioFormat
+from __init__ import get_chunk_size_per_second
+
+SPEECH_RMS_THRESHOLD = 300  # linear16 RMS below which an input chunk counts as silence
+
+class EndpointingConfig:
+    def __init__(self, min_speech_duration=0.3, min_silence_duration=0.5, sensitivity=0.8):
+        self.min_speech_duration = min_speech_duration
+        self.min_silence_duration = min_silence_duration
+        self.sensitivity = sensitivity
 
 class TranscriberConfig:
     def __init__(self, sampling_rate: int = 16000, audio_encoding: str = "linear16", endpointing_config=None):
@@ -21,6 +34,50 @@ class BaseTranscriber(ABC):
         self.streaming_conversation = None
         self.is_muted = False
 
+    def get_audio_formats(self) -> List[AudioFormat]:
+        """Formats this transcriber accepts, most preferred first."""
+        return [AudioFormat(self.config.sampling_rate, self.config.audio_encoding)]
+
+    def set_audio_format(self, audio_format: AudioFormat):
+        self.config.sampling_rate = audio_format.sampling_rate
+        self.config.audio_encoding = audio_format.encoding
+
+    def get_byte_rate(self) -> int:
+        return get_chunk_size_per_second(self.config.audio_encoding, self.config.sampling_rate)
+
+    def is_speech(self, audio_chunk: bytes) -> bool:
+        if self.config.audio_encoding == MULAW:
+            audio_chunk = audioop.ulaw2lin(audio_chunk, 2)
+        audio_chunk = audio_chunk[:len(audio_chunk) & ~1]
+        return bool(audio_chunk) and audioop.rms(audio_chunk, 2) >= SPEECH_RMS_THRESHOLD
+
+    def track_silence(self, audio_chunk: bytes, chunk_duration: float):
+        """Updates `speech_duration` and `time_silent` for a chunk about to be buffered.
+
+        For transcribers that buffer and endpoint audio themselves (`audio_buffer`,
+        `buffer_duration`, `speech_duration`, `time_silent`, `force_endpoint`). Only silence
+        after speech counts towards endpointing; silence before anything was said is dropped.
+        """
+        if self.is_speech(audio_chunk):
+            self.speech_duration += chunk_duration
+            self.time_silent = 0.0
+        elif self.speech_duration:
+            self.time_silent += chunk_duration
+        else:
+            self.audio_buffer.clear()
+            self.buffer_duration = 0.0
+
+    def should_endpoint(self) -> bool:
+        if self.force_endpoint:
+            return True
+        endpointing_config = self.config.endpointing_config
+        if not endpointing_config:
+            return self.buffer_duration >= 5.0  # Default to 5 seconds
+        return (
+            self.speech_duration >= endpointing_config.min_speech_duration
+            and self.time_silent >= endpointing_config.min_silence_duration
+        )
+
     def mute(self):
         self.is_muted = True
 
@@ -30,10 +87,22 @@ class BaseTranscriber(ABC):
     async def start(self):
         pass
 
+    async def prewarm(self):
+        pass
+
     @abstractmethod
     async def process(self, audio_chunk: bytes) -> dict:
         pass
 
+    async def transcribe_audio(self, audio: bytes) -> str:
+        """Transcribes a complete, already endpointed buffer. Raises on provider errors."""
+        raise NotImplementedError
+
+    def reset(self):
+        """Clears per-call state so a pooled transcriber can serve another conversation."""
+        self.streaming_conversation = None
+        self.is_muted = False
+
     async def stop(self):
         pass
 
@@ -1,22 +1,36 @@
 import os
 import asyncio
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
-from openai import AsyncOpenAI
 from base_agent import BaseAgent, GeneratedResponse, AgentConfig
+from latency_tracing import FIRST_LLM_TOKEN, FULL_LLM_RESPONSE, get_latency_tracer
 
-class ChatGPTAgentConfig:
-    def __init__(self, model_name: str = "gpt-4", max_tokens: int = 500, temperature: float = 0.7):
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+class ChatGPTAgentConfig(AgentConfig):
+    def __init__(
+        self,
+        model_name: str = "gpt-4",
+        max_tokens: int = 500,
+        temperature: float = 0.7,
+        base_url: str = OPENAI_BASE_URL,
+        initial_message: Optional[str] = None,
+        allow_agent_to_be_cut_off: bool = True,
+    ):
+        super().__init__(initial_message, allow_agent_to_be_cut_off)
         self.model_name = model_name
         self.max_tokens = max_tokens
         self.temperature = temperature
+        self.base_url = base_url
 
 class ChatGPTAgent(BaseAgent):
     def __init__(self, agent_config: ChatGPTAgentConfig, openai_api_key: str):
         super().__init__(agent_config)
+        from openai import AsyncOpenAI
+
         self.openai_client = AsyncOpenAI(
             api_key=openai_api_key or os.environ.get("OPENAI_API_KEY"),
-            base_url="https://api.openai.com/v1"
+            base_url=agent_config.base_url
         )
         if not self.openai_client.api_key:
             raise ValueError("OPENAI_API_KEY must be set in environment or passed in")
@@ -24,14 +38,24 @@ class ChatGPTAgent(BaseAgent):
 
     async def respond(self, human_input: str, conversation_id: str, is_interrupt: bool = False) -> tuple[Optional[str], bool]:
         self.messages.append({"role": "user", "content": human_input})
+        tracer = get_latency_tracer()
         try:
-            response = await self.openai_client.chat.completions.create(
+            stream = await self.openai_client.chat.completions.create(
                 model=self.agent_config.model_name,
                 messages=self.messages,
                 max_tokens=self.agent_config.max_tokens,
-                temperature=self.agent_config.temperature
+                temperature=self.agent_config.temperature,
+                stream=True
             )
-            message = response.choices[0].message.content
+            parts = []
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if not parts:
+                    tracer.mark(conversation_id, FIRST_LLM_TOKEN)
+                parts.append(chunk.choices[0].delta.content)
+            message = "".join(parts)
+            tracer.mark(conversation_id, FULL_LLM_RESPONSE)
             self.messages.append({"role": "assistant", "content": message})
             return message, False
         except Exception as e:
@@ -44,6 +68,26 @@ class ChatGPTAgent(BaseAgent):
             yield GeneratedResponse(message=response, is_interruptible=self.agent_config.allow_agent_to_be_cut_off)
         yield GeneratedResponse(message="", is_interruptible=True)  # End of turn
 
+    async def prewarm(self):
+        # Any cheap authenticated request opens and pools the HTTPS connection
+        try:
+            await self.openai_client.models.list()
+        except Exception as e:
+            print(f"Failed to prewarm OpenAI connection: {e}")
+
+    def update_last_bot_message_on_cut_off(self, message: str):
+        if not self.messages or self.messages[-1]["role"] != "assistant":
+            return
+        if message:
+            self.messages[-1]["content"] = message + "-"
+        else:
+            # Nothing was heard, so the model shouldn't believe it said anything
+            self.messages.pop()
+
+    def reset(self):
+        super().reset()
+        self.messages = self.messages[:1]  # keep the system prompt
+
     async def terminate(self):
-        self.openai_client.close()
+        await self.openai_client.close()
         await super().terminate()
\ No newline at end of file
@@ -0,0 +1,171 @@
+import json
+import struct
+import time
+import zlib
+from typing import Dict
+
+from audio_format import AudioFormat, NegotiatedAudioFormats
+from base_transcriber import EndpointingConfig
+from streaming_conversation import StreamingConversation
+
+# Layout: MAGIC | version (u8) | flags (u8) | payload
+# payload (zlib-compressed when FLAG_COMPRESSED is set) is a sequence of sections:
+#   tag (u8) | length (u32, big-endian) | body
+# Readers skip tags they don't know, so new sections can be added without a version bump.
+MAGIC = b"IMCK"
+CHECKPOINT_VERSION = 1
+FLAG_COMPRESSED = 0x01
+
+_HEADER = struct.Struct(">4sBB")
+_SECTION_HEADER = struct.Struct(">BI")
+_TRANSCRIBER_STATE = struct.Struct(">dd")
+_CONVERSATION_FLAGS = struct.Struct(">????")
+_SPEECH_DURATION = struct.Struct(">d")
+
+TAG_CONVERSATION_ID = 1
+TAG_TRANSCRIPT = 2
+TAG_AGENT_MESSAGES = 3
+TAG_AUDIO_BUFFER = 4
+TAG_TRANSCRIBER_STATE = 5
+TAG_ENDPOINTING_CONFIG = 6
+TAG_CONVERSATION_FLAGS = 7
+TAG_AUDIO_FORMATS = 8
+TAG_SPEECH_DURATION = 9
+
+_AUDIO_FORMAT_FIELDS = ("wire_format", "input_format", "transcriber_format", "synthesizer_format", "output_format")
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def _section(tag: int, body: bytes) -> bytes:
+    return _SECTION_HEADER.pack(tag, len(body)) + body
+
+
+def snapshot_conversation(conversation: StreamingConversation, compress: bool = True) -> bytes:
+    """Serializes the conversation's state into a versioned binary checkpoint."""
+    transcriber = conversation.transcriber
+    agent = conversation.agent
+    sections = [
+        _section(TAG_CONVERSATION_ID, conversation.id.encode("utf-8")),
+        _section(TAG_TRANSCRIPT, conversation.transcript.encode("utf-8")),
+        _section(TAG_CONVERSATION_FLAGS, _CONVERSATION_FLAGS.pack(
+            conversation.synthesis_enabled,
+            conversation.is_human_speaking,
+            getattr(agent, "is_muted", False),
+            getattr(transcriber, "is_muted", False),
+        )),
+    ]
+    if hasattr(agent, "messages"):
+        messages = json.dumps(agent.messages, separators=(",", ":"))
+        sections.append(_section(TAG_AGENT_MESSAGES, messages.encode("utf-8")))
+    if hasattr(transcriber, "audio_buffer"):
+        sections.append(_section(TAG_AUDIO_BUFFER, bytes(transcriber.audio_buffer)))
+        sections.append(_section(TAG_TRANSCRIBER_STATE, _TRANSCRIBER_STATE.pack(
+            transcriber.buffer_duration,
+            transcriber.time_silent,
+        )))
+    if hasattr(transcriber, "speech_duration"):
+        sections.append(_section(TAG_SPEECH_DURATION, _SPEECH_DURATION.pack(transcriber.speech_duration)))
+    endpointing_config = getattr(transcriber.config, "endpointing_config", None)
+    if endpointing_config is not None:
+        sections.append(_section(TAG_ENDPOINTING_CONFIG, json.dumps(vars(endpointing_config)).encode("utf-8")))
+    if conversation.audio_formats is not None:
+        audio_formats = {}
+        for name in _AUDIO_FORMAT_FIELDS:
+            audio_format = getattr(conversation.audio_formats, name)
+            audio_formats[name] = [audio_format.sampling_rate, audio_format.encoding]
+        sections.append(_section(TAG_AUDIO_FORMATS, json.dumps(audio_formats).encode("utf-8")))
+
+    payload = b"".join(sections)
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, 1)
+        flags |= FLAG_COMPRESSED
+    return _HEADER.pack(MAGIC, CHECKPOINT_VERSION, flags) + payload
+
+
+def read_checkpoint(data: bytes) -> Dict[int, bytes]:
+    if len(data) < _HEADER.size:
+        raise CheckpointError("Checkpoint is truncated")
+    magic, version, flags = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise CheckpointError("Not a conversation checkpoint")
+    if version > CHECKPOINT_VERSION:
+        raise CheckpointError(f"Unsupported checkpoint version: {version}")
+    payload = memoryview(data)[_HEADER.size:]
+    if flags & FLAG_COMPRESSED:
+        try:
+            payload = memoryview(zlib.decompress(payload))
+        except zlib.error as e:
+            raise CheckpointError(f"Checkpoint payload is corrupt: {e}") from e
+
+    sections = {}
+    offset = 0
+    while offset < len(payload):
+        if offset + _SECTION_HEADER.size > len(payload):
+            raise CheckpointError("Checkpoint section header is truncated")
+        tag, length = _SECTION_HEADER.unpack_from(payload, offset)
+        offset += _SECTION_HEADER.size
+        if offset + length > len(payload):
+            raise CheckpointError("Checkpoint section is truncated")
+        sections[tag] = payload[offset:offset + length]
+        offset += length
+    return sections
+
+
+def restore_conversation(conversation: StreamingConversation, data: bytes) -> StreamingConversation:
+    """Loads a checkpoint into a freshly constructed conversation with equivalent components."""
+    sections = read_checkpoint(data)
+    transcriber = conversation.transcriber
+    agent = conversation.agent
+
+    if TAG_CONVERSATION_ID in sections:
+        conversation.id = bytes(sections[TAG_CONVERSATION_ID]).decode("utf-8")
+    if TAG_TRANSCRIPT in sections:
+        conversation.transcript = bytes(sections[TAG_TRANSCRIPT]).decode("utf-8")
+    if TAG_CONVERSATION_FLAGS in sections:
+        synthesis_enabled, is_human_speaking, agent_muted, transcriber_muted = _CONVERSATION_FLAGS.unpack(
+            sections[TAG_CONVERSATION_FLAGS]
+        )
+        conversation.synthesis_enabled = synthesis_enabled
+        conversation.is_human_speaking = is_human_speaking
+        agent.is_muted = agent_muted
+        transcriber.is_muted = transcriber_muted
+    if TAG_AGENT_MESSAGES in sections and hasattr(agent, "messages"):
+        agent.messages = json.loads(bytes(sections[TAG_AGENT_MESSAGES]))
+    if TAG_AUDIO_BUFFER in sections and hasattr(transcriber, "audio_buffer"):
+        transcriber.audio_buffer = bytearray(sections[TAG_AUDIO_BUFFER])
+    if TAG_TRANSCRIBER_STATE in sections and hasattr(transcriber, "buffer_duration"):
+        transcriber.buffer_duration, transcriber.time_silent = _TRANSCRIBER_STATE.unpack(
+            sections[TAG_TRANSCRIBER_STATE]
+        )
+    if TAG_SPEECH_DURATION in sections and hasattr(transcriber, "speech_duration"):
+        transcriber.speech_duration, = _SPEECH_DURATION.unpack(sections[TAG_SPEECH_DURATION])
+    if TAG_ENDPOINTING_CONFIG in sections:
+        # A new object, so a config shared with other conversations is left untouched
+        transcriber.config.endpointing_config = EndpointingConfig(**json.loads(bytes(sections[TAG_ENDPOINTING_CONFIG])))
+    if TAG_AUDIO_FORMATS in sections:
+        audio_formats = json.loads(bytes(sections[TAG_AUDIO_FORMATS]))
+        conversation.apply_audio_formats(NegotiatedAudioFormats(
+            *(AudioFormat(*audio_formats[name]) for name in _AUDIO_FORMAT_FIELDS)
+        ))
+    return conversation
+
+
+def measure_checkpoint(conversation: StreamingConversation, iterations: int = 100, compress: bool = True) -> Dict[str, float]:
+    """Times snapshot and restore round trips of `conversation`'s current state."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        data = snapshot_conversation(conversation, compress=compress)
+    snapshot_seconds = (time.perf_counter() - start) / iterations
+    start = time.perf_counter()
+    for _ in range(iterations):
+        restore_conversation(conversation, data)
+    restore_seconds = (time.perf_counter() - start) / iterations
+    return {
+        "snapshot_bytes": len(data),
+        "snapshot_ms": snapshot_seconds * 1000,
+        "restore_ms": restore_seconds * 1000,
+    }
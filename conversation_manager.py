@@ -0,0 +1,337 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from conversation_checkpoint import restore_conversation, snapshot_conversation
+from conversation_reaper import ConversationReaper
+from streaming_conversation import StreamingConversation
+from __init__ import create_conversation_id, create_loop_in_thread
+
+ConversationFactory = Callable[[str], StreamingConversation]
+
+
+class ConversationLimitExceeded(Exception):
+    pass
+
+
+class ConversationManager:
+    """Runs many conversations on a single event loop, admitting at most `max_conversations`.
+
+    Conversations idle for `idle_timeout` seconds or running for `max_duration` seconds are
+    terminated by the reaper. `on_conversation_finished` is called with the id of every
+    conversation once it has ended and been released, however it ended.
+    """
+
+    def __init__(
+        self,
+        max_conversations: int = 100,
+        idle_timeout: float = 60.0,
+        max_duration: Optional[float] = 3600.0,
+        on_conversation_finished: Optional[Callable[[str], None]] = None,
+    ):
+        self.max_conversations = max_conversations
+        self.on_conversation_finished = on_conversation_finished
+        self.conversations: Dict[str, StreamingConversation] = {}
+        self._watchers: Dict[str, asyncio.Task] = {}
+        self.reaper = ConversationReaper(idle_timeout=idle_timeout, max_duration=max_duration)
+
+    def active_count(self) -> int:
+        return len(self.conversations)
+
+    def has_capacity(self) -> bool:
+        return self.active_count() < self.max_conversations
+
+    def get_conversation(self, conversation_id: str) -> Optional[StreamingConversation]:
+        return self.conversations.get(conversation_id)
+
+    async def start_conversation(
+        self,
+        conversation_factory: ConversationFactory,
+        conversation_id: Optional[str] = None,
+        snapshot: Optional[bytes] = None,
+    ) -> str:
+        """Builds and starts a conversation, restoring it from `snapshot` if one is given."""
+        if not self.has_capacity():
+            raise ConversationLimitExceeded(f"Already running {self.max_conversations} conversations")
+        conversation_id = conversation_id or create_conversation_id()
+        conversation = conversation_factory(conversation_id)
+        if snapshot is not None:
+            restore_conversation(conversation, snapshot)
+        # Reserve the slot before awaiting so concurrent admissions can't overshoot
+        self.conversations[conversation_id] = conversation
+        try:
+            await conversation.start()
+        except Exception:
+            self.conversations.pop(conversation_id, None)
+            raise
+        self.reaper.register(conversation)
+        self.reaper.start()
+        self._watchers[conversation_id] = asyncio.create_task(self._watch(conversation_id, conversation))
+        return conversation_id
+
+    async def _watch(self, conversation_id: str, conversation: StreamingConversation):
+        await conversation.wait_for_termination()
+        self.conversations.pop(conversation_id, None)
+        self._watchers.pop(conversation_id, None)
+        self.reaper.unregister(conversation_id)
+        # Conversations can be marked terminated (e.g. by the state manager) without releasing anything
+        await conversation.terminate()
+        if self.on_conversation_finished is not None:
+            self.on_conversation_finished(conversation_id)
+
+    def resource_stats(self) -> Dict[str, dict]:
+        """Per-conversation memory and task usage, to find which conversation is holding memory."""
+        return {
+            conversation_id: conversation.resource_account.stats()
+            for conversation_id, conversation in self.conversations.items()
+        }
+
+    def checkpoint_conversation(self, conversation_id: str) -> Optional[bytes]:
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        return snapshot_conversation(conversation)
+
+    async def terminate_conversation(self, conversation_id: str) -> bool:
+        conversation = self.conversations.pop(conversation_id, None)
+        if conversation is None:
+            return False
+        await conversation.terminate()
+        return True
+
+    async def terminate_all(self):
+        await asyncio.gather(
+            *(self.terminate_conversation(conversation_id) for conversation_id in list(self.conversations)),
+            return_exceptions=True,
+        )
+        await self.reaper.stop()
+
+
+def _run_worker(
+    commands: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    events: multiprocessing.Queue,
+    load: multiprocessing.Value,
+    processed: multiprocessing.Value,
+    max_conversations: int,
+    idle_timeout: float,
+    max_duration: Optional[float],
+):
+    """Worker process entrypoint: owns one event loop and one ConversationManager."""
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=create_loop_in_thread, args=(loop,), daemon=True)
+    loop_thread.start()
+
+    def update_load():
+        with load.get_lock():
+            load.value = manager.active_count()
+
+    def finished(conversation_id: str):
+        update_load()
+        events.put(("finished", conversation_id))
+
+    manager = ConversationManager(max_conversations, idle_timeout, max_duration, on_conversation_finished=finished)
+
+    async def start(conversation_factory: ConversationFactory, conversation_id: str, snapshot: Optional[bytes]):
+        try:
+            await manager.start_conversation(conversation_factory, conversation_id, snapshot)
+        except Exception as e:
+            print(f"Worker {os.getpid()} failed to start conversation {conversation_id}: {e}")
+            events.put(("finished", conversation_id))
+        update_load()
+        with processed.get_lock():
+            processed.value += 1
+
+    async def terminate(conversation_id: str):
+        await manager.terminate_conversation(conversation_id)
+        update_load()
+
+    async def checkpoint(request_id: int, conversation_id: str, terminate_after: bool):
+        try:
+            results.put((request_id, manager.checkpoint_conversation(conversation_id)))
+        except Exception as e:
+            print(f"Worker {os.getpid()} failed to checkpoint conversation {conversation_id}: {e}")
+            results.put((request_id, None))
+            return
+        if terminate_after:
+            await terminate(conversation_id)
+
+    while True:
+        command, *args = commands.get()
+        if command == "start":
+            asyncio.run_coroutine_threadsafe(start(*args), loop)
+        elif command == "terminate":
+            asyncio.run_coroutine_threadsafe(terminate(*args), loop)
+        elif command == "checkpoint":
+            asyncio.run_coroutine_threadsafe(checkpoint(*args), loop)
+        elif command == "stop":
+            asyncio.run_coroutine_threadsafe(manager.terminate_all(), loop).result()
+            break
+    loop.call_soon_threadsafe(loop.stop)
+    loop_thread.join()
+
+
+class ConversationWorker:
+    def __init__(self, max_conversations: int, idle_timeout: float = 60.0, max_duration: Optional[float] = 3600.0):
+        self.commands = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.events = multiprocessing.Queue()  # ("finished", conversation_id) however a conversation ends
+        self.load = multiprocessing.Value("i", 0)
+        self.processed = multiprocessing.Value("i", 0)
+        self.dispatched = 0
+        self.next_request_id = 0
+        self.process = multiprocessing.Process(
+            target=_run_worker,
+            args=(self.commands, self.results, self.events, self.load, self.processed, max_conversations, idle_timeout, max_duration),
+            daemon=True,
+        )
+
+    def current_load(self) -> int:
+        # Count conversations dispatched but not yet picked up by the worker
+        return self.load.value + self.dispatched - self.processed.value
+
+    def finished_conversations(self) -> List[str]:
+        """Ids of conversations that have ended on this worker since the last call."""
+        conversation_ids = []
+        while True:
+            try:
+                _, conversation_id = self.events.get_nowait()
+            except queue.Empty:
+                return conversation_ids
+            conversation_ids.append(conversation_id)
+
+    def request(self, command: str, *args, timeout: float = 5.0):
+        """Sends a command that replies on `results` and waits for its reply.
+
+        Replies carry the request id, so a late reply to a request that already timed out
+        is discarded instead of being taken as the answer to this one.
+        """
+        request_id = self.next_request_id
+        self.next_request_id += 1
+        self.commands.put((command, request_id, *args))
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise queue.Empty
+            reply_id, reply = self.results.get(timeout=remaining)
+            if reply_id == request_id:
+                return reply
+
+
+class ShardedConversationManager:
+    """Shards conversations across one worker process (and event loop) per core.
+
+    The dispatcher only picks the least-loaded worker and forwards the
+    conversation factory, which must be picklable (e.g. a module-level function).
+    """
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        max_conversations_per_worker: int = 100,
+        idle_timeout: float = 60.0,
+        max_duration: Optional[float] = 3600.0,
+    ):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_conversations_per_worker = max_conversations_per_worker
+        self.idle_timeout = idle_timeout
+        self.max_duration = max_duration
+        self.workers: List[ConversationWorker] = []
+        self.conversation_workers: Dict[str, ConversationWorker] = {}
+        self.conversation_factories: Dict[str, ConversationFactory] = {}
+
+    def start(self):
+        for _ in range(self.num_workers):
+            worker = ConversationWorker(self.max_conversations_per_worker, self.idle_timeout, self.max_duration)
+            worker.process.start()
+            self.workers.append(worker)
+
+    def prune_finished(self):
+        """Forgets conversations that ended on their own (idle timeout, max duration, hang-up)."""
+        for worker in self.workers:
+            for conversation_id in worker.finished_conversations():
+                # A migrated conversation finishing on its old worker must not drop its new entry
+                if self.conversation_workers.get(conversation_id) is worker:
+                    del self.conversation_workers[conversation_id]
+                    self.conversation_factories.pop(conversation_id, None)
+
+    def _pick_worker(self, exclude: Optional[ConversationWorker] = None) -> ConversationWorker:
+        candidates = [worker for worker in self.workers if worker is not exclude] or self.workers
+        worker = min(candidates, key=lambda worker: worker.current_load())
+        if worker.current_load() >= self.max_conversations_per_worker:
+            raise ConversationLimitExceeded("All conversation workers are at capacity")
+        return worker
+
+    def start_conversation(
+        self,
+        conversation_factory: ConversationFactory,
+        snapshot: Optional[bytes] = None,
+        conversation_id: Optional[str] = None,
+        worker: Optional[ConversationWorker] = None,
+    ) -> str:
+        """Dispatches a new conversation, or one restored from `snapshot`, to a worker."""
+        self.prune_finished()
+        worker = worker or self._pick_worker()
+        conversation_id = conversation_id or create_conversation_id()
+        worker.dispatched += 1
+        worker.commands.put(("start", conversation_factory, conversation_id, snapshot))
+        self.conversation_workers[conversation_id] = worker
+        self.conversation_factories[conversation_id] = conversation_factory
+        return conversation_id
+
+    def checkpoint_conversation(
+        self,
+        conversation_id: str,
+        terminate: bool = False,
+        timeout: float = 5.0,
+    ) -> Optional[bytes]:
+        """Fetches a snapshot of a running conversation, e.g. to persist for crash recovery."""
+        worker = self.conversation_workers.get(conversation_id)
+        if worker is None:
+            return None
+        snapshot = worker.request("checkpoint", conversation_id, terminate, timeout=timeout)
+        if terminate:
+            self.conversation_workers.pop(conversation_id, None)
+            self.conversation_factories.pop(conversation_id, None)
+        return snapshot
+
+    def migrate_conversation(self, conversation_id: str, target: Optional[ConversationWorker] = None) -> bool:
+        """Moves a conversation to `target` (by default the least-loaded other worker) without losing context."""
+        source = self.conversation_workers.get(conversation_id)
+        if source is None:
+            return False
+        target = target or self._pick_worker(exclude=source)
+        if target is source:
+            return False
+        conversation_factory = self.conversation_factories[conversation_id]  # read before the checkpoint drops it
+        snapshot = self.checkpoint_conversation(conversation_id, terminate=True)
+        if snapshot is None:
+            return False
+        self.start_conversation(conversation_factory, snapshot, conversation_id, worker=target)
+        return True
+
+    def terminate_conversation(self, conversation_id: str) -> bool:
+        worker = self.conversation_workers.pop(conversation_id, None)
+        self.conversation_factories.pop(conversation_id, None)
+        if worker is None:
+            return False
+        worker.commands.put(("terminate", conversation_id))
+        return True
+
+    def total_load(self) -> int:
+        self.prune_finished()
+        return sum(worker.load.value for worker in self.workers)
+
+    def stop(self, timeout: Optional[float] = None):
+        for worker in self.workers:
+            worker.commands.put(("stop",))
+        for worker in self.workers:
+            worker.process.join(timeout)
+        self.workers = []
+        self.conversation_workers = {}
+        self.conversation_factories = {}
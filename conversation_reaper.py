@@ -0,0 +1,180 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Set
+
+IDLE = "idle"
+MAX_DURATION = "max_duration"
+
+
+class TimerWheel:
+    """Hashed timing wheel keyed by conversation id.
+
+    `schedule` only records the new deadline, so pushing a deadline back is O(1). An entry
+    stays in the slot it was first placed in; when that slot comes round and the recorded
+    deadline has moved, the entry is re-slotted instead of expiring.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, num_slots: int = 512):
+        self.tick_seconds = tick_seconds
+        self.num_slots = num_slots
+        self.slots: List[Set[str]] = [set() for _ in range(num_slots)]
+        self.deadlines: Dict[str, int] = {}  # key -> deadline tick
+        self.current_tick = self.tick_at(time.monotonic())
+
+    def tick_at(self, timestamp: float) -> int:
+        return int(timestamp / self.tick_seconds)
+
+    def schedule(self, key: str, deadline: float):
+        deadline_tick = max(self.tick_at(deadline), self.current_tick + 1)
+        previous_tick = self.deadlines.get(key)
+        if previous_tick is None or deadline_tick < previous_tick:
+            # Only an earlier deadline needs a new slot; a later one is picked up when the old slot fires
+            self.slots[deadline_tick % self.num_slots].add(key)
+        self.deadlines[key] = deadline_tick
+
+    def cancel(self, key: str):
+        # The slot entry is dropped lazily when its slot is next visited
+        self.deadlines.pop(key, None)
+
+    def advance(self, now: float) -> List[str]:
+        """Moves the wheel up to `now` and returns the keys whose deadline has passed."""
+        expired = []
+        target_tick = self.tick_at(now)
+        while self.current_tick < target_tick:
+            self.current_tick += 1
+            slot = self.slots[self.current_tick % self.num_slots]
+            due, slot_keys = [], list(slot)
+            slot.clear()
+            for key in slot_keys:
+                deadline_tick = self.deadlines.get(key)
+                if deadline_tick is None:
+                    continue
+                if deadline_tick <= self.current_tick:
+                    del self.deadlines[key]
+                    due.append(key)
+                else:
+                    self.slots[deadline_tick % self.num_slots].add(key)
+            expired.extend(due)
+        return expired
+
+    def __len__(self):
+        return len(self.deadlines)
+
+
+class _ReaperEntry:
+    __slots__ = ("conversation", "started_at", "last_activity", "paused")
+
+    def __init__(self, conversation: "StreamingConversation", now: float):
+        self.conversation = conversation
+        self.started_at = now
+        self.last_activity = now
+        self.paused = False
+
+
+class ConversationReaper:
+    """Terminates conversations that have been idle for `idle_timeout` or running for `max_duration` seconds.
+
+    `touch` is called for every audio chunk, so it only updates a timestamp; the wheel works
+    out the real deadline when the conversation's slot comes round. While the idle check is
+    paused only the max-duration deadline applies.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = 60.0,
+        max_duration: Optional[float] = 3600.0,
+        tick_seconds: float = 1.0,
+        num_slots: int = 512,
+    ):
+        self.idle_timeout = idle_timeout
+        self.max_duration = max_duration
+        self.wheel = TimerWheel(tick_seconds, num_slots)
+        self.entries: Dict[str, _ReaperEntry] = {}
+        self.reaped = {IDLE: 0, MAX_DURATION: 0}
+        self.reap_tasks: Set[asyncio.Task] = set()
+        self.run_task: Optional[asyncio.Task] = None
+
+    def _deadline(self, entry: _ReaperEntry) -> float:
+        deadlines = []
+        if not entry.paused:
+            deadlines.append(entry.last_activity + self.idle_timeout)
+        if self.max_duration is not None:
+            deadlines.append(entry.started_at + self.max_duration)
+        # A paused conversation without a max duration is re-checked once per idle timeout
+        return min(deadlines) if deadlines else time.monotonic() + self.idle_timeout
+
+    def register(self, conversation: "StreamingConversation"):
+        entry = _ReaperEntry(conversation, time.monotonic())
+        self.entries[conversation.id] = entry
+        self.wheel.schedule(conversation.id, self._deadline(entry))
+        conversation.reaper = self
+
+    def unregister(self, conversation_id: str):
+        entry = self.entries.pop(conversation_id, None)
+        self.wheel.cancel(conversation_id)
+        if entry is not None and entry.conversation.reaper is self:
+            entry.conversation.reaper = None
+
+    def touch(self, conversation_id: str):
+        entry = self.entries.get(conversation_id)
+        if entry is not None:
+            entry.last_activity = time.monotonic()
+
+    def pause(self, conversation_id: str):
+        entry = self.entries.get(conversation_id)
+        if entry is not None:
+            entry.paused = True
+
+    def resume(self, conversation_id: str):
+        entry = self.entries.get(conversation_id)
+        if entry is not None and entry.paused:
+            entry.paused = False
+            # Silence while paused doesn't count against the caller
+            entry.last_activity = time.monotonic()
+            self.wheel.schedule(conversation_id, self._deadline(entry))
+
+    def check(self, now: Optional[float] = None) -> List[str]:
+        """Advances the wheel and starts terminating every conversation past its deadline."""
+        now = time.monotonic() if now is None else now
+        reaped = []
+        for conversation_id in self.wheel.advance(now):
+            entry = self.entries.get(conversation_id)
+            if entry is None:
+                continue
+            deadline = self._deadline(entry)
+            if deadline > now:
+                self.wheel.schedule(conversation_id, deadline)
+                continue
+            reason = MAX_DURATION if self.max_duration is not None and now >= entry.started_at + self.max_duration else IDLE
+            self.reaped[reason] += 1
+            print(f"Reaping conversation {conversation_id} ({reason})")
+            self.unregister(conversation_id)
+            task = asyncio.create_task(entry.conversation.terminate())
+            self.reap_tasks.add(task)
+            task.add_done_callback(self.reap_tasks.discard)
+            reaped.append(conversation_id)
+        return reaped
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.wheel.tick_seconds)
+            self.check()
+
+    def start(self):
+        if self.run_task is None or self.run_task.done():
+            self.run_task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.run_task is not None:
+            self.run_task.cancel()
+            self.run_task = None
+        if self.reap_tasks:
+            await asyncio.gather(*self.reap_tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": len(self.entries),
+            "paused": sum(entry.paused for entry in self.entries.values()),
+            "reaped_idle": self.reaped[IDLE],
+            "reaped_max_duration": self.reaped[MAX_DURATION],
+        }
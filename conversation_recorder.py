@@ -0,0 +1,351 @@
+import bisect
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import urllib.parse
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from audio_format import AudioFormat
+
+# Segment layout: SEGMENT_MAGIC | version (u8) | segment number (u32) | records
+# record: kind (u8) | timestamp (f64, seconds since the recording started) | length (u32) | payload
+# Segments are preallocated and zero-filled, so a record kind of 0 marks the end of the data.
+# The index file holds an _INDEX_ENTRY for every record so replay can seek by time
+# without scanning; if it is missing (e.g. after a crash) the segments are scanned instead.
+SEGMENT_MAGIC = b"IMRS"
+INDEX_MAGIC = b"IMRI"
+RECORDING_VERSION = 1
+DEFAULT_SEGMENT_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_QUEUED_BYTES = 16 * 1024 * 1024
+FILE_MODE = 0o600  # recordings hold the callers' voices, so only the owner may read them
+
+_SEGMENT_HEADER = struct.Struct("<4sBI")
+_RECORD_HEADER = struct.Struct("<BdI")
+_INDEX_HEADER = struct.Struct("<4sBI")
+_INDEX_ENTRY = struct.Struct("<dBIII")  # timestamp, kind, segment, offset, length
+
+INPUT_AUDIO = 1
+OUTPUT_AUDIO = 2
+HUMAN_TURN = 3
+AGENT_TURN = 4
+INTERRUPT = 5
+
+_OPEN = "open"
+_APPEND = "append"
+_CLOSE = "close"
+
+
+class RecordingError(Exception):
+    pass
+
+
+def _file_stem(conversation_id: str) -> str:
+    """Percent-encodes the id so separators like "/" can't take a recording outside its directory."""
+    if not conversation_id:
+        raise RecordingError("A recording needs a conversation id")
+    return urllib.parse.quote(conversation_id, safe="")
+
+
+def segment_path(directory: str, conversation_id: str, segment: int) -> str:
+    return os.path.join(directory, f"{_file_stem(conversation_id)}.{segment:05d}.seg")
+
+
+def index_path(directory: str, conversation_id: str) -> str:
+    return os.path.join(directory, f"{_file_stem(conversation_id)}.idx")
+
+
+class _SegmentFile:
+    """One recording's current memory-mapped segment; only touched by the writer thread."""
+
+    def __init__(self, directory: str, conversation_id: str, segment_bytes: int, metadata: Dict):
+        self.directory = directory
+        self.conversation_id = conversation_id
+        self.segment_bytes = segment_bytes
+        self.metadata = metadata
+        self.index: List[Tuple[float, int, int, int, int]] = []
+        self.segment = -1
+        self.mm: Optional[mmap.mmap] = None
+        self.offset = 0
+        self._open_segment(segment_bytes)
+
+    def _open_segment(self, size: int):
+        self._close_segment()
+        self.segment += 1
+        fd = os.open(segment_path(self.directory, self.conversation_id, self.segment), os.O_RDWR | os.O_CREAT | os.O_TRUNC, FILE_MODE)
+        try:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        _SEGMENT_HEADER.pack_into(self.mm, 0, SEGMENT_MAGIC, RECORDING_VERSION, self.segment)
+        self.offset = _SEGMENT_HEADER.size
+
+    def _close_segment(self):
+        if self.mm is None:
+            return
+        self.mm.flush()
+        self.mm.close()
+        self.mm = None
+        # Give back the preallocated space this segment didn't use
+        os.truncate(segment_path(self.directory, self.conversation_id, self.segment), self.offset)
+
+    def append(self, kind: int, timestamp: float, payload):
+        size = _RECORD_HEADER.size + len(payload)
+        if self.offset + size > len(self.mm):
+            self._open_segment(max(self.segment_bytes, _SEGMENT_HEADER.size + size))
+        _RECORD_HEADER.pack_into(self.mm, self.offset, kind, timestamp, len(payload))
+        payload_offset = self.offset + _RECORD_HEADER.size
+        self.mm[payload_offset:payload_offset + len(payload)] = payload
+        self.index.append((timestamp, kind, self.segment, payload_offset, len(payload)))
+        self.offset += size
+
+    def close(self):
+        self._close_segment()
+        metadata = json.dumps(dict(self.metadata, segments=self.segment + 1)).encode("utf-8")
+        fd = os.open(index_path(self.directory, self.conversation_id), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, FILE_MODE)
+        with os.fdopen(fd, "wb") as index_file:
+            index_file.write(_INDEX_HEADER.pack(INDEX_MAGIC, RECORDING_VERSION, len(metadata)))
+            index_file.write(metadata)
+            index_file.write(b"".join(_INDEX_ENTRY.pack(*entry) for entry in self.index))
+
+
+class RecordingWriter:
+    """Background thread that writes every recording in the process into mmap'd segment files.
+
+    The event loop only timestamps a chunk and puts a reference to it on a queue; copying
+    into the segment, rotating segments and writing the index all happen on this thread.
+    At most `max_queued_bytes` of audio wait on the queue. If the disk falls behind further,
+    new audio is dropped and counted rather than blocking the event loop; markers and
+    open/close requests are never dropped.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = DEFAULT_SEGMENT_BYTES, max_queued_bytes: int = DEFAULT_MAX_QUEUED_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_queued_bytes = max_queued_bytes
+        self.queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.files: Dict[str, _SegmentFile] = {}
+        self.bytes_written = 0
+        self.queued_bytes = 0
+        self.dropped_chunks = 0
+        self.dropped_bytes = 0
+        self.thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._queued_lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="recording-writer", daemon=True)
+                self.thread.start()
+
+    def submit(self, *operation):
+        self.queue.put(operation)
+
+    def submit_audio(self, conversation_id: str, kind: int, timestamp: float, audio_chunk) -> bool:
+        """Queues an audio append unless that would exceed `max_queued_bytes`; False if it was dropped."""
+        size = len(audio_chunk)
+        with self._queued_lock:
+            if self.queued_bytes + size > self.max_queued_bytes:
+                self.dropped_chunks += 1
+                self.dropped_bytes += size
+                return False
+            self.queued_bytes += size
+        self.queue.put((_APPEND, conversation_id, kind, timestamp, audio_chunk))
+        return True
+
+    def _run(self):
+        while True:
+            operation = self.queue.get()
+            if operation is None:
+                for segment_file in self.files.values():
+                    segment_file.close()
+                self.files = {}
+                break
+            try:
+                self._apply(*operation)
+            except Exception as e:
+                print(f"Recording writer failed on {operation[0]} for {operation[1]}: {e}")
+
+    def _apply(self, op: str, conversation_id: str, *args):
+        if op == _APPEND:
+            kind, _, payload = args
+            try:
+                segment_file = self.files.get(conversation_id)
+                if segment_file is not None:
+                    segment_file.append(*args)
+                    self.bytes_written += len(payload)
+            finally:
+                if kind in (INPUT_AUDIO, OUTPUT_AUDIO):
+                    with self._queued_lock:
+                        self.queued_bytes -= len(payload)
+        elif op == _OPEN:
+            self.files[conversation_id] = _SegmentFile(self.directory, conversation_id, self.segment_bytes, args[0])
+        elif op == _CLOSE:
+            segment_file = self.files.pop(conversation_id, None)
+            if segment_file is not None:
+                segment_file.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "bytes_written": self.bytes_written,
+            "queued_bytes": self.queued_bytes,
+            "dropped_chunks": self.dropped_chunks,
+            "dropped_bytes": self.dropped_bytes,
+        }
+
+    def stop(self):
+        """Finishes every queued write, closes open recordings and stops the thread."""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+
+class ConversationRecorder:
+    """Records both sides of one conversation, plus turn and interruption markers."""
+
+    def __init__(
+        self,
+        writer: RecordingWriter,
+        conversation_id: str,
+        input_format: AudioFormat,
+        output_format: AudioFormat,
+    ):
+        self.writer = writer
+        self.conversation_id = conversation_id
+        self.started_at = time.monotonic()
+        self.is_closed = False
+        self.dropped_chunks = 0
+        writer.start()
+        writer.submit(_OPEN, conversation_id, {
+            "conversation_id": conversation_id,
+            "started_at": time.time(),
+            "input_format": [input_format.sampling_rate, input_format.encoding],
+            "output_format": [output_format.sampling_rate, output_format.encoding],
+        })
+
+    def _record(self, kind: int, payload):
+        if not self.is_closed:
+            self.writer.submit(_APPEND, self.conversation_id, kind, time.monotonic() - self.started_at, payload)
+
+    def _record_audio(self, kind: int, audio_chunk):
+        # Chunks are immutable bytes or views of them, so the writer thread can copy them later
+        if not self.is_closed and not self.writer.submit_audio(
+            self.conversation_id, kind, time.monotonic() - self.started_at, audio_chunk
+        ):
+            self.dropped_chunks += 1
+
+    def record_input(self, audio_chunk: bytes):
+        self._record_audio(INPUT_AUDIO, audio_chunk)
+
+    def record_output(self, audio_chunk):
+        self._record_audio(OUTPUT_AUDIO, audio_chunk)
+
+    def mark_human_turn(self, message: str):
+        self._record(HUMAN_TURN, message.encode("utf-8"))
+
+    def mark_agent_turn(self, message: str):
+        self._record(AGENT_TURN, message.encode("utf-8"))
+
+    def mark_interrupt(self):
+        self._record(INTERRUPT, b"")
+
+    def close(self):
+        if not self.is_closed:
+            self.is_closed = True
+            self.writer.submit(_CLOSE, self.conversation_id)
+
+
+class RecordingReader:
+    """Random access to a finished recording by time and record kind."""
+
+    def __init__(self, directory: str, conversation_id: str):
+        self.directory = directory
+        self.conversation_id = conversation_id
+        self._segments: Dict[int, mmap.mmap] = {}
+        try:
+            self.metadata, self.entries = self._read_index()
+        except FileNotFoundError:
+            self.metadata, self.entries = {}, self._scan_segments()
+        self.timestamps = [entry[0] for entry in self.entries]
+
+    def _read_index(self):
+        with open(index_path(self.directory, self.conversation_id), "rb") as index_file:
+            data = index_file.read()
+        magic, version, metadata_length = _INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC:
+            raise RecordingError("Not a recording index")
+        if version > RECORDING_VERSION:
+            raise RecordingError(f"Recording index version {version} is newer than supported ({RECORDING_VERSION})")
+        start = _INDEX_HEADER.size + metadata_length
+        metadata = json.loads(data[_INDEX_HEADER.size:start])
+        entries = [entry for entry in _INDEX_ENTRY.iter_unpack(data[start:])]
+        return metadata, entries
+
+    def _scan_segments(self) -> List[Tuple[float, int, int, int, int]]:
+        entries = []
+        segment = 0
+        while os.path.exists(segment_path(self.directory, self.conversation_id, segment)):
+            mm = self._segment(segment)
+            offset = _SEGMENT_HEADER.size
+            while offset + _RECORD_HEADER.size <= len(mm):
+                kind, timestamp, length = _RECORD_HEADER.unpack_from(mm, offset)
+                if kind == 0 or offset + _RECORD_HEADER.size + length > len(mm):
+                    break
+                entries.append((timestamp, kind, segment, offset + _RECORD_HEADER.size, length))
+                offset += _RECORD_HEADER.size + length
+            segment += 1
+        return entries
+
+    def _segment(self, segment: int) -> mmap.mmap:
+        mm = self._segments.get(segment)
+        if mm is None:
+            with open(segment_path(self.directory, self.conversation_id, segment), "rb") as segment_file:
+                mm = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._segments[segment] = mm
+        return mm
+
+    def audio_format(self, kind: int) -> Optional[AudioFormat]:
+        key = "input_format" if kind == INPUT_AUDIO else "output_format"
+        return AudioFormat(*self.metadata[key]) if key in self.metadata else None
+
+    def records(
+        self,
+        start: float = 0.0,
+        end: Optional[float] = None,
+        kinds: Optional[Tuple[int, ...]] = None,
+    ) -> Iterator[Tuple[float, int, memoryview]]:
+        """Yields (timestamp, kind, payload) for records in [start, end), seeking straight to `start`.
+
+        Payloads are views into the segment files and are only valid until `close`.
+        """
+        for i in range(bisect.bisect_left(self.timestamps, start), len(self.entries)):
+            timestamp, kind, segment, offset, length = self.entries[i]
+            if end is not None and timestamp >= end:
+                break
+            if kinds is None or kind in kinds:
+                yield timestamp, kind, memoryview(self._segment(segment))[offset:offset + length]
+
+    def audio(self, kind: int, start: float = 0.0, end: Optional[float] = None) -> bytes:
+        return b"".join(payload for _, _, payload in self.records(start, end, (kind,)))
+
+    def markers(self) -> List[Tuple[float, int, str]]:
+        return [
+            (timestamp, kind, bytes(payload).decode("utf-8"))
+            for timestamp, kind, payload in self.records(kinds=(HUMAN_TURN, AGENT_TURN, INTERRUPT))
+        ]
+
+    def close(self):
+        for mm in self._segments.values():
+            mm.close()
+        self._segments = {}
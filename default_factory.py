@@ -1,147 +1,198 @@
 import asyncio
-import requests
-import threading
-from streaming_conversation import StreamingConversation
+import copy
+from typing import Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+from audio_format import AudioFormat
+from audio_pipeline import OutputDeviceType
+from base_agent import AgentConfig, BaseAgent
+from base_synthesizer import BaseSynthesizer
 from base_transcriber import BaseTranscriber
-from base_synthesizer import BaseSynthesizer, SynthesisResult
 from chat_gpt_agent import ChatGPTAgent, ChatGPTAgentConfig
-from default_factory import DefaultAgentFactory
-from audio_pipeline import create_microphone_input_and_speaker_output
-
-# Custom Grok Transcriber
-class GrokTranscriber(BaseTranscriber):
-    def __init__(self, config, api_key):
-        super().__init__(config)
-        self.api_key = api_key
-        self.endpoint = "https://api.x.ai/stt"  # Replace with actual Grok STT endpoint
-        self.is_speech = False
-        self.is_running = False
-
-    async def start(self):
-        self.is_running = True
-        print("GrokTranscriber started")
-
-    async def process(self, audio_chunk):
-        if not self.is_running:
-            return None
-        response = requests.post(
-            self.endpoint,
-            headers={"Authorization": f"Bearer {self.api_key}"},
-            data=audio_chunk
+from groq_transcriber import WhisperTranscriber, WhisperTranscriberConfig
+from lemonfox_synthesizer import LemonFoxSynthesizer, LemonFoxSynthesizerConfig
+from streaming_conversation import StreamingConversation
+
+ComponentType = TypeVar("ComponentType")
+
+
+def config_key(config) -> Hashable:
+    """Hashable value of a plain config object, including nested configs."""
+    if hasattr(config, "__dict__"):
+        return (type(config).__name__,) + tuple(
+            (name, config_key(value)) for name, value in sorted(vars(config).items())
         )
-        result = response.json()
-        transcription = result.get("transcription", "")
-        self.is_speech = result.get("is_speech", len(transcription) > 0)
-        if self.is_speech and transcription:
-            return {"message": transcription, "is_final": True, "is_interrupt": self.is_speech}
-        return None
-
-    async def stop(self):
-        self.is_running = False
-        print("GrokTranscriber stopped")
-
-# Custom LemonFox Synthesizer
-class LemonFoxSynthesizer(BaseSynthesizer):
-    def __init__(self, config, api_key):
-        super().__init__(config)
-        self.api_key = api_key
-        self.endpoint = "https://api.lemonfox.ai/tts"  # Replace with actual LemonFox TTS endpoint
-        self.is_synthesizing = False
-
-    async def create_speech(self, text, chunk_size):
-        if not text:
-            return SynthesisResult(None, chunk_size)
-        response = requests.post(
-            self.endpoint,
-            headers={"Authorization": f"Bearer {self.api_key}"},
-            json={"text": text, "format": self.config.audio_encoding, "sampling_rate": self.config.sampling_rate}
+    if isinstance(config, (list, tuple)):
+        return tuple(config_key(value) for value in config)
+    if isinstance(config, dict):
+        return tuple((name, config_key(value)) for name, value in sorted(config.items()))
+    return config
+
+
+class ComponentPool(Generic[ComponentType]):
+    """Idle, already connected components built from one config."""
+
+    def __init__(self, name: str, config, build: Callable[[], ComponentType], max_idle: int):
+        self.name = name
+        self.config = config
+        self.build = build
+        self.max_idle = max_idle
+        self.idle: List[ComponentType] = []
+        self.in_use = 0
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self) -> ComponentType:
+        self.in_use += 1
+        if self.idle:
+            self.hits += 1
+            return self.idle.pop()
+        self.misses += 1
+        return self.build()
+
+    def release(self, component: ComponentType) -> bool:
+        """Keeps `component` for reuse; False if the pool is full and the caller should close it."""
+        self.in_use -= 1
+        if len(self.idle) < self.max_idle:
+            self.idle.append(component)
+            return True
+        return False
+
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "idle": len(self.idle),
+            "in_use": self.in_use,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+        }
+
+
+async def _close_component(component):
+    if isinstance(component, BaseAgent):
+        await component.terminate()
+    elif isinstance(component, BaseTranscriber):
+        await component.stop()
+    elif isinstance(component, BaseSynthesizer):
+        await component.tear_down()
+
+
+class DefaultAgentFactory:
+    """Hands out pooled agents, transcribers and synthesizers, keyed by their config.
+
+    Components are built from a private copy of the config, prewarmed by `prefill`, and
+    reset rather than closed when a conversation releases them, so a new conversation
+    with a known config gets components whose clients and connections already exist.
+    """
+
+    def __init__(self, max_idle_per_config: int = 8):
+        self.max_idle_per_config = max_idle_per_config
+        self.builders: Dict[type, Callable[..., object]] = {
+            ChatGPTAgentConfig: ChatGPTAgent,
+            WhisperTranscriberConfig: WhisperTranscriber,
+            LemonFoxSynthesizerConfig: LemonFoxSynthesizer,
+        }
+        self.pools: Dict[Hashable, ComponentPool] = {}
+        self._owners: Dict[int, ComponentPool] = {}
+
+    def register(self, config_type: type, build: Callable[..., object]):
+        """Registers how to build a component from configs of `config_type` (called as `build(config, *args)`)."""
+        self.builders[config_type] = build
+
+    def get_pool(self, config, *args) -> ComponentPool:
+        key = (config_key(config), args)
+        pool = self.pools.get(key)
+        if pool is None:
+            build = self.builders.get(type(config))
+            if build is None:
+                raise ValueError(f"No component registered for {type(config).__name__}")
+            # Components may change their config (e.g. audio format negotiation), so each gets its own copy
+            pool_config = copy.deepcopy(config)
+            pool = ComponentPool(
+                f"{type(config).__name__}#{len(self.pools)}",
+                pool_config,
+                lambda: build(copy.deepcopy(pool_config), *args),
+                self.max_idle_per_config,
+            )
+            self.pools[key] = pool
+        return pool
+
+    def _acquire(self, config, *args):
+        pool = self.get_pool(config, *args)
+        component = pool.acquire()
+        self._owners[id(component)] = pool
+        return component
+
+    def create_agent(self, agent_config: AgentConfig, openai_api_key: Optional[str] = None) -> BaseAgent:
+        return self._acquire(agent_config, openai_api_key)
+
+    def create_transcriber(self, transcriber_config) -> BaseTranscriber:
+        return self._acquire(transcriber_config)
+
+    def create_synthesizer(self, synthesizer_config) -> BaseSynthesizer:
+        return self._acquire(synthesizer_config)
+
+    def create_conversation(
+        self,
+        output_device: OutputDeviceType,
+        agent_config: AgentConfig,
+        transcriber_config,
+        synthesizer_config,
+        openai_api_key: Optional[str] = None,
+        **conversation_kwargs,
+    ) -> StreamingConversation:
+        """Builds a conversation from pooled components; they return to the pools when it terminates."""
+        return StreamingConversation(
+            output_device,
+            self.create_transcriber(transcriber_config),
+            self.create_agent(agent_config, openai_api_key),
+            self.create_synthesizer(synthesizer_config),
+            component_factory=self,
+            **conversation_kwargs,
         )
-        audio_data = response.content
-        self.is_synthesizing = True
-        return SynthesisResult(audio_data, chunk_size)
-
-    async def stop(self):
-        self.is_synthesizing = False
-        print("LemonFoxSynthesizer stopped")
-
-# Simplified Configurations
-class EndpointingConfig:
-    def __init__(self, min_speech_duration=0.3, min_silence_duration=0.5, sensitivity=0.8):
-        self.min_speech_duration = min_speech_duration
-        self.min_silence_duration = min_silence_duration
-        self.sensitivity = sensitivity
-
-class TranscriberConfig:
-    def __init__(self, sampling_rate=16000, audio_encoding="linear16", endpointing_config=None):
-        self.sampling_rate = sampling_rate
-        self.audio_encoding = audio_encoding
-        self.endpointing_config = endpointing_config
-
-class SynthesizerConfig:
-    def __init__(self, sampling_rate=16000, audio_encoding="mp3"):
-        self.sampling_rate = sampling_rate
-        self.audio_encoding = audio_encoding
-
-async def main():
-    # Audio input/output
-    microphone_input, speaker_output = create_microphone_input_and_speaker_output(use_default_devices=True)
-
-    # Configure endpointing for interruption detection
-    endpointing_config = EndpointingConfig()
-
-    # Initialize components
-    transcriber = GrokTranscriber(
-        config=TranscriberConfig(endpointing_config=endpointing_config),
-        api_key="your_grok_api_key"
-    )
-    agent_config = ChatGPTAgentConfig(model_name="gpt-4", max_tokens=500, temperature=0.7)
-    agent = DefaultAgentFactory().create_agent(agent_config)
-    agent.agent_responses_consumer = None  # To be set later
-    agent.openai_api_key = "your_openai_api_key"  # Assuming chat_gpt_agent.py accepts this
-    synthesizer = LemonFoxSynthesizer(
-        config=SynthesizerConfig(),
-        api_key="your_lemonfox_api_key"
-    )
-
-    # Set up conversation with interruption handling
-    conversation = StreamingConversation(
-        output_device=speaker_output,
-        transcriber=transcriber,
-        agent=agent,
-        synthesizer=synthesizer
-    )
-    agent.agent_responses_consumer = conversation  # Link agent to conversation for response handling
-
-    # Start the conversation
-    await conversation.start()
-    print("Conversation started. Speak to interact, and the assistant will pause on interruptions.")
-
-    # Simple loop to handle interruptions
-    stop_event = threading.Event()
-    while conversation.is_active():
-        audio_chunk = await microphone_input.read()
-        transcription_result = await transcriber.process(audio_chunk)
-        if transcription_result:
-            transcription = type('Transcription', (), transcription_result)  # Dynamic class for compatibility
-            if not conversation.is_human_speaking:
-                stop_event.clear()
-                conversation.current_transcription_is_interrupt = await conversation.broadcast_interrupt()
-                if conversation.current_transcription_is_interrupt:
-                    stop_event.set()
-                conversation.is_human_speaking = True
-            elif transcription_result.get("is_final", False) and conversation.is_human_speaking:
-                conversation.is_human_speaking = False
-                # Simulate agent input for compatibility
-                class AgentInput:
-                    def __init__(self, transcription, conversation_id):
-                        self.transcription = transcription
-                        self.conversation_id = conversation_id
-                        self.is_interrupt = transcription_result.get("is_interrupt", False)
-                agent_input = AgentInput(transcription, conversation.id)
-                await agent.process(InterruptibleEvent(payload=agent_input))
-        await asyncio.sleep(0.1)
-
-    await conversation.terminate()
-
-if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+
+    async def prefill(self, config, count: int, *args):
+        """Builds and prewarms components until `count` are idle for `config`."""
+        pool = self.get_pool(config, *args)
+        components = [pool.build() for _ in range(min(count, pool.max_idle) - len(pool.idle))]
+        await asyncio.gather(*(component.prewarm() for component in components), return_exceptions=True)
+        pool.idle.extend(components)
+
+    async def release(self, component) -> bool:
+        """Resets `component` and returns it to its pool, closing it if the pool is full."""
+        pool = self._owners.pop(id(component), None)
+        if pool is None:
+            return False
+        component.reset()
+        if hasattr(pool.config, "sampling_rate") and hasattr(component, "set_audio_format"):
+            component.set_audio_format(AudioFormat(pool.config.sampling_rate, pool.config.audio_encoding))
+        if hasattr(pool.config, "endpointing_config"):
+            # A restored checkpoint may have replaced it with the migrated conversation's
+            component.config.endpointing_config = copy.deepcopy(pool.config.endpointing_config)
+        if not pool.release(component):
+            await _close_component(component)
+        return True
+
+    async def release_conversation(self, conversation: StreamingConversation):
+        components = (conversation.agent, conversation.transcriber, conversation.synthesizer)
+        released = await asyncio.gather(*(self.release(component) for component in components))
+        # Components the conversation was given directly are closed as usual
+        await asyncio.gather(*(
+            _close_component(component) for component, was_pooled in zip(components, released) if not was_pooled
+        ))
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        stats = {pool.name: pool.stats() for pool in self.pools.values()}
+        hits = sum(pool.hits for pool in self.pools.values())
+        requests = hits + sum(pool.misses for pool in self.pools.values())
+        stats["total"] = {"hits": hits, "requests": requests, "hit_rate": hits / requests if requests else 0.0}
+        return stats
+
+    async def close(self):
+        idle = [component for pool in self.pools.values() for component in pool.idle]
+        for pool in self.pools.values():
+            pool.idle = []
+        await asyncio.gather(*(_close_component(component) for component in idle), return_exceptions=True)
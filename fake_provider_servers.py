@@ -0,0 +1,234 @@
+import asyncio
+import json
+import math
+import multiprocessing
+import random
+from typing import Dict, Optional
+
+import aiohttp
+from aiohttp import web
+
+
+class LatencyDistribution:
+    """Samples a delay in seconds: constant, uniform or lognormal around `mean_ms`."""
+
+    def __init__(self, mean_ms: float = 0.0, stddev_ms: float = 0.0, kind: str = "lognormal", seed: Optional[int] = None):
+        self.mean_ms = mean_ms
+        self.stddev_ms = stddev_ms
+        self.kind = kind
+        self.random = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.mean_ms <= 0:
+            return 0.0
+        if self.kind == "constant" or self.stddev_ms <= 0:
+            return self.mean_ms / 1000
+        if self.kind == "uniform":
+            return max(0.0, self.random.uniform(self.mean_ms - self.stddev_ms, self.mean_ms + self.stddev_ms)) / 1000
+        if self.kind == "lognormal":
+            # Parameterise the underlying normal so the lognormal has the requested mean and stddev
+            sigma = math.sqrt(math.log(1 + (self.stddev_ms / self.mean_ms) ** 2))
+            mu = math.log(self.mean_ms) - sigma ** 2 / 2
+            return self.random.lognormvariate(mu, sigma) / 1000
+        raise ValueError(f"Unsupported latency distribution: {self.kind}")
+
+
+class FakeProviderConfig:
+    def __init__(
+        self,
+        transcription_latency: Optional[LatencyDistribution] = None,
+        transcription_text: str = "hello, can you tell me the weather today",
+        llm_first_token_latency: Optional[LatencyDistribution] = None,
+        llm_token_interval: Optional[LatencyDistribution] = None,
+        llm_response_text: str = "Sure. It is sunny with a light breeze and a high of twenty two degrees.",
+        tts_first_byte_latency: Optional[LatencyDistribution] = None,
+        tts_chunk_interval: Optional[LatencyDistribution] = None,
+        tts_chunk_size: int = 4000,
+        tts_chars_per_second: float = 15.0,
+        tts_sampling_rate: int = 16000,
+    ):
+        self.transcription_latency = transcription_latency or LatencyDistribution(300, 100)
+        self.transcription_text = transcription_text
+        self.llm_first_token_latency = llm_first_token_latency or LatencyDistribution(400, 150)
+        self.llm_token_interval = llm_token_interval or LatencyDistribution(15, 5)
+        self.llm_response_text = llm_response_text
+        self.tts_first_byte_latency = tts_first_byte_latency or LatencyDistribution(200, 50)
+        self.tts_chunk_interval = tts_chunk_interval or LatencyDistribution(20, 5)
+        self.tts_chunk_size = tts_chunk_size
+        self.tts_chars_per_second = tts_chars_per_second
+        self.tts_sampling_rate = tts_sampling_rate
+
+
+class FakeProviderServers:
+    """Loopback stand-ins for the Whisper, OpenAI chat completions and LemonFox TTS endpoints.
+
+    Usage:
+        async with FakeProviderServers(config) as servers:
+            WhisperTranscriberConfig(api_key="fake", api_url=servers.whisper_url)
+            ChatGPTAgentConfig(base_url=servers.openai_base_url)
+            LemonFoxSynthesizerConfig(api_key="fake", base_url=servers.lemonfox_url)
+    """
+
+    def __init__(self, config: Optional[FakeProviderConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeProviderConfig()
+        self.host = host
+        self.port = port
+        self.runner: Optional[web.AppRunner] = None
+        # Only counted in the process serving the requests, see fetch_request_counts
+        self.request_counts = {"transcriptions": 0, "chat_completions": 0, "tts": 0}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def whisper_url(self) -> str:
+        return f"{self.base_url}/v1/audio/transcriptions"
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"{self.base_url}/v1"
+
+    @property
+    def lemonfox_url(self) -> str:
+        return f"{self.base_url}/tts"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/audio/transcriptions", self.handle_transcription)
+        app.router.add_post("/v1/chat/completions", self.handle_chat_completion)
+        app.router.add_get("/v1/models", self.handle_models)
+        app.router.add_post("/tts", self.handle_tts)
+        app.router.add_get("/stats", self.handle_stats)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def fetch_request_counts(self) -> Dict[str, int]:
+        """Request counts from the serving process, which may be a child process."""
+        if self.runner:
+            return dict(self.request_counts)
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{self.base_url}/stats") as response:
+                response.raise_for_status()
+                return await response.json()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def handle_transcription(self, request: web.Request) -> web.Response:
+        self.request_counts["transcriptions"] += 1
+        await request.read()
+        await asyncio.sleep(self.config.transcription_latency.sample())
+        return web.json_response({"text": self.config.transcription_text})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.request_counts)
+
+    async def handle_models(self, request: web.Request) -> web.Response:
+        # ChatGPTAgent.prewarm lists models to open its connection
+        return web.json_response({
+            "object": "list",
+            "data": [{"id": "gpt-4", "object": "model", "created": 0, "owned_by": "fake"}],
+        })
+
+    async def handle_chat_completion(self, request: web.Request) -> web.StreamResponse:
+        self.request_counts["chat_completions"] += 1
+        body = await request.json()
+        model = body.get("model", "gpt-4")
+        text = self.config.llm_response_text
+        await asyncio.sleep(self.config.llm_first_token_latency.sample())
+        if not body.get("stream"):
+            return web.json_response({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": 0,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        tokens = text.split(" ")
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.config.llm_token_interval.sample())
+            delta = {"content": token if i == 0 else " " + token}
+            await response.write(self._sse_chunk(model, delta, None))
+        await response.write(self._sse_chunk(model, {}, "stop"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    @staticmethod
+    def _sse_chunk(model: str, delta: dict, finish_reason: Optional[str]) -> bytes:
+        chunk = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+    async def handle_tts(self, request: web.Request) -> web.StreamResponse:
+        self.request_counts["tts"] += 1
+        body = await request.json()
+        text = body.get("text", "")
+        sampling_rate = body.get("sampling_rate", self.config.tts_sampling_rate)
+        bytes_per_sample = 1 if body.get("format") == "ulaw" else 2
+        duration = len(text) / self.config.tts_chars_per_second
+        remaining = int(duration * sampling_rate) * bytes_per_sample
+
+        await asyncio.sleep(self.config.tts_first_byte_latency.sample())
+        response = web.StreamResponse(headers={"Content-Type": "application/octet-stream"})
+        await response.prepare(request)
+        silence = bytes(self.config.tts_chunk_size)
+        first = True
+        while remaining > 0:
+            if not first:
+                await asyncio.sleep(self.config.tts_chunk_interval.sample())
+            first = False
+            size = min(remaining, self.config.tts_chunk_size)
+            await response.write(silence[:size])
+            remaining -= size
+        await response.write_eof()
+        return response
+
+
+def _serve_forever(config: FakeProviderConfig, host: str, port_queue):
+    async def serve():
+        servers = FakeProviderServers(config, host=host)
+        await servers.start()
+        port_queue.put(servers.port)
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def start_fake_provider_servers_process(config: Optional[FakeProviderConfig] = None, host: str = "127.0.0.1"):
+    """Runs the fake servers in a child process so their CPU isn't billed to the code under test.
+
+    Returns the process and a FakeProviderServers handle whose URLs point at it. The handle's
+    own request_counts stay at zero; use fetch_request_counts to read the child's.
+    """
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve_forever,
+        args=(config or FakeProviderConfig(), host, port_queue),
+        daemon=True,
+    )
+    process.start()
+    handle = FakeProviderServers(config, host=host, port=port_queue.get(timeout=30))
+    return process, handle
@@ -1,13 +1,15 @@
 import asyncio
-import aiohttp
 from base_transcriber import BaseTranscriber, TranscriberConfig
+from http_session import KeepAliveSession
+from latency_tracing import ENDPOINT_DETECTED, TRANSCRIPT_RETURNED, get_latency_tracer
 
 WHISPER_API_URL = "https://api.openai.com/v1/audio/transcriptions"
 
 class WhisperTranscriberConfig(TranscriberConfig):
-    def __init__(self, api_key: str, sampling_rate: int = 16000, audio_encoding: str = "linear16", endpointing_config=None):
+    def __init__(self, api_key: str, sampling_rate: int = 16000, audio_encoding: str = "linear16", endpointing_config=None, api_url: str = WHISPER_API_URL):
         super().__init__(sampling_rate, audio_encoding, endpointing_config)
         self.api_key = api_key
+        self.api_url = api_url
 
 class WhisperTranscriber(BaseTranscriber):
     def __init__(self, transcriber_config: WhisperTranscriberConfig):
@@ -20,6 +22,9 @@ class WhisperTranscriber(BaseTranscriber):
         self.audio_buffer = bytearray()
         self.buffer_duration = 0.0  # In seconds
         self.time_silent = 0.0
+        self.speech_duration = 0.0
+        self.force_endpoint = False  # set by resource accounting to flush the buffer early
+        self.http_session = KeepAliveSession()
 
     async def start(self):
         self.is_running = True
@@ -32,59 +37,77 @@ class WhisperTranscriber(BaseTranscriber):
         # Accumulate audio chunks
         byte_rate = self.get_byte_rate()
         chunk_duration = len(audio_chunk) / byte_rate
+        self.track_silence(audio_chunk, chunk_duration)
         self.audio_buffer.extend(audio_chunk)
         self.buffer_duration += chunk_duration
+        resource_account = getattr(self.streaming_conversation, "resource_account", None)
+        if resource_account:
+            resource_account.enforce()
 
         # Check for endpointing
         if self.should_endpoint():
+            conversation_id = getattr(self.streaming_conversation, "id", None)
+            get_latency_tracer().mark(conversation_id, ENDPOINT_DETECTED)
             transcription = await self.transcribe_buffer()
-            if transcription:
+            if transcription or self.force_endpoint:
                 self.audio_buffer.clear()
                 self.buffer_duration = 0.0
                 self.time_silent = 0.0
+                self.speech_duration = 0.0
+                self.force_endpoint = False
+            if transcription:
+                get_latency_tracer().mark(conversation_id, TRANSCRIPT_RETURNED)
                 return {
                     "message": transcription,
                     "is_final": True,
                     "is_interrupt": False
                 }
-        else:
-            self.time_silent += chunk_duration
         return None
 
+
     async def stop(self):
         self.is_running = False
+        await self.http_session.close()
         print("WhisperTranscriber stopped")
 
+    async def prewarm(self):
+        await self.http_session.prewarm(self.config.api_url)
+
+    def reset(self):
+        super().reset()
+        self.is_running = False
+        self.audio_buffer.clear()
+        self.buffer_duration = 0.0
+        self.time_silent = 0.0
+        self.speech_duration = 0.0
+        self.force_endpoint = False
+
     async def terminate(self):
         self._ended = True
         await super().terminate()
 
-    def get_byte_rate(self):
-        return self.config.sampling_rate * (2 if self.config.audio_encoding == "linear16" else 1)
-
-    def should_endpoint(self):
-        endpointing_config = self.config.endpointing_config
-        if not endpointing_config:
-            return self.buffer_duration >= 5.0  # Default to 5 seconds
-        return self.time_silent >= endpointing_config.min_silence_duration
 
     async def transcribe_buffer(self) -> str:
         if not self.audio_buffer:
             return ""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "multipart/form-data"
-        }
+        try:
+            return await self.transcribe_audio(bytes(self.audio_buffer))
+        except Exception as e:
+            print(e)
+            return ""
+
+    async def transcribe_audio(self, audio: bytes) -> str:
+        import aiohttp
+
         form_data = aiohttp.FormData()
-        form_data.add_field('file', bytes(self.audio_buffer), filename='audio.wav', content_type='audio/wav')
+        form_data.add_field('file', audio, filename='audio.wav', content_type='audio/wav')
         form_data.add_field('model', 'whisper-1')
         form_data.add_field('response_format', 'json')
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(WHISPER_API_URL, headers={"Authorization": f"Bearer {self.api_key}"}, data=form_data) as response:
-                if response.status != 200:
-                    error = await response.text()
-                    print(f"Whisper API error: {response.status} - {error}")
-                    return ""
-                result = await response.json()
-                return result.get("text", "")
\ No newline at end of file
+
+        session = self.http_session.get()
+        async with session.post(self.config.api_url, headers={"Authorization": f"Bearer {self.api_key}"}, data=form_data) as response:
+            if response.status != 200:
+                error = await response.text()
+                raise Exception(f"Whisper API error: {response.status} - {error}")
+            result = await response.json()
+            return result.get("text", "")
\ No newline at end of file
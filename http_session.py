@@ -0,0 +1,46 @@
+from typing import Optional
+
+KEEPALIVE_TIMEOUT = 75  # seconds; long enough to carry a connection between turns
+PREWARM_TIMEOUT = 5
+
+
+class KeepAliveSession:
+    """Lazily created aiohttp session that keeps provider connections open across requests.
+
+    aiohttp is only imported when the first session is needed, so importing a
+    transcriber or synthesizer module stays cheap.
+    """
+
+    def __init__(self, keepalive_timeout: float = KEEPALIVE_TIMEOUT):
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+
+    def get(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(keepalive_timeout=self.keepalive_timeout)
+            )
+        return self._session
+
+    async def prewarm(self, url: str, headers: Optional[dict] = None) -> bool:
+        """Resolves, connects and completes the TLS handshake to `url`'s host, leaving the connection pooled.
+
+        Any HTTP status counts as warm; only connection failures return False.
+        """
+        import aiohttp
+
+        try:
+            timeout = aiohttp.ClientTimeout(total=PREWARM_TIMEOUT)
+            async with self.get().head(url, headers=headers, timeout=timeout) as response:
+                await response.release()
+            return True
+        except Exception as e:
+            print(f"Failed to prewarm connection to {url}: {e}")
+            return False
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
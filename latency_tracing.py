@@ -0,0 +1,165 @@
+import json
+import time
+from typing import Dict, List, Optional
+
+ENDPOINT_DETECTED = "endpoint_detected"
+TRANSCRIPT_RETURNED = "transcript_returned"
+FIRST_LLM_TOKEN = "first_llm_token"
+FULL_LLM_RESPONSE = "full_llm_response"
+FIRST_TTS_BYTE = "first_tts_byte"
+FIRST_AUDIO_PLAYED = "first_audio_played"
+TURN_COMPLETE = "turn_complete"
+
+TURN_STAGES = [
+    ENDPOINT_DETECTED,
+    TRANSCRIPT_RETURNED,
+    FIRST_LLM_TOKEN,
+    FULL_LLM_RESPONSE,
+    FIRST_TTS_BYTE,
+    FIRST_AUDIO_PLAYED,
+    TURN_COMPLETE,
+]
+TURN_TOTAL = "turn_total"
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of microsecond values.
+
+    Each power-of-two range is split into 2 ** (sub_bucket_bits - 1) linear buckets,
+    so recorded values keep a relative precision of about 2 ** -(sub_bucket_bits - 1)
+    while recording stays O(1) and memory stays proportional to the dynamic range.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_half = 1 << (sub_bucket_bits - 1)
+        self.counts: Dict[int, int] = {}
+        self.total_count = 0
+        self.total_sum = 0
+        self.max_value = 0
+
+    def _bucket_index(self, value: int) -> int:
+        shift = max(0, value.bit_length() - self.sub_bucket_bits)
+        return shift * self.sub_bucket_half + (value >> shift)
+
+    def _bucket_value(self, index: int) -> int:
+        if index < 2 * self.sub_bucket_half:
+            return index
+        shift = index // self.sub_bucket_half - 1
+        mantissa = index - shift * self.sub_bucket_half
+        # Midpoint of the bucket
+        return (mantissa << shift) + ((1 << shift) >> 1)
+
+    def record(self, value: int):
+        value = max(0, int(value))
+        index = self._bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total_count += 1
+        self.total_sum += value
+        if value > self.max_value:
+            self.max_value = value
+
+    def percentile(self, quantile: float) -> int:
+        if not self.total_count:
+            return 0
+        target = max(1, int(round(quantile * self.total_count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._bucket_value(index), self.max_value)
+        return self.max_value
+
+    def merge(self, other: "LatencyHistogram"):
+        assert other.sub_bucket_bits == self.sub_bucket_bits
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        self.total_sum += other.total_sum
+        self.max_value = max(self.max_value, other.max_value)
+
+    def reset(self):
+        self.counts.clear()
+        self.total_count = 0
+        self.total_sum = 0
+        self.max_value = 0
+
+
+class LatencyTracer:
+    """Records per-turn stage timestamps and feeds stage-to-stage latencies into histograms.
+
+    A turn starts at ENDPOINT_DETECTED. Every later stage is recorded once per turn, as the
+    time since the closest earlier stage seen in that turn; TURN_COMPLETE also records the
+    whole turn under TURN_TOTAL.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.histograms: Dict[str, LatencyHistogram] = {
+            stage: LatencyHistogram() for stage in TURN_STAGES[1:] + [TURN_TOTAL]
+        }
+        self._turns: Dict[str, Dict[str, int]] = {}
+
+    def mark(self, conversation_id: Optional[str], stage: str, delay_seconds: float = 0.0):
+        """Records `stage` as reached now, or `delay_seconds` from now (e.g. audio queued behind other audio)."""
+        if not self.enabled or conversation_id is None:
+            return
+        now = time.perf_counter_ns() + int(delay_seconds * 1e9)
+        if stage == ENDPOINT_DETECTED:
+            self._turns[conversation_id] = {ENDPOINT_DETECTED: now}
+            return
+        turn = self._turns.get(conversation_id)
+        if turn is None or stage in turn:
+            return
+        turn[stage] = now
+        previous = max(turn[s] for s in turn if s != stage)
+        self.histograms[stage].record((now - previous) // 1000)
+        if stage == TURN_COMPLETE:
+            self.histograms[TURN_TOTAL].record((now - turn[ENDPOINT_DETECTED]) // 1000)
+            del self._turns[conversation_id]
+
+    def discard(self, conversation_id: str):
+        self._turns.pop(conversation_id, None)
+
+    def reset(self):
+        self._turns.clear()
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def summary(self, quantiles=DEFAULT_QUANTILES) -> Dict[str, Dict[str, float]]:
+        """Returns count, mean, max and percentiles for each stage, in milliseconds."""
+        summary = {}
+        for stage, histogram in self.histograms.items():
+            stats = {
+                "count": histogram.total_count,
+                "mean_ms": histogram.total_sum / histogram.total_count / 1000 if histogram.total_count else 0.0,
+                "max_ms": histogram.max_value / 1000,
+            }
+            for quantile in quantiles:
+                stats[f"p{int(quantile * 100)}_ms"] = histogram.percentile(quantile) / 1000
+            summary[stage] = stats
+        return summary
+
+    def export_json(self) -> str:
+        return json.dumps(self.summary(), indent=2)
+
+    def export_prometheus(self, metric_name: str = "conversation_turn_stage_latency_seconds") -> str:
+        lines: List[str] = [
+            f"# HELP {metric_name} Latency of each conversation turn stage since the previous stage.",
+            f"# TYPE {metric_name} summary",
+        ]
+        for stage, histogram in self.histograms.items():
+            for quantile in DEFAULT_QUANTILES:
+                value = histogram.percentile(quantile) / 1e6
+                lines.append(f'{metric_name}{{stage="{stage}",quantile="{quantile}"}} {value}')
+            lines.append(f'{metric_name}_sum{{stage="{stage}"}} {histogram.total_sum / 1e6}')
+            lines.append(f'{metric_name}_count{{stage="{stage}"}} {histogram.total_count}')
+        return "\n".join(lines) + "\n"
+
+
+_latency_tracer = LatencyTracer()
+
+
+def get_latency_tracer() -> LatencyTracer:
+    return _latency_tracer
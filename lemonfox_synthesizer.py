@@ -2,26 +2,41 @@ import asyncio
 import hashlib
 from typing import Optional
 
-import aiohttp
-from base_synthesizer import BaseSynthesizer, SynthesisResult
+from audio_format import LINEAR16, MULAW, AudioFormat, audio_formats, preferred_first
+from base_synthesizer import BaseSynthesizer, PauseAligner, SynthesisResult, TextAlignmentIndex
+from http_session import KeepAliveSession
+from latency_tracing import FIRST_TTS_BYTE, get_latency_tracer
+from __init__ import generate_from_queue
 
 LEMONFOX_BASE_URL = "https://api.lemonfox.ai/tts"
+LEMONFOX_SAMPLING_RATES = (8000, 16000, 24000)
 STREAMED_CHUNK_SIZE = 16000 * 2 // 4  # 1/8 of a second of 16kHz audio with 16-bit samples
 
 class LemonFoxSynthesizerConfig:
-    def __init__(self, api_key: str, voice_id: str = "default", sampling_rate: int = 16000, audio_encoding: str = "linear16"):
+    def __init__(self, api_key: str, voice_id: str = "default", sampling_rate: int = 16000, audio_encoding: str = "linear16", base_url: str = LEMONFOX_BASE_URL):
         self.api_key = api_key
+        self.base_url = base_url
         self.voice_id = voice_id
         self.sampling_rate = sampling_rate
         self.audio_encoding = audio_encoding
 
-class LemonFoxSynthesizer(BaseSynthesizer[LemonFoxSynthesizerConfig]):
+class LemonFoxSynthesizer(BaseSynthesizer):
     def __init__(self, synthesizer_config: LemonFoxSynthesizerConfig):
         super().__init__(synthesizer_config)
         assert synthesizer_config.api_key is not None, "API key must be set"
         self.api_key = synthesizer_config.api_key
         self.voice_id = synthesizer_config.voice_id
         self.output_format = self._determine_output_format()
+        self.total_chars = 0
+        self.http_session = KeepAliveSession()
+
+    def get_audio_formats(self):
+        preferred = AudioFormat(self.synthesizer_config.sampling_rate, self.synthesizer_config.audio_encoding)
+        return preferred_first(preferred, audio_formats(LEMONFOX_SAMPLING_RATES, (LINEAR16, MULAW)))
+
+    def set_audio_format(self, audio_format):
+        super().set_audio_format(audio_format)
+        self.output_format = self._determine_output_format()
 
     def _determine_output_format(self) -> str:
         if self.synthesizer_config.audio_encoding == "linear16":
@@ -30,9 +45,22 @@ class LemonFoxSynthesizer(BaseSynthesizer[LemonFoxSynthesizerConfig]):
             return "ulaw"
         raise ValueError(f"Unsupported audio encoding: {self.synthesizer_config.audio_encoding}")
 
+    async def prewarm(self):
+        await self.http_session.prewarm(self.synthesizer_config.base_url)
+
+    def reset(self):
+        super().reset()
+        self.total_chars = 0
+
+    async def tear_down(self):
+        await self.http_session.close()
+
+    async def create_speech(self, message: str, chunk_size: int = STREAMED_CHUNK_SIZE) -> SynthesisResult:
+        return await self.create_speech_uncached(message, chunk_size)
+
     async def create_speech_uncached(self, message: str, chunk_size: int) -> SynthesisResult:
-        self.total_chars += len(message) if hasattr(self, 'total_chars') else 0
-        url = f"{LEMONFOX_BASE_URL}"
+        self.total_chars += len(message)
+        url = self.synthesizer_config.base_url
         headers = {"Authorization": f"Bearer {self.api_key}"}
         body = {
             "text": message,
@@ -42,13 +70,25 @@ class LemonFoxSynthesizer(BaseSynthesizer[LemonFoxSynthesizerConfig]):
         }
 
         chunk_queue = asyncio.Queue()
-        asyncio.create_task(self.get_chunks(url, headers, body, chunk_size, chunk_queue))
+        alignment = self.create_alignment_index(message)
+        task = asyncio.create_task(self.get_chunks(url, headers, body, chunk_size, chunk_queue, alignment))
+        resource_account = getattr(self.streaming_conversation, "resource_account", None)
+        if resource_account:
+            resource_account.track_task(task)
 
         return SynthesisResult(
             self.chunk_result_generator_from_queue(chunk_queue),
-            lambda seconds: self.get_message_cutoff_from_voice_speed(message, seconds, 150)
+            lambda seconds: self.get_message_cutoff_from_alignment(alignment, seconds),
+            alignment,
         )
 
+    async def chunk_result_generator_from_queue(self, chunk_queue: asyncio.Queue):
+        async for chunk in generate_from_queue(chunk_queue):
+            resource_account = getattr(self.streaming_conversation, "resource_account", None)
+            if resource_account:
+                resource_account.add_synthesizer_queue_bytes(-len(chunk))
+            yield SynthesisResult.ChunkResult(chunk, False)
+
     @classmethod
     def get_voice_identifier(cls, synthesizer_config: LemonFoxSynthesizerConfig) -> str:
         hashed_api_key = hashlib.sha256(synthesizer_config.api_key.encode("utf-8")).hexdigest()
@@ -59,16 +99,35 @@ class LemonFoxSynthesizer(BaseSynthesizer[LemonFoxSynthesizerConfig]):
             synthesizer_config.audio_encoding,
         ])
 
-    async def get_chunks(self, url: str, headers: dict, body: dict, chunk_size: int, chunk_queue: asyncio.Queue[Optional[bytes]]):
+    async def get_chunks(
+        self,
+        url: str,
+        headers: dict,
+        body: dict,
+        chunk_size: int,
+        chunk_queue: asyncio.Queue[Optional[bytes]],
+        alignment: TextAlignmentIndex,
+    ):
+        """Synthesizes the whole message in one request, mapping its sentence ends onto the audio as it streams."""
+        conversation_id = getattr(self.streaming_conversation, "id", None)
+        resource_account = getattr(self.streaming_conversation, "resource_account", None)
+        aligner = PauseAligner(alignment, AudioFormat(self.synthesizer_config.sampling_rate, self.synthesizer_config.audio_encoding))
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=body) as response:
-                    if response.status != 200:
-                        error = await response.text()
-                        raise Exception(f"LemonFox API error: {response.status} - {error}")
-                    async for chunk in response.content.iter_chunked(chunk_size):
-                        chunk_queue.put_nowait(chunk[0])  # Use first part of chunk
+            async with self.http_session.get().post(url, headers=headers, json=body) as response:
+                if response.status != 200:
+                    error = await response.text()
+                    raise Exception(f"LemonFox API error: {response.status} - {error}")
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    if chunk:
+                        get_latency_tracer().mark(conversation_id, FIRST_TTS_BYTE)
+                    if resource_account:
+                        # Not reading the response while over the soft limit pushes back on the provider
+                        await resource_account.wait_for_capacity()
+                        resource_account.add_synthesizer_queue_bytes(len(chunk))
+                    aligner.feed(chunk)
+                    chunk_queue.put_nowait(chunk)
+            aligner.finish()
         except asyncio.CancelledError:
             pass
         finally:
-            chunk_queue.put_nowait(None)  # Sentinel value
\ No newline at end of file
+            chunk_queue.put_nowait(None)  # Sentinel value
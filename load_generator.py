@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from audio_pipeline import MicrophoneInput
+from fake_provider_servers import FakeProviderConfig, FakeProviderServers, start_fake_provider_servers_process
+from latency_tracing import TURN_TOTAL, LatencyHistogram, get_latency_tracer
+from replay_benchmark import (
+    BYTES_PER_SAMPLE,
+    SAMPLING_RATE,
+    create_replay_conversation,
+    current_rss_bytes,
+)
+from streaming_conversation import StreamingConversation
+
+
+class CallerProfile:
+    """Talk/silence/barge-in behaviour of a simulated caller. Durations are (min, max) seconds."""
+
+    def __init__(
+        self,
+        talk_seconds: Tuple[float, float] = (1.0, 4.0),
+        silence_seconds: Tuple[float, float] = (2.0, 6.0),
+        barge_in_probability: float = 0.2,
+        call_seconds: Tuple[float, float] = (60.0, 300.0),
+        amplitude: int = 3000,
+    ):
+        self.talk_seconds = talk_seconds
+        self.silence_seconds = silence_seconds
+        self.barge_in_probability = barge_in_probability
+        self.call_seconds = call_seconds
+        self.amplitude = amplitude
+
+
+class SimulatedMicrophoneInput(MicrophoneInput):
+    """Produces alternating talk and silence frames, paced at real time."""
+
+    def __init__(self, profile: CallerProfile, frame_seconds: float = 0.1, seed: Optional[int] = None):
+        super().__init__(SAMPLING_RATE)
+        self.profile = profile
+        self.frame_seconds = frame_seconds
+        self.random = random.Random(seed)
+        num_samples = int(SAMPLING_RATE * frame_seconds)
+        sample = profile.amplitude.to_bytes(2, "little", signed=True)
+        negated = (-profile.amplitude).to_bytes(2, "little", signed=True)
+        # Square wave: loud enough to look like speech without per-frame allocation
+        self.talk_frame = (sample * 8 + negated * 8) * (num_samples // 16) + sample * (num_samples % 16)
+        self.silence_frame = bytes(num_samples * BYTES_PER_SAMPLE)
+        self.is_talking = False
+        self._state_remaining = self.random.uniform(*profile.silence_seconds)
+
+    def start_talking(self):
+        self.is_talking = True
+        self._state_remaining = self.random.uniform(*self.profile.talk_seconds)
+
+    async def read(self) -> bytes:
+        await asyncio.sleep(self.frame_seconds)
+        self._state_remaining -= self.frame_seconds
+        if self._state_remaining <= 0:
+            if self.is_talking:
+                self.is_talking = False
+                self._state_remaining = self.random.uniform(*self.profile.silence_seconds)
+            else:
+                self.start_talking()
+        return self.talk_frame if self.is_talking else self.silence_frame
+
+
+class SimulatedCaller:
+    def __init__(self, conversation: StreamingConversation, profile: CallerProfile, seed: Optional[int] = None):
+        self.conversation = conversation
+        self.profile = profile
+        self.random = random.Random(seed)
+        self.microphone_input = SimulatedMicrophoneInput(profile, seed=seed)
+        self.speech_task: Optional[asyncio.Task] = None
+        self.stop_event = threading.Event()
+        self.turns = 0
+        self.barge_ins = 0
+
+    def is_agent_speaking(self) -> bool:
+        return self.speech_task is not None and not self.speech_task.done()
+
+    async def run(self):
+        conversation = self.conversation
+        await conversation.start()
+        call_ends_at = time.monotonic() + self.random.uniform(*self.profile.call_seconds)
+        try:
+            while conversation.is_active() and time.monotonic() < call_ends_at:
+                if (
+                    self.is_agent_speaking()
+                    and not self.microphone_input.is_talking
+                    and self.random.random() < self.profile.barge_in_probability * self.microphone_input.frame_seconds
+                ):
+                    self.microphone_input.start_talking()
+                audio_chunk = await self.microphone_input.read()
+                transcription_result = await conversation.process_input_audio(audio_chunk)
+                if not transcription_result:
+                    continue
+                if self.is_agent_speaking():
+                    self.stop_event.set()
+                    await conversation.broadcast_interrupt()
+                    self.barge_ins += 1
+                self.stop_event = threading.Event()
+                self.speech_task = asyncio.create_task(self._respond(transcription_result["message"]))
+        finally:
+            if self.speech_task:
+                self.speech_task.cancel()
+            await conversation.terminate()
+
+    async def _respond(self, message: str):
+        message, _ = await self.conversation.agent.respond(message, self.conversation.id)
+        if message:
+            synthesis_result = await self.conversation.synthesizer.create_speech(message)
+            await self.conversation.send_speech_to_output(message, synthesis_result, self.stop_event)
+        self.turns += 1
+
+
+class RampSchedule:
+    """Piecewise-linear target caller count, from (elapsed_seconds, callers) points."""
+
+    def __init__(self, points: List[Tuple[float, int]]):
+        assert points, "RampSchedule needs at least one point"
+        self.points = sorted(points)
+
+    def target(self, elapsed: float) -> int:
+        previous_time, previous_callers = 0.0, 0
+        for point_time, callers in self.points:
+            if elapsed < point_time:
+                fraction = (elapsed - previous_time) / (point_time - previous_time)
+                return int(previous_callers + fraction * (callers - previous_callers))
+            previous_time, previous_callers = point_time, callers
+        return previous_callers
+
+    @classmethod
+    def parse(cls, spec: str) -> "RampSchedule":
+        """Parses "60:10,600:100" as ramp to 10 callers at 60s, then to 100 at 600s."""
+        return cls([(float(t), int(n)) for t, n in (point.split(":") for point in spec.split(","))])
+
+
+class EventLoopLagMonitor:
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.histogram = LatencyHistogram()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            scheduled = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.histogram.record((time.perf_counter() - scheduled - self.interval) * 1e6)
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        servers: FakeProviderServers,
+        schedule: RampSchedule,
+        profile: Optional[CallerProfile] = None,
+        duration: float = 600.0,
+        report_interval: float = 10.0,
+        max_lag_ms: float = 50.0,
+        min_silence_duration: float = 0.5,
+        seed: int = 0,
+    ):
+        self.servers = servers
+        self.schedule = schedule
+        self.profile = profile or CallerProfile()
+        self.duration = duration
+        self.report_interval = report_interval
+        self.max_lag_ms = max_lag_ms
+        self.min_silence_duration = min_silence_duration
+        self.seed = seed
+        self.callers: Dict[SimulatedCaller, asyncio.Task] = {}
+        self.spawned_calls = 0
+        self.completed_calls = 0
+        self.total_barge_ins = 0
+        self.reports: List[Dict] = []
+        self._last_report = (0.0, 0.0)  # (elapsed, process CPU seconds) at the previous report
+
+    def _spawn_caller(self):
+        conversation = create_replay_conversation(self.servers, self.min_silence_duration)
+        caller = SimulatedCaller(conversation, self.profile, seed=self.seed + self.spawned_calls)
+        self.spawned_calls += 1
+        task = asyncio.create_task(caller.run())
+        task.add_done_callback(lambda _: self._on_caller_done(caller))
+        self.callers[caller] = task
+
+    def _on_caller_done(self, caller: SimulatedCaller):
+        self.callers.pop(caller, None)
+        self.completed_calls += 1
+        self.total_barge_ins += caller.barge_ins
+
+    def _report(self, elapsed: float, lag_monitor: EventLoopLagMonitor, rss_start: int) -> Dict:
+        lag = lag_monitor.histogram
+        # CPU over this reporting interval only, so a report reflects the load at its caller count
+        cpu_now = time.process_time()
+        previous_elapsed, previous_cpu = self._last_report
+        self._last_report = (elapsed, cpu_now)
+        interval = elapsed - previous_elapsed
+        report = {
+            "elapsed_seconds": round(elapsed, 1),
+            "active_callers": len(self.callers),
+            "completed_calls": self.completed_calls,
+            "barge_ins": self.total_barge_ins + sum(caller.barge_ins for caller in self.callers),
+            "loop_lag_p50_ms": lag.percentile(0.5) / 1000,
+            "loop_lag_p99_ms": lag.percentile(0.99) / 1000,
+            "loop_lag_max_ms": lag.max_value / 1000,
+            "max_interruptible_queue_depth": max(
+                (caller.conversation.interruptible_events.qsize() for caller in self.callers), default=0
+            ),
+            "asyncio_tasks": len(asyncio.all_tasks()),
+            "cpu_utilization": (cpu_now - previous_cpu) / interval if interval else 0.0,
+            "rss_bytes": current_rss_bytes(),
+            "rss_growth_bytes": current_rss_bytes() - rss_start,
+            "turn_p95_ms": get_latency_tracer().summary()[TURN_TOTAL]["p95_ms"],
+        }
+        lag.reset()
+        return report
+
+    async def run(self) -> Dict:
+        lag_monitor = EventLoopLagMonitor()
+        lag_monitor.start()
+        self._last_report = (0.0, time.process_time())
+        rss_start = current_rss_bytes()
+        start = time.monotonic()
+        next_report = self.report_interval
+        try:
+            while (elapsed := time.monotonic() - start) < self.duration:
+                for _ in range(self.schedule.target(elapsed) - len(self.callers)):
+                    self._spawn_caller()
+                if elapsed >= next_report:
+                    report = self._report(elapsed, lag_monitor, rss_start)
+                    self.reports.append(report)
+                    print(json.dumps(report))
+                    next_report += self.report_interval
+                await asyncio.sleep(0.1)
+        finally:
+            lag_monitor.stop()
+            for task in list(self.callers.values()):
+                task.cancel()
+            await asyncio.gather(*self.callers.values(), return_exceptions=True)
+        return self.summary()
+
+    def summary(self) -> Dict:
+        healthy = [report for report in self.reports if report["loop_lag_p99_ms"] <= self.max_lag_ms]
+        busiest = max(healthy, key=lambda report: report["active_callers"], default=None)
+        sustained = busiest["active_callers"] if busiest else 0
+        # Scale by the CPU the process actually used: one fully busy core would carry this many
+        per_core = sustained / busiest["cpu_utilization"] if busiest and busiest["cpu_utilization"] else 0.0
+        growth_per_hour = 0.0
+        if len(self.reports) >= 2:
+            first, last = self.reports[0], self.reports[-1]
+            hours = (last["elapsed_seconds"] - first["elapsed_seconds"]) / 3600
+            growth_per_hour = (last["rss_bytes"] - first["rss_bytes"]) / hours if hours else 0.0
+        return {
+            "cores": os.cpu_count(),
+            "sustained_conversations_per_process": sustained,
+            "cpu_utilization_at_sustained": busiest["cpu_utilization"] if busiest else 0.0,
+            "sustained_conversations_per_core": per_core,
+            "max_loop_lag_ms": self.max_lag_ms,
+            "completed_calls": self.completed_calls,
+            "memory_growth_bytes_per_hour": growth_per_hour,
+            "turn_latency_ms": get_latency_tracer().summary()[TURN_TOTAL],
+            "reports": self.reports,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-test StreamingConversation with simulated callers against local fake providers.")
+    parser.add_argument("--ramp", default="60:10,600:100", help="Comma-separated seconds:callers ramp points")
+    parser.add_argument("--duration", type=float, default=600.0, help="Total run time in seconds")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    parser.add_argument("--max-lag-ms", type=float, default=50.0, help="Loop lag p99 above which load is not sustainable")
+    parser.add_argument("--barge-in-probability", type=float, default=0.2, help="Per second of agent speech")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the summary as JSON to this path")
+    args = parser.parse_args()
+
+    server_process, servers = start_fake_provider_servers_process(FakeProviderConfig())
+    try:
+        generator = LoadGenerator(
+            servers,
+            RampSchedule.parse(args.ramp),
+            profile=CallerProfile(barge_in_probability=args.barge_in_probability),
+            duration=args.duration,
+            report_interval=args.report_interval,
+            max_lag_ms=args.max_lag_ms,
+            seed=args.seed,
+        )
+        summary = asyncio.run(generator.run())
+    finally:
+        server_process.terminate()
+
+    print(json.dumps({key: value for key, value in summary.items() if key != "reports"}, indent=2))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(summary, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
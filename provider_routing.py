@@ -0,0 +1,332 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Generic, List, Tuple, TypeVar
+
+from audio_format import common_audio_formats
+from base_synthesizer import BaseSynthesizer, SynthesisResult, SynthesizerConfig
+from base_transcriber import BaseTranscriber, TranscriberConfig
+from latency_tracing import ENDPOINT_DETECTED, TRANSCRIPT_RETURNED, get_latency_tracer
+
+ProviderType = TypeVar("ProviderType")
+ResultType = TypeVar("ResultType")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class AllProvidersFailed(Exception):
+    pass
+
+
+class ProviderHealth:
+    """Rolling latency and error rate of one provider, with a circuit breaker.
+
+    The breaker opens when the error rate over the last `window` requests reaches
+    `failure_threshold` (after at least `min_requests`). After `cooldown` seconds a single
+    probe request is let through; success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        failure_threshold: float = 0.5,
+        min_requests: int = 5,
+        cooldown: float = 30.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def latency(self) -> float:
+        # Unmeasured providers sort first so every backend gets sampled
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def is_available(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        return self.state == HALF_OPEN and not self.probe_in_flight
+
+    def on_request(self):
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = True
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            self.outcomes.clear()
+
+    def record_failure(self):
+        self.outcomes.append(False)
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN or (
+            len(self.outcomes) >= self.min_requests and self.error_rate() >= self.failure_threshold
+        ):
+            if self.state != OPEN:
+                print(f"Opening circuit breaker for provider {self.name}")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        self.probe_in_flight = False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "latency_ms": self.latency() * 1000,
+            "error_rate": self.error_rate(),
+            "requests": len(self.outcomes),
+        }
+
+
+class LatencyRouter(Generic[ProviderType]):
+    """Sends each call to the fastest healthy provider, failing over to the next on error."""
+
+    def __init__(self, providers: Dict[str, ProviderType], **health_kwargs):
+        assert providers, "LatencyRouter needs at least one provider"
+        self.providers = providers
+        self.health = {name: ProviderHealth(name, **health_kwargs) for name in providers}
+
+    def ranked(self) -> List[Tuple[str, ProviderType]]:
+        available = [name for name in self.providers if self.health[name].is_available()]
+        available.sort(key=lambda name: self.health[name].latency())
+        return [(name, self.providers[name]) for name in available]
+
+    async def _attempt(self, name: str, call: Callable[[ProviderType], Awaitable[ResultType]]) -> ResultType:
+        health = self.health[name]
+        health.on_request()
+        start = time.monotonic()
+        try:
+            result = await call(self.providers[name])
+        except asyncio.CancelledError:
+            health.record_cancelled()
+            raise
+        except Exception:
+            health.record_failure()
+            raise
+        health.record_success(time.monotonic() - start)
+        return result
+
+    async def call(self, call: Callable[[ProviderType], Awaitable[ResultType]], race: bool = False) -> ResultType:
+        """Runs `call` against providers in latency order until one succeeds.
+
+        With `race`, the two best providers are called concurrently and the first success wins.
+        """
+        ranked = self.ranked()
+        if not ranked:
+            raise AllProvidersFailed("Every provider's circuit breaker is open")
+        errors = []
+        if race and len(ranked) >= 2:
+            racers = [asyncio.create_task(self._attempt(name, call)) for name, _ in ranked[:2]]
+            ranked = ranked[2:]
+            try:
+                for next_done in asyncio.as_completed(racers):
+                    try:
+                        return await next_done
+                    except Exception as e:
+                        errors.append(e)
+            finally:
+                for racer in racers:
+                    racer.cancel()
+        for name, _ in ranked:
+            try:
+                return await self._attempt(name, call)
+            except Exception as e:
+                print(f"Provider {name} failed, failing over: {e}")
+                errors.append(e)
+        raise AllProvidersFailed(f"All providers failed: {errors}")
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        return {name: health.stats() for name, health in self.health.items()}
+
+
+class RoutingTranscriber(BaseTranscriber):
+    """Buffers and endpoints audio itself, then sends each buffer to the best backend's `transcribe_audio`.
+
+    Utterances no longer than `race_below_seconds` are sent to the two best backends at once.
+    """
+
+    def __init__(
+        self,
+        config: TranscriberConfig,
+        transcribers: Dict[str, BaseTranscriber],
+        race_below_seconds: float = 0.0,
+        **health_kwargs,
+    ):
+        super().__init__(config)
+        self.router: LatencyRouter[BaseTranscriber] = LatencyRouter(transcribers, **health_kwargs)
+        self.race_below_seconds = race_below_seconds
+        self.is_running = False
+        self.audio_buffer = bytearray()
+        self.buffer_duration = 0.0
+        self.time_silent = 0.0
+        self.speech_duration = 0.0
+        self.force_endpoint = False
+
+    async def start(self):
+        await asyncio.gather(*(transcriber.start() for transcriber in self.router.providers.values()))
+        self.is_running = True
+
+    async def prewarm(self):
+        await asyncio.gather(
+            *(transcriber.prewarm() for transcriber in self.router.providers.values()),
+            return_exceptions=True,
+        )
+
+    async def process(self, audio_chunk: bytes):
+        if not self.is_running or self.is_muted:
+            return None
+        chunk_duration = len(audio_chunk) / self.get_byte_rate()
+        self.track_silence(audio_chunk, chunk_duration)
+        self.audio_buffer.extend(audio_chunk)
+        self.buffer_duration += chunk_duration
+        resource_account = getattr(self.streaming_conversation, "resource_account", None)
+        if resource_account:
+            resource_account.enforce()
+        if not self.should_endpoint():
+            return None
+
+        conversation_id = getattr(self.streaming_conversation, "id", None)
+        get_latency_tracer().mark(conversation_id, ENDPOINT_DETECTED)
+        audio = bytes(self.audio_buffer)
+        race = self.buffer_duration <= self.race_below_seconds
+        self.audio_buffer.clear()
+        self.buffer_duration = 0.0
+        self.time_silent = 0.0
+        self.speech_duration = 0.0
+        self.force_endpoint = False
+        try:
+            transcription = await self.router.call(lambda transcriber: transcriber.transcribe_audio(audio), race=race)
+        except AllProvidersFailed as e:
+            print(e)
+            return None
+        if not transcription:
+            return None
+        get_latency_tracer().mark(conversation_id, TRANSCRIPT_RETURNED)
+        return {"message": transcription, "is_final": True, "is_interrupt": False}
+
+    async def transcribe_audio(self, audio: bytes) -> str:
+        return await self.router.call(lambda transcriber: transcriber.transcribe_audio(audio))
+
+    def get_audio_formats(self):
+        return common_audio_formats([transcriber.get_audio_formats() for transcriber in self.router.providers.values()])
+
+    def set_audio_format(self, audio_format):
+        super().set_audio_format(audio_format)
+        for transcriber in self.router.providers.values():
+            transcriber.set_audio_format(audio_format)
+
+    def reset(self):
+        super().reset()
+        self.is_running = False
+        self.audio_buffer.clear()
+        self.buffer_duration = 0.0
+        self.time_silent = 0.0
+        self.speech_duration = 0.0
+        self.force_endpoint = False
+        for transcriber in self.router.providers.values():
+            transcriber.reset()
+
+
+
+    async def stop(self):
+        self.is_running = False
+        await asyncio.gather(*(transcriber.stop() for transcriber in self.router.providers.values()))
+
+
+class RoutingSynthesizer(BaseSynthesizer):
+    """Routes `create_speech` to the synthesizer with the fastest time to first audio chunk.
+
+    A synthesis that ends without producing audio counts as a failure of that provider.
+    """
+
+    def __init__(self, synthesizer_config: SynthesizerConfig, synthesizers: Dict[str, BaseSynthesizer], **health_kwargs):
+        super().__init__(synthesizer_config)
+        self.router: LatencyRouter[BaseSynthesizer] = LatencyRouter(synthesizers, **health_kwargs)
+
+    def get_audio_formats(self):
+        return common_audio_formats([synthesizer.get_audio_formats() for synthesizer in self.router.providers.values()])
+
+    def set_audio_format(self, audio_format):
+        super().set_audio_format(audio_format)
+        for synthesizer in self.router.providers.values():
+            synthesizer.set_audio_format(audio_format)
+
+    async def start(self):
+        for synthesizer in self.router.providers.values():
+            synthesizer.streaming_conversation = self.streaming_conversation
+        await asyncio.gather(*(synthesizer.start() for synthesizer in self.router.providers.values()))
+
+    async def prewarm(self):
+        await asyncio.gather(
+            *(synthesizer.prewarm() for synthesizer in self.router.providers.values()),
+            return_exceptions=True,
+        )
+
+    async def create_speech(self, message: str, chunk_size: int) -> SynthesisResult:
+        ranked = self.router.ranked()
+        if not ranked:
+            raise AllProvidersFailed("Every synthesizer's circuit breaker is open")
+        errors = []
+        for name, synthesizer in ranked:
+            health = self.router.health[name]
+            health.on_request()
+            start = time.monotonic()
+            try:
+                synthesis_result = await synthesizer.create_speech(message, chunk_size)
+            except Exception as e:
+                health.record_failure()
+                errors.append(e)
+                continue
+            synthesis_result.chunk_generator = self._observe_first_chunk(
+                health, start, synthesis_result.chunk_generator
+            )
+            return synthesis_result
+        raise AllProvidersFailed(f"All synthesizers failed: {errors}")
+
+    async def _observe_first_chunk(self, health: ProviderHealth, start: float, chunk_generator):
+        produced_audio = False
+        recorded = False
+        try:
+            async for chunk_result in chunk_generator:
+                if not produced_audio and chunk_result.chunk:
+                    produced_audio = True
+                    health.record_success(time.monotonic() - start)
+                yield chunk_result
+        except Exception:
+            if not produced_audio:
+                health.record_failure()
+                recorded = True
+            raise
+        else:
+            if not produced_audio:
+                health.record_failure()
+                recorded = True
+        finally:
+            # Closed (e.g. on interrupt) or cancelled before any audio: the probe gave no answer
+            if not produced_audio and not recorded:
+                health.record_cancelled()
+
+    def reset(self):
+        super().reset()
+        for synthesizer in self.router.providers.values():
+            synthesizer.reset()
+
+    async def tear_down(self):
+        await asyncio.gather(*(synthesizer.tear_down() for synthesizer in self.router.providers.values()))
@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+from audio_pipeline import OutputDeviceType
+from base_transcriber import EndpointingConfig
+from chat_gpt_agent import ChatGPTAgent, ChatGPTAgentConfig
+from conversation_checkpoint import measure_checkpoint, restore_conversation, snapshot_conversation
+from conversation_recorder import RecordingWriter
+from fake_provider_servers import (
+    FakeProviderConfig,
+    FakeProviderServers,
+    LatencyDistribution,
+    start_fake_provider_servers_process,
+)
+from groq_transcriber import WhisperTranscriber, WhisperTranscriberConfig
+from latency_tracing import TURN_TOTAL, get_latency_tracer
+from lemonfox_synthesizer import STREAMED_CHUNK_SIZE, LemonFoxSynthesizer, LemonFoxSynthesizerConfig
+from streaming_conversation import StreamingConversation
+from __init__ import convert_wav
+
+SAMPLING_RATE = 16000
+BYTES_PER_SAMPLE = 2
+
+
+class NullOutputDevice(OutputDeviceType):
+    """Output device that drops audio on the floor, counting what it was given."""
+
+    def __init__(self):
+        super().__init__()
+        self.bytes_played = 0
+
+    def consume_nonblocking(self, item):
+        self.bytes_played += len(item.data)
+        if hasattr(item, 'release'):
+            item.release()
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_replay_audio(wav_path: str) -> bytes:
+    with open(wav_path, "rb") as wav_file:
+        return convert_wav(wav_file, output_sample_rate=SAMPLING_RATE)
+
+
+def create_replay_conversation(servers: FakeProviderServers, min_silence_duration: float) -> StreamingConversation:
+    transcriber = WhisperTranscriber(
+        WhisperTranscriberConfig(
+            api_key="fake",
+            sampling_rate=SAMPLING_RATE,
+            endpointing_config=EndpointingConfig(min_silence_duration=min_silence_duration),
+            api_url=servers.whisper_url,
+        )
+    )
+    agent = ChatGPTAgent(ChatGPTAgentConfig(base_url=servers.openai_base_url), openai_api_key="fake")
+    synthesizer = LemonFoxSynthesizer(
+        LemonFoxSynthesizerConfig(api_key="fake", sampling_rate=SAMPLING_RATE, base_url=servers.lemonfox_url)
+    )
+    return StreamingConversation(NullOutputDevice(), transcriber, agent, synthesizer)
+
+
+async def run_turn(conversation: StreamingConversation, human_input: str):
+    message, _ = await conversation.agent.respond(human_input, conversation.id)
+    if not message:
+        return
+    synthesis_result = await conversation.synthesizer.create_speech(message, STREAMED_CHUNK_SIZE)
+    await conversation.send_speech_to_output(message, synthesis_result, threading.Event())
+
+
+async def replay_conversation(
+    conversation: StreamingConversation,
+    audio: bytes,
+    frame_seconds: float = 0.1,
+    realtime: bool = False,
+    snapshots: Optional[List[bytes]] = None,
+) -> int:
+    """Feeds `audio` through the conversation frame by frame like `Streaming.main`; returns the number of turns.
+
+    If `snapshots` is given, a checkpoint of the end-of-call state is appended to it before the
+    conversation is terminated, since terminating clears and releases that state.
+    """
+    await conversation.start()
+    frame_size = int(SAMPLING_RATE * BYTES_PER_SAMPLE * frame_seconds)
+    turns = 0
+    try:
+        for offset in range(0, len(audio), frame_size):
+            transcription_result = await conversation.process_input_audio(audio[offset:offset + frame_size])
+            if transcription_result:
+                conversation.transcript += f" {transcription_result['message']}"
+                await run_turn(conversation, transcription_result["message"])
+                turns += 1
+            if realtime:
+                await asyncio.sleep(frame_seconds)
+    finally:
+        if snapshots is not None:
+            snapshots.append(snapshot_conversation(conversation))
+        await conversation.terminate()
+    return turns
+
+
+async def run_replay_benchmark(
+    wav_paths: List[str],
+    servers: FakeProviderServers,
+    conversations: int = 1,
+    frame_seconds: float = 0.1,
+    realtime: bool = False,
+    min_silence_duration: float = 2.0,
+    record_dir: Optional[str] = None,
+) -> Dict:
+    tracer = get_latency_tracer()
+    tracer.reset()
+    audios = [load_replay_audio(wav_path) for wav_path in wav_paths]
+
+    peak_rss = baseline_rss = current_rss_bytes()
+    sampling = True
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while sampling:
+            peak_rss = max(peak_rss, current_rss_bytes())
+            await asyncio.sleep(0.05)
+
+    replay_conversations = [create_replay_conversation(servers, min_silence_duration) for _ in range(conversations)]
+    recording_writer = RecordingWriter(record_dir) if record_dir else None
+    if recording_writer:
+        for conversation in replay_conversations:
+            conversation.start_recording(recording_writer)
+    snapshots: List[bytes] = []
+    sampler = asyncio.create_task(sample_memory())
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    turns = await asyncio.gather(*(
+        replay_conversation(
+            conversation,
+            audios[i % len(audios)],
+            frame_seconds=frame_seconds,
+            realtime=realtime,
+            snapshots=snapshots,
+        )
+        for i, conversation in enumerate(replay_conversations)
+    ))
+    wall_seconds = time.perf_counter() - wall_start
+    cpu_seconds = time.process_time() - cpu_start
+    sampling = False
+    await sampler
+    if recording_writer:
+        recording_writer.stop()
+    # Timed outside the run, on fresh conversations restored from the end-of-call snapshots
+    checkpoints = []
+    for snapshot in snapshots:
+        conversation = restore_conversation(create_replay_conversation(servers, min_silence_duration), snapshot)
+        checkpoints.append(measure_checkpoint(conversation))
+
+    return {
+        "commit": current_commit(),
+        "conversations": conversations,
+        "turns": sum(turns),
+        "wall_seconds": wall_seconds,
+        "cpu_seconds_per_conversation": cpu_seconds / conversations,
+        "memory_bytes_per_conversation": (peak_rss - baseline_rss) / conversations,
+        "turn_latency_ms": tracer.summary()[TURN_TOTAL],
+        "stage_latency_ms": tracer.summary(),
+        "checkpoint": {
+            name: sum(checkpoint[name] for checkpoint in checkpoints) / len(checkpoints)
+            for name in ("snapshot_bytes", "snapshot_ms", "restore_ms")
+        },
+    }
+
+
+def compare_results(baseline: Dict, current: Dict) -> List[str]:
+    lines = []
+    metrics = [
+        ("turn p50 ms", lambda r: r["turn_latency_ms"]["p50_ms"]),
+        ("turn p95 ms", lambda r: r["turn_latency_ms"]["p95_ms"]),
+        ("turn p99 ms", lambda r: r["turn_latency_ms"]["p99_ms"]),
+        ("cpu s / conversation", lambda r: r["cpu_seconds_per_conversation"]),
+        ("memory bytes / conversation", lambda r: r["memory_bytes_per_conversation"]),
+        ("checkpoint bytes", lambda r: r["checkpoint"]["snapshot_bytes"]),
+        ("checkpoint snapshot ms", lambda r: r["checkpoint"]["snapshot_ms"]),
+    ]
+    for name, metric in metrics:
+        before, after = metric(baseline), metric(current)
+        change = (after - before) / before * 100 if before else 0.0
+        lines.append(f"{name:<30} {before:>14.3f} -> {after:>14.3f} ({change:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded WAV files through StreamingConversation against local fake providers.")
+    parser.add_argument("wav_paths", nargs="+")
+    parser.add_argument("--conversations", type=int, default=1)
+    parser.add_argument("--frame-seconds", type=float, default=0.1)
+    parser.add_argument("--min-silence-duration", type=float, default=2.0)
+    parser.add_argument("--realtime", action="store_true", help="Pace input frames at real time")
+    parser.add_argument("--transcription-latency-ms", type=float, nargs=2, default=(300, 100), metavar=("MEAN", "STDDEV"))
+    parser.add_argument("--llm-latency-ms", type=float, nargs=2, default=(400, 150), metavar=("MEAN", "STDDEV"))
+    parser.add_argument("--tts-latency-ms", type=float, nargs=2, default=(200, 50), metavar=("MEAN", "STDDEV"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record-dir", help="Record both sides of every conversation into this directory")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Compare against a previous JSON result")
+    args = parser.parse_args()
+
+    config = FakeProviderConfig(
+        transcription_latency=LatencyDistribution(*args.transcription_latency_ms, seed=args.seed),
+        llm_first_token_latency=LatencyDistribution(*args.llm_latency_ms, seed=args.seed + 1),
+        tts_first_byte_latency=LatencyDistribution(*args.tts_latency_ms, seed=args.seed + 2),
+    )
+    server_process, servers = start_fake_provider_servers_process(config)
+    try:
+        results = asyncio.run(run_replay_benchmark(
+            args.wav_paths,
+            servers,
+            conversations=args.conversations,
+            frame_seconds=args.frame_seconds,
+            realtime=args.realtime,
+            min_silence_duration=args.min_silence_duration,
+            record_dir=args.record_dir,
+        ))
+    finally:
+        server_process.terminate()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            print("\n".join(compare_results(json.load(baseline_file), results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import asyncio
+from typing import Dict, Optional, Set, Tuple
+
+OK = "ok"
+SOFT_LIMIT = "soft_limit"
+HARD_LIMIT = "hard_limit"
+BACKPRESSURE_TIMEOUT = 5.0  # seconds; bounds the wait if the consumer has gone away
+
+
+class ResourceLimits:
+    def __init__(
+        self,
+        soft_limit_bytes: int = 4 * 1024 * 1024,
+        hard_limit_bytes: int = 16 * 1024 * 1024,
+        min_history_messages: int = 4,
+    ):
+        assert soft_limit_bytes <= hard_limit_bytes
+        self.soft_limit_bytes = soft_limit_bytes
+        self.hard_limit_bytes = hard_limit_bytes
+        self.min_history_messages = min_history_messages
+
+
+class ConversationResourceAccount:
+    """Tracks memory and in-flight tasks held by one conversation and enforces its limits.
+
+    Above the soft limit the transcriber is forced to endpoint when its audio buffer holds
+    most of the memory, and synthesizer readers wait in `wait_for_capacity` until their queue drains, which
+    stops reading from the provider stream. Above the hard limit the agent history and
+    audio buffer are truncated.
+    """
+
+    def __init__(self, conversation: "StreamingConversation", limits: Optional[ResourceLimits] = None):
+        self.conversation = conversation
+        self.limits = limits or ResourceLimits()
+        self.tasks: Set[asyncio.Task] = set()
+        self.synthesizer_queue_bytes = 0
+        self.status = OK
+        self.soft_limit_hits = 0
+        self.hard_limit_hits = 0
+        self._capacity_changed = asyncio.Event()
+        self._content_bytes: Dict[int, Tuple[str, int]] = {}  # id(content) -> (content, encoded size)
+
+    def track_task(self, task: asyncio.Task) -> asyncio.Task:
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def cancel_tasks(self):
+        for task in list(self.tasks):
+            task.cancel()
+        self.synthesizer_queue_bytes = 0
+        self._capacity_changed.set()
+
+    def add_synthesizer_queue_bytes(self, num_bytes: int):
+        self.synthesizer_queue_bytes += num_bytes
+        if num_bytes < 0 and self.status != OK:
+            self.enforce()
+            self._capacity_changed.set()
+
+    def audio_buffer_bytes(self) -> int:
+        return len(getattr(self.conversation.transcriber, "audio_buffer", b""))
+
+    def agent_history_bytes(self) -> int:
+        """UTF-8 size of the agent's message contents.
+
+        The agent edits and pops messages as well as appending them, so the total is summed
+        on every call; only the encoded size of each content string is cached, and a string
+        that was replaced is simply a new cache key.
+        """
+        messages = getattr(self.conversation.agent, "messages", None)
+        if not messages:
+            self._content_bytes = {}
+            return 0
+        content_bytes = {}
+        total = 0
+        for message in messages:
+            content = message.get("content") or ""
+            cached = self._content_bytes.get(id(content))
+            if cached is None or cached[0] is not content:
+                cached = (content, len(content.encode("utf-8")))
+            content_bytes[id(content)] = cached
+            total += cached[1]
+        self._content_bytes = content_bytes  # holding the strings keeps their ids from being reused
+        return total
+
+    def total_bytes(self) -> int:
+        return self.audio_buffer_bytes() + self.agent_history_bytes() + self.synthesizer_queue_bytes
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "audio_buffer_bytes": self.audio_buffer_bytes(),
+            "agent_history_bytes": self.agent_history_bytes(),
+            "synthesizer_queue_bytes": self.synthesizer_queue_bytes,
+            "total_bytes": self.total_bytes(),
+            "inflight_tasks": len(self.tasks),
+            "soft_limit_hits": self.soft_limit_hits,
+            "hard_limit_hits": self.hard_limit_hits,
+            "status": self.status,
+        }
+
+    def enforce(self) -> str:
+        total = self.total_bytes()
+        if total >= self.limits.hard_limit_bytes:
+            if self.status != HARD_LIMIT:
+                self.hard_limit_hits += 1
+                print(f"Conversation {self.conversation.id} hit its hard memory limit ({total} bytes)")
+            self._truncate()
+            total = self.total_bytes()
+        if total >= self.limits.soft_limit_bytes:
+            if self.status == OK:
+                self.soft_limit_hits += 1
+            self.status = HARD_LIMIT if total >= self.limits.hard_limit_bytes else SOFT_LIMIT
+            transcriber = self.conversation.transcriber
+            # Only flush audio when it is what's holding the memory, not on every chunk of a long history
+            if hasattr(transcriber, "force_endpoint") and self.audio_buffer_bytes() * 2 >= total:
+                transcriber.force_endpoint = True
+        else:
+            self.status = OK
+        return self.status
+
+    def _truncate(self):
+        agent = self.conversation.agent
+        messages = getattr(agent, "messages", None)
+        keep = self.limits.min_history_messages
+        if messages and len(messages) > keep + 1:
+            # Keep the system prompt and the most recent turns
+            agent.messages = messages[:1] + messages[-keep:]
+        transcriber = self.conversation.transcriber
+        audio_buffer = getattr(transcriber, "audio_buffer", None)
+        if audio_buffer and self.total_bytes() >= self.limits.hard_limit_bytes:
+            byte_rate = transcriber.get_byte_rate()
+            # Cut on a sample boundary (mono, so a frame is one sample) or every later sample is misaligned
+            frame_size = max(1, byte_rate // transcriber.config.sampling_rate)
+            cut = (len(audio_buffer) - len(audio_buffer) // 2) // frame_size * frame_size
+            del audio_buffer[:cut]
+            if hasattr(transcriber, "buffer_duration"):
+                transcriber.buffer_duration = len(audio_buffer) / byte_rate
+
+    async def wait_for_capacity(self):
+        """Waits while over the soft limit for as long as the synthesizer queue still has data to drain."""
+        while self.status != OK and self.synthesizer_queue_bytes > 0:
+            self._capacity_changed.clear()
+            try:
+                await asyncio.wait_for(self._capacity_changed.wait(), BACKPRESSURE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+CONVERSATION_STARTED = "conversation_started"
+CONNECTIONS_PREWARMED = "connections_prewarmed"
+FIRST_TURN_COMPLETE = "first_turn_complete"
+
+DEFAULT_MODULES = [
+    "streaming_conversation",
+    "chat_gpt_agent",
+    "groq_transcriber",
+    "lemonfox_synthesizer",
+]
+
+_IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+class StartupProfiler:
+    """Records the first occurrence of each startup milestone, in seconds since the profiler was created."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.milestones: Dict[str, float] = {}
+
+    def mark(self, milestone: str):
+        if milestone not in self.milestones:
+            self.milestones[milestone] = time.perf_counter() - self.started_at
+
+    def report(self) -> Dict[str, float]:
+        return dict(sorted(self.milestones.items(), key=lambda item: item[1]))
+
+
+_startup_profiler = StartupProfiler()
+
+
+def get_startup_profiler() -> StartupProfiler:
+    return _startup_profiler
+
+
+def profile_import(module: str, top: int = 10) -> Dict:
+    """Imports `module` in a fresh interpreter with -X importtime.
+
+    Returns the total import time and the `top` slowest top-level dependencies, in milliseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    entries: List[Tuple[str, int, int]] = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(cumulative_us), len(indent)))
+    if result.returncode != 0 or not entries:
+        return {"module": module, "error": result.stderr.strip().splitlines()[-1] if result.stderr else "import failed"}
+    # The module itself is reported last; its direct dependencies are the indented lines just before it
+    total_us = entries[-1][1]
+    dependencies = []
+    for name, cumulative_us, indent in reversed(entries[:-1]):
+        if indent <= 1:
+            break
+        if indent == 3:
+            dependencies.append((name, cumulative_us, indent))
+    heaviest = sorted(dependencies, key=lambda entry: entry[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_ms": total_us / 1000,
+        "heaviest_ms": {name: cumulative_us / 1000 for name, cumulative_us, _ in heaviest},
+        "imports_backend_clients": sorted({
+            name.split(".")[0] for name, _, _ in entries
+        } & {"openai", "aiohttp", "requests", "httpx"}),
+    }
+
+
+async def profile_first_turn(wav_path: str) -> Dict:
+    """Replays one recorded conversation against the fake providers and reports cold-start milestones."""
+    # When this file runs as a script it is __main__, whose profiler StreamingConversation never sees;
+    # the milestones are marked on the one in the importable startup_profiler module
+    import startup_profiler
+    from fake_provider_servers import FakeProviderServers
+    from latency_tracing import TURN_TOTAL, get_latency_tracer
+    from replay_benchmark import create_replay_conversation, load_replay_audio, replay_conversation
+
+    async with FakeProviderServers() as servers:
+        conversation = create_replay_conversation(servers, min_silence_duration=2.0)
+        await replay_conversation(conversation, load_replay_audio(wav_path))
+    return {
+        "milestones_seconds": startup_profiler.get_startup_profiler().report(),
+        "first_turn_ms": get_latency_tracer().summary()[TURN_TOTAL]["max_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time and first-turn latency of a conversation process.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--first-turn", metavar="WAV", help="Also replay this WAV against local fake providers")
+    args = parser.parse_args()
+
+    report = {"imports": [profile_import(module) for module in args.modules]}
+    if args.first_turn:
+        report["first_turn"] = asyncio.run(profile_first_turn(args.first_turn))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
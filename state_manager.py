@@ -1,5 +1,6 @@
 from typing import Optional
 
+from conversation_checkpoint import restore_conversation, snapshot_conversation
 from streaming_conversation import StreamingConversation
 
 class ConversationStateManager:
@@ -45,7 +46,16 @@ class ConversationStateManager:
             self._conversation.mark_terminated()
 
     def set_call_check_for_idle_paused(self, value: bool):
-        pass  # Not implemented in your setup
+        self._conversation.set_idle_check_paused(value)
 
     def get_conversation_id(self):
-        return getattr(self._conversation, 'id', None)
\ No newline at end of file
+        return getattr(self._conversation, 'id', None)
+
+    def get_resource_stats(self) -> dict:
+        return self._conversation.resource_account.stats()
+
+    def snapshot(self) -> bytes:
+        return snapshot_conversation(self._conversation)
+
+    def restore(self, snapshot: bytes):
+        restore_conversation(self._conversation, snapshot)
\ No newline at end of file
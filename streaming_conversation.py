@@ -1,23 +1,35 @@
 import asyncio
 import queue
 import threading
-from typing import Optional
+import time
+from typing import Callable, List, Optional
 
 from base_transcriber import BaseTranscriber
 from base_synthesizer import BaseSynthesizer, SynthesisResult
 from chat_gpt_agent import ChatGPTAgent
+from conversation_recorder import ConversationRecorder, RecordingWriter
+from audio_format import AudioFormat, NegotiatedAudioFormats, negotiate_audio_format
 from audio_pipeline import AudioPipeline, OutputDeviceType
+from barge_in import BargeInDetector
+from resource_accounting import ConversationResourceAccount, ResourceLimits
+from latency_tracing import FIRST_AUDIO_PLAYED, TURN_COMPLETE, get_latency_tracer
+from startup_profiler import CONNECTIONS_PREWARMED, CONVERSATION_STARTED, FIRST_TURN_COMPLETE, get_startup_profiler
+from __init__ import create_conversation_id
 
-class StreamingConversation(AudioPipeline[OutputDeviceType]):
+class StreamingConversation(AudioPipeline):
     def __init__(
         self,
-        output_device,
+        output_device: OutputDeviceType,
         transcriber: BaseTranscriber,
         agent: ChatGPTAgent,
         synthesizer: BaseSynthesizer,
+        conversation_id: Optional[str] = None,
+        audio_chunk_pool: Optional["AudioChunkPool"] = None,
+        resource_limits: Optional[ResourceLimits] = None,
+        component_factory: Optional["DefaultAgentFactory"] = None,
     ):
         super().__init__(output_device)
-        self.id = f"conv_{hash(threading.current_thread().ident)}"  # Simple ID
+        self.id = conversation_id or create_conversation_id()
         self.transcriber = transcriber
         self.agent = agent
         self.synthesizer = synthesizer
@@ -27,16 +39,119 @@ class StreamingConversation(AudioPipeline[OutputDeviceType]):
         self.is_human_speaking = False
         self.is_terminated = asyncio.Event()
         self.interrupt_lock = asyncio.Lock()
+        self.output_playback_until = 0.0  # time.monotonic() at which the audio queued for output ends
         self.current_transcription_is_interrupt = False
+        self.audio_chunk_pool = audio_chunk_pool or AudioChunkPool()
+        self.prewarm_task: Optional[asyncio.Task] = None
+        self.resource_account = ConversationResourceAccount(self, resource_limits)
+        self.audio_formats: Optional[NegotiatedAudioFormats] = None
+        self.input_converter = None
+        self.output_converter = None
+        self.reaper: Optional["ConversationReaper"] = None
+        self.is_idle_check_paused = False
+        self.resources_released = False
+        self.component_factory = component_factory
+        self.recorder: Optional[ConversationRecorder] = None
+        self.barge_in_detector: Optional[BargeInDetector] = None
+
+    def negotiate_audio_formats(self, input_formats: List[AudioFormat]) -> NegotiatedAudioFormats:
+        """Agrees on one wire format with the input device and configures the components to use it.
+
+        Converters are only created for the paths whose ends still disagree.
+        """
+        negotiated = negotiate_audio_format(
+            input_formats,
+            self.transcriber.get_audio_formats(),
+            self.synthesizer.get_audio_formats(),
+            self.output_device.audio_formats,
+        )
+        self.apply_audio_formats(negotiated)
+        return negotiated
+
+    def apply_audio_formats(self, negotiated: NegotiatedAudioFormats):
+        """Configures the components and converters for formats negotiated earlier, e.g. on another worker."""
+        self.transcriber.set_audio_format(negotiated.transcriber_format)
+        self.synthesizer.set_audio_format(negotiated.synthesizer_format)
+        self.audio_formats = negotiated
+        self.input_converter = negotiated.create_input_converter()
+        self.output_converter = negotiated.create_output_converter()
+
+    def convert_input_audio(self, audio_chunk: bytes) -> bytes:
+        if self.input_converter is None:
+            return audio_chunk
+        return self.input_converter.convert(audio_chunk)
+
+    def enable_barge_in(self, **detector_kwargs) -> BargeInDetector:
+        """Interrupts the agent from local mic energy instead of waiting for a transcript."""
+        if self.audio_formats is not None:
+            input_format, output_format = self.audio_formats.transcriber_format, self.audio_formats.output_format
+        else:
+            input_format, output_format = self.transcriber.get_audio_formats()[0], self.output_device.audio_formats[0]
+        self.barge_in_detector = BargeInDetector(input_format, output_format, **detector_kwargs)
+        return self.barge_in_detector
+
+    def start_recording(self, writer: RecordingWriter) -> ConversationRecorder:
+        """Records both sides of the call, in the formats the transcriber and output device see."""
+        if self.audio_formats is not None:
+            input_format, output_format = self.audio_formats.transcriber_format, self.audio_formats.output_format
+        else:
+            input_format, output_format = self.transcriber.get_audio_formats()[0], self.output_device.audio_formats[0]
+        self.recorder = ConversationRecorder(writer, self.id, input_format, output_format)
+        return self.recorder
+
+    async def process_input_audio(self, audio_chunk: bytes):
+        """Feeds one chunk from the input device to the transcriber, resetting the idle timer if it holds speech."""
+        audio_chunk = self.convert_input_audio(audio_chunk)
+        if self.reaper is not None and self.is_speech(audio_chunk):
+            self.reaper.touch(self.id)
+        if self.recorder is not None:
+            self.recorder.record_input(audio_chunk)
+        if self.barge_in_detector is not None and self.barge_in_detector.process(audio_chunk):
+            self.current_transcription_is_interrupt = await self.broadcast_interrupt()
+        transcription_result = await self.transcriber.process(audio_chunk)
+        if transcription_result:
+            # The transcript of speech that barged in arrives after the interrupt already fired
+            if self.current_transcription_is_interrupt:
+                transcription_result["is_interrupt"] = True
+                self.current_transcription_is_interrupt = False
+            if self.recorder is not None:
+                self.recorder.mark_human_turn(transcription_result["message"])
+        return transcription_result
+
+    def is_speech(self, audio_chunk: bytes) -> bool:
+        return self.transcriber.is_speech(audio_chunk)
+
+    def set_idle_check_paused(self, paused: bool):
+        self.is_idle_check_paused = paused
+        if self.reaper is None:
+            return
+        if paused:
+            self.reaper.pause(self.id)
+        else:
+            self.reaper.resume(self.id)
 
     async def start(self):
         self.transcriber.streaming_conversation = self
         await self.transcriber.start()
-        self.start()  # Start the audio pipeline
+        super().start()  # Start the audio pipeline
         self.synthesizer.streaming_conversation = self
         await self.synthesizer.start()  # Assuming start method exists
         await self.agent.start()
         self.is_terminated.clear()
+        self.resources_released = False
+        # Runs in the background so connection setup overlaps with the greeting
+        self.prewarm_task = self.resource_account.track_task(asyncio.create_task(self.prewarm()))
+        get_startup_profiler().mark(CONVERSATION_STARTED)
+
+    async def prewarm(self):
+        """Opens keep-alive connections to the transcriber, agent and synthesizer endpoints concurrently."""
+        await asyncio.gather(
+            self.transcriber.prewarm(),
+            self.agent.prewarm(),
+            self.synthesizer.prewarm(),
+            return_exceptions=True,
+        )
+        get_startup_profiler().mark(CONNECTIONS_PREWARMED)
 
     async def broadcast_interrupt(self):
         """Stops all inflight events and cancels workers sending output."""
@@ -51,41 +166,137 @@ class StreamingConversation(AudioPipeline[OutputDeviceType]):
                 except queue.Empty:
                     break
             self.output_device.interrupt()
+            self.output_playback_until = 0.0
+            if self.barge_in_detector is not None:
+                self.barge_in_detector.reset()
             return num_interrupts > 0
 
+    def discard_finished_events(self):
+        """Drops finished or already interrupted events so the queue only holds work that can still be stopped."""
+        pending = []
+        while True:
+            try:
+                interruptible_event = self.interruptible_events.get_nowait()
+            except queue.Empty:
+                break
+            if interruptible_event.on_interrupt is not None and not interruptible_event.is_interrupted():
+                pending.append(interruptible_event)
+        for interruptible_event in pending:
+            self.interruptible_events.put_nowait(interruptible_event)
+
     async def send_speech_to_output(
         self,
         message: str,
         synthesis_result: SynthesisResult,
         stop_event: threading.Event,
         seconds_per_chunk: float = 0.5,
+        chunk_size: Optional[int] = None,
     ):
-        """Sends speech chunk by chunk to the output device, stopping if interrupted."""
-        audio_chunks = []
-        interrupted_before_all_chunks_sent = False
+        """Sends speech chunk by chunk to the output device, stopping if interrupted.
+
+        Chunks are views into the synthesized buffers rather than copies; if `chunk_size`
+        is set, larger synthesized buffers are sliced into views of at most that many bytes.
+        The utterance stays interruptible until its audio has finished playing, so an
+        interrupt after synthesis is done still cuts the agent's message off. The cutoff is
+        where playback had got to: the time since the utterance started playing, which is
+        capped by the audio sent so far.
+        """
+        byte_rate = self.synthesizer.get_byte_rate()
+        bytes_sent = 0  # in the synthesizer's format, which the cutoff index is built on
+        playback_started_at = None
+        on_interrupt = stop_event.set  # shared by every chunk of this utterance
+        tracer = get_latency_tracer()
+        if self.recorder is not None:
+            self.recorder.mark_agent_turn(message)
+
+        def cut_off():
+            stop_event.set()
+            seconds_played = 0.0
+            if playback_started_at is not None:
+                seconds_played = min(max(0.0, time.monotonic() - playback_started_at), bytes_sent / byte_rate)
+            self.agent.update_last_bot_message_on_cut_off(synthesis_result.get_message_up_to(seconds_played))
+            if self.recorder is not None:
+                self.recorder.mark_interrupt()
 
-        async for chunk_idx, chunk_result in self._enumerate_async(synthesis_result.chunk_generator):
+        utterance = InterruptibleEvent(message, cut_off)
+        self.interruptible_events.put_nowait(utterance)
+
+        async for chunk_result in synthesis_result.chunk_generator:
             if stop_event.is_set():
-                interrupted_before_all_chunks_sent = True
+                if not utterance.is_interrupted():
+                    utterance.interrupt()
                 break
-            audio_chunk = AudioChunk(data=chunk_result.chunk)
-            setattr(audio_chunk, "on_interrupt", lambda: stop_event.set())
-            async with self.interrupt_lock:
-                self.output_device.consume_nonblocking(audio_chunk)
-            audio_chunks.append(audio_chunk)
+            audio = chunk_result.chunk
+            is_first_chunk = playback_started_at is None
+            if is_first_chunk:
+                # Queued behind whatever is still playing from an earlier utterance
+                playback_started_at = max(time.monotonic(), self.output_playback_until)
+            bytes_sent += len(audio)
+            self.output_playback_until = playback_started_at + bytes_sent / byte_rate
+            if self.output_converter is not None:
+                audio = self.output_converter.convert(audio)
+            buffer = memoryview(audio)
+            if self.recorder is not None:
+                self.recorder.record_output(buffer)
+            if self.barge_in_detector is not None:
+                self.barge_in_detector.add_playback(buffer)
+            step = chunk_size or len(buffer) or 1
+            for offset in range(0, len(buffer), step):
+                audio_chunk = self.audio_chunk_pool.acquire(buffer[offset:offset + step], on_interrupt)
+                async with self.interrupt_lock:
+                    self.output_device.consume_nonblocking(audio_chunk)
+            if is_first_chunk:
+                # Played when the audio queued ahead of it has finished, not when it was handed over
+                tracer.mark(self.id, FIRST_AUDIO_PLAYED, delay_seconds=playback_started_at - time.monotonic())
+            if self.reaper is not None:
+                self.reaper.touch(self.id)
+
+        interrupted = utterance.is_interrupted()
+        if not interrupted:
+            remaining = self.output_playback_until - time.monotonic() if playback_started_at is not None else 0
+            if remaining > 0:
+                asyncio.get_running_loop().call_later(remaining, self.finish_utterance, utterance)
+            else:
+                self.finish_utterance(utterance)
+        tracer.mark(self.id, TURN_COMPLETE)
+        get_startup_profiler().mark(FIRST_TURN_COMPLETE)
+        return not interrupted, interrupted
 
-        return not interrupted_before_all_chunks_sent, interrupted_before_all_chunks_sent
+    def finish_utterance(self, utterance: "InterruptibleEvent"):
+        """Called once an utterance has finished playing; it can no longer be interrupted."""
+        utterance.finish()
+        self.discard_finished_events()
 
     def mark_terminated(self):
         self.is_terminated.set()
 
     async def terminate(self):
+        """Stops the conversation and releases everything it holds; safe to call more than once."""
         self.mark_terminated()
+        if self.resources_released:
+            return
+        self.resources_released = True
+        if self.reaper is not None:
+            self.reaper.unregister(self.id)
+        if self.recorder is not None:
+            self.recorder.close()
+        get_latency_tracer().discard(self.id)
+        self.resource_account.cancel_tasks()
         await self.broadcast_interrupt()
-        await self.synthesizer.tear_down()
-        await self.agent.terminate()
-        await self.output_device.terminate()
-        await self.transcriber.stop()
+        audio_buffer = getattr(self.transcriber, "audio_buffer", None)
+        if audio_buffer is not None:
+            audio_buffer.clear()
+        if self.component_factory is not None:
+            # Pooled components go back to the factory with their connections still open
+            releases = [self.component_factory.release_conversation(self)]
+        else:
+            releases = [self.synthesizer.tear_down(), self.agent.terminate(), self.transcriber.stop()]
+        results = await asyncio.gather(*releases, self.output_device.terminate(), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Error releasing resources of conversation {self.id}: {result}")
+        self.audio_chunk_pool.clear()
+        self.input_converter = self.output_converter = None
 
     def is_active(self):
         return not self.is_terminated.is_set()
@@ -93,31 +304,80 @@ class StreamingConversation(AudioPipeline[OutputDeviceType]):
     async def wait_for_termination(self):
         await self.is_terminated.wait()
 
-    # Helper method to enumerate async iterator
-    async def _enumerate_async(self, iterable):
-        idx = 0
-        async for item in iterable:
-            yield idx, item
-            idx += 1
+class InterruptibleEvent:
+    """Work in flight, such as an utterance being played, that `broadcast_interrupt` can stop."""
+
+    def __init__(self, payload=None, on_interrupt: Optional[Callable[[], None]] = None):
+        self.payload = payload
+        self.on_interrupt = on_interrupt
+        self.state = None
+
+    def is_interrupted(self):
+        return self.state == "interrupted"
+
+    def interrupt(self):
+        if self.on_interrupt is not None:
+            self.on_interrupt()
+            self.state = "interrupted"
+            return True
+        return False
+
+    def finish(self):
+        """Marks the work as done so a later interrupt doesn't count it."""
+        self.on_interrupt = None
 
-# Simple AudioChunk class
 class AudioChunk:
-    def __init__(self, data):
+    __slots__ = ("data", "state", "on_interrupt", "pool")
+
+    def __init__(
+        self,
+        data: memoryview,
+        on_interrupt: Optional[Callable[[], None]] = None,
+        pool: Optional["AudioChunkPool"] = None,
+    ):
         self.data = data
         self.state = None
-
-    def __setattr__(self, name, value):
-        if name in ["on_play", "on_interrupt"]:
-            self.__dict__[name] = value
-        else:
-            super().__setattr__(name, value)
+        self.on_interrupt = on_interrupt
+        self.pool = pool
 
     def is_interrupted(self):
-        return getattr(self, "state", None) == "interrupted"
+        return self.state == "interrupted"
 
     def interrupt(self):
-        if hasattr(self, "on_interrupt"):
+        if self.on_interrupt is not None:
             self.on_interrupt()
             self.state = "interrupted"
             return True
-        return False
\ No newline at end of file
+        return False
+
+    def release(self):
+        """Called by the output device once the chunk has been played or dropped."""
+        if self.pool is not None:
+            self.pool.release(self)
+
+
+class AudioChunkPool:
+    """Recycles AudioChunk instances; with `max_size=0` it simply allocates fresh chunks."""
+
+    def __init__(self, max_size: int = 0):
+        self.max_size = max_size
+        self._free: List[AudioChunk] = []
+
+    def acquire(self, data: memoryview, on_interrupt: Optional[Callable[[], None]] = None) -> AudioChunk:
+        if self._free:
+            audio_chunk = self._free.pop()
+            audio_chunk.data = data
+            audio_chunk.state = None
+            audio_chunk.on_interrupt = on_interrupt
+            return audio_chunk
+        return AudioChunk(data, on_interrupt, self if self.max_size else None)
+
+    def clear(self):
+        self._free.clear()
+
+    def release(self, audio_chunk: AudioChunk):
+        # Drop references so the synthesized buffer can be freed while the chunk sits in the pool
+        audio_chunk.data = None
+        audio_chunk.on_interrupt = None
+        if len(self._free) < self.max_size:
+            self._free.append(audio_chunk)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The package modules import each other by top-level name (e.g. `from __init__ import ...`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
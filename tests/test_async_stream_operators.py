@@ -0,0 +1,241 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from __init__ import (
+    batch_async_iter,
+    generate_from_async_iter_with_lookahead,
+    generate_from_queue,
+    merge_async_iters,
+    pace_async_iter,
+    tee_async_iter,
+)
+from lemonfox_synthesizer import LemonFoxSynthesizer, LemonFoxSynthesizerConfig
+
+
+class CountingSource:
+    """Async iterator over `items` that records how many have been read."""
+
+    def __init__(self, items, delay: float = 0.0, error: Exception = None):
+        self.items = list(items)
+        self.delay = delay
+        self.error = error
+        self.produced = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.produced == len(self.items):
+            if self.error is not None:
+                raise self.error
+            raise StopAsyncIteration
+        self.produced += 1
+        return self.items[self.produced - 1]
+
+
+async def collect(async_iter):
+    return [item async for item in async_iter]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_lookahead_yields_sliding_windows():
+    windows = run(collect(generate_from_async_iter_with_lookahead(CountingSource(range(5)), 2)))
+    assert windows == [[0, 1, 2], [1, 2, 3], [2, 3, 4]]
+
+
+def test_lookahead_yields_short_stream_whole():
+    assert run(collect(generate_from_async_iter_with_lookahead(CountingSource(range(2)), 3))) == [[0, 1]]
+    assert run(collect(generate_from_async_iter_with_lookahead(CountingSource([]), 3))) == []
+
+
+def test_generate_from_queue_stops_at_sentinel():
+    async def main():
+        queue = asyncio.Queue()
+        for item in (1, 2, None, 3):
+            queue.put_nowait(item)
+        items = await collect(generate_from_queue(queue))
+        return items, queue.qsize()
+
+    assert run(main()) == ([1, 2], 1)
+
+
+def test_generate_from_queue_custom_sentinel():
+    async def main():
+        queue = asyncio.Queue()
+        end = object()
+        for item in (None, 0, end):
+            queue.put_nowait(item)
+        return await collect(generate_from_queue(queue, sentinel=end))
+
+    assert run(main()) == [None, 0]
+
+
+def test_synthesizer_drains_its_chunk_queue_and_releases_the_bytes():
+    class QueueAccount:
+        def __init__(self):
+            self.synthesizer_queue_bytes = 5
+
+        def add_synthesizer_queue_bytes(self, num_bytes):
+            self.synthesizer_queue_bytes += num_bytes
+
+    async def main():
+        synthesizer = LemonFoxSynthesizer(LemonFoxSynthesizerConfig(api_key="fake"))
+        synthesizer.streaming_conversation = SimpleNamespace(resource_account=QueueAccount())
+        queue = asyncio.Queue()
+        for chunk in (b"ab", b"cde", None):
+            queue.put_nowait(chunk)
+        results = await collect(synthesizer.chunk_result_generator_from_queue(queue))
+        return [result.chunk for result in results], synthesizer.streaming_conversation.resource_account
+
+    chunks, account = run(main())
+    assert chunks == [b"ab", b"cde"]
+    assert account.synthesizer_queue_bytes == 0
+
+
+def test_batch_flushes_by_size():
+    batches = run(collect(batch_async_iter(CountingSource(range(7)), max_size=3, max_delay=10.0)))
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_batch_flushes_by_time():
+    async def main():
+        source = CountingSource(range(4), delay=0.05)
+        start = time.monotonic()
+        batches = await collect(batch_async_iter(source, max_size=100, max_delay=0.01))
+        return batches, time.monotonic() - start
+
+    batches, elapsed = run(main())
+    # Items arrive further apart than max_delay, so none of them waits for a full batch
+    assert [item for batch in batches for item in batch] == [0, 1, 2, 3]
+    assert len(batches) == 4
+    assert elapsed < 1.0
+
+
+def test_batch_reads_at_most_max_size_ahead():
+    async def main():
+        source = CountingSource(range(100))
+        batches = batch_async_iter(source, max_size=4, max_delay=10.0)
+        first = await batches.__anext__()
+        await asyncio.sleep(0.01)  # give the pump every chance to run ahead
+        produced = source.produced
+        await batches.aclose()
+        return first, produced
+
+    first, produced = run(main())
+    assert first == [0, 1, 2, 3]
+    # One batch handed out, one queue's worth buffered and one item blocked on the full queue
+    assert produced <= 4 + 4 + 1
+
+
+def test_batch_reraises_source_error_after_items():
+    async def main():
+        seen = []
+        with pytest.raises(ValueError):
+            async for batch in batch_async_iter(CountingSource(range(3), error=ValueError("boom")), 2, 10.0):
+                seen.extend(batch)
+        return seen
+
+    assert run(main()) == [0, 1, 2]
+
+
+def test_merge_yields_every_item_once():
+    async def main():
+        sources = [CountingSource(range(i * 10, i * 10 + 10), delay=0.001 * (i + 1)) for i in range(3)]
+        return await collect(merge_async_iters(*sources, max_buffered=2))
+
+    items = run(main())
+    assert sorted(items) == list(range(30))
+
+
+def test_merge_blocks_fast_producers():
+    async def main():
+        sources = [CountingSource(range(1000)), CountingSource(range(1000))]
+        merged = merge_async_iters(*sources, max_buffered=1)
+        await merged.__anext__()
+        await asyncio.sleep(0.01)
+        produced = sum(source.produced for source in sources)
+        await merged.aclose()
+        return produced
+
+    # One item yielded, one buffered and at most one more held by each blocked pump
+    assert run(main()) <= 1 + 1 + 2
+
+
+def test_merge_reraises_source_error():
+    async def main():
+        with pytest.raises(RuntimeError):
+            await collect(merge_async_iters(CountingSource(range(3)), CountingSource([], error=RuntimeError("down"))))
+
+    run(main())
+
+
+def test_tee_gives_every_consumer_every_item():
+    async def main():
+        first, second, third = tee_async_iter(CountingSource(range(50)), n=3, max_lag=4)
+        return await asyncio.gather(collect(first), collect(second), collect(third))
+
+    assert run(main()) == [list(range(50))] * 3
+
+
+def test_tee_bounds_lead_over_slowest_consumer():
+    async def main():
+        source = CountingSource(range(1000))
+        fast, slow = tee_async_iter(source, n=2, max_lag=5)
+        fast_items = []
+
+        async def read_fast():
+            async for item in fast:
+                fast_items.append(item)
+
+        task = asyncio.create_task(read_fast())
+        await asyncio.sleep(0.02)  # the slow consumer hasn't read anything yet
+        lead = len(fast_items)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await slow.aclose()
+        return lead
+
+    # The slow consumer's queue holds max_lag items; the pump blocks on the next one
+    assert run(main()) <= 5 + 1
+
+
+def test_tee_closed_consumer_does_not_block_others():
+    async def main():
+        first, second = tee_async_iter(CountingSource(range(100)), n=2, max_lag=2)
+        assert await first.__anext__() == 0
+        await first.aclose()
+        return await asyncio.wait_for(collect(second), 2.0)
+
+    assert run(main()) == list(range(100))
+
+
+def test_pace_limits_rate():
+    async def main():
+        start = time.monotonic()
+        items = await collect(pace_async_iter(CountingSource(range(6)), rate=50.0, burst=1.0))
+        return items, time.monotonic() - start
+
+    items, elapsed = run(main())
+    assert items == list(range(6))
+    # The first item uses the initial token; the other five each wait 1/50 s
+    assert 0.09 <= elapsed < 0.5
+
+
+def test_pace_allows_burst_then_uses_item_cost():
+    async def main():
+        start = time.monotonic()
+        items = await collect(pace_async_iter(CountingSource([0.5, 0.5, 1.0]), rate=10.0, burst=1.0, cost=lambda item: item))
+        return items, time.monotonic() - start
+
+    items, elapsed = run(main())
+    assert items == [0.5, 0.5, 1.0]
+    # Two half-cost items fit in the burst; the last one waits for a whole token (0.1 s)
+    assert 0.08 <= elapsed < 0.4
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+from base_synthesizer import SynthesisResult
+from lemonfox_synthesizer import LemonFoxSynthesizer, LemonFoxSynthesizerConfig
+from replay_benchmark import NullOutputDevice
+from streaming_conversation import AudioChunk, AudioChunkPool, StreamingConversation
+
+
+def test_released_chunks_are_reused_and_reset():
+    pool = AudioChunkPool(max_size=2)
+    buffer = memoryview(b"abcd")
+    chunk = pool.acquire(buffer[:2], on_interrupt=lambda: None)
+    chunk.interrupt()
+    chunk.release()
+    # Nothing from the last utterance is kept alive while the chunk waits in the pool
+    assert chunk.data is None and chunk.on_interrupt is None
+
+    reused = pool.acquire(buffer[2:])
+    assert reused is chunk
+    assert bytes(reused.data) == b"cd"
+    assert reused.state is None and not reused.is_interrupted()
+    assert not reused.interrupt()
+
+
+def test_pool_keeps_at_most_max_size_chunks():
+    pool = AudioChunkPool(max_size=1)
+    first, second = pool.acquire(memoryview(b"a")), pool.acquire(memoryview(b"b"))
+    first.release()
+    second.release()
+    assert pool.acquire(memoryview(b"c")) is first
+    assert pool.acquire(memoryview(b"d")) not in (first, second)
+
+
+def test_default_pool_does_not_recycle():
+    pool = AudioChunkPool()
+    chunk = pool.acquire(memoryview(b"a"))
+    assert chunk.pool is None
+    chunk.release()
+    assert bytes(chunk.data) == b"a"
+    assert pool.acquire(memoryview(b"b")) is not chunk
+
+
+def test_chunks_are_views_into_the_synthesized_buffer():
+    class CollectingOutputDevice(NullOutputDevice):
+        def __init__(self):
+            super().__init__()
+            self.chunks = []
+
+        def consume_nonblocking(self, item):
+            self.chunks.append((item.data, item.on_interrupt))
+
+    async def run():
+        synthesizer = LemonFoxSynthesizer(LemonFoxSynthesizerConfig(api_key="fake"))
+        output_device = CollectingOutputDevice()
+        conversation = StreamingConversation(output_device, None, None, synthesizer)
+        audio = bytes(range(250))
+
+        async def chunks():
+            yield SynthesisResult.ChunkResult(audio, True)
+
+        stop_event = threading.Event()
+        await conversation.send_speech_to_output("hi", SynthesisResult(chunks(), lambda seconds: ""), stop_event, chunk_size=100)
+        return audio, output_device.chunks, stop_event
+
+    audio, chunks, stop_event = asyncio.run(run())
+    assert [bytes(data) for data, _ in chunks] == [audio[:100], audio[100:200], audio[200:]]
+    assert all(data.obj is audio for data, _ in chunks)
+    assert all(on_interrupt == stop_event.set for _, on_interrupt in chunks)
+
+
+def test_audio_chunk_has_no_instance_dict():
+    chunk = AudioChunk(memoryview(b""))
+    assert not hasattr(chunk, "__dict__")
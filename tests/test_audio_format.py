@@ -0,0 +1,73 @@
+import audioop
+import random
+
+import pytest
+
+from audio_format import LINEAR16, MULAW, AudioConverter, AudioFormat, negotiate_audio_format
+
+
+def pcm(num_samples: int, seed: int = 0) -> bytes:
+    return random.Random(seed).randbytes(num_samples * 2)
+
+
+def convert_in_chunks(converter: AudioConverter, audio: bytes, chunk_size: int) -> bytes:
+    return b"".join(converter.convert(audio[offset:offset + chunk_size]) for offset in range(0, len(audio), chunk_size))
+
+
+@pytest.mark.parametrize("to_format", [AudioFormat(16000), AudioFormat(24000, MULAW), AudioFormat(8000, MULAW)])
+def test_odd_sized_chunks_are_converted_whole(to_format):
+    audio = pcm(4800)
+    whole = AudioConverter(AudioFormat(24000), to_format).convert(audio)
+    # 1023 splits samples at every chunk boundary
+    assert convert_in_chunks(AudioConverter(AudioFormat(24000), to_format), audio, 1023) == whole
+
+
+def test_single_odd_chunk_is_held_back():
+    converter = AudioConverter(AudioFormat(24000), AudioFormat(16000))
+    # 511 whole samples resample to 341; the odd byte waits for its other half
+    first = converter.convert(b"\0" * 1023)
+    assert len(first) == 341 * 2
+    assert first + converter.convert(b"\0") == AudioConverter(AudioFormat(24000), AudioFormat(16000)).convert(b"\0" * 1024)
+
+
+def test_resampler_state_is_carried_across_chunks():
+    audio = pcm(24000)
+    whole = AudioConverter(AudioFormat(24000), AudioFormat(16000)).convert(audio)
+    chunked = convert_in_chunks(AudioConverter(AudioFormat(24000), AudioFormat(16000)), audio, 962)
+    assert chunked == whole
+    # Restarting the resampler on every chunk gives different audio
+    restarted = b"".join(
+        audioop.ratecv(audio[offset:offset + 962], 2, 1, 24000, 16000, None)[0] for offset in range(0, len(audio), 962)
+    )
+    assert restarted != whole
+
+
+def test_mulaw_input_of_any_length():
+    converter = AudioConverter(AudioFormat(8000, MULAW), AudioFormat(16000))
+    assert len(converter.convert(b"\xff" * 161)) % 2 == 0
+
+
+def test_negotiation_avoids_conversions_when_a_format_is_shared():
+    negotiated = negotiate_audio_format(
+        [AudioFormat(48000), AudioFormat(16000)],
+        [AudioFormat(16000)],
+        [AudioFormat(24000), AudioFormat(16000)],
+        [AudioFormat(16000), AudioFormat(8000, MULAW)],
+    )
+    assert negotiated.wire_format == AudioFormat(16000)
+    assert negotiated.num_conversions() == 0
+    assert negotiated.create_input_converter() is None
+    assert negotiated.create_output_converter() is None
+
+
+def test_negotiation_converts_only_where_the_ends_disagree():
+    negotiated = negotiate_audio_format(
+        [AudioFormat(8000, MULAW)],
+        [AudioFormat(16000)],
+        [AudioFormat(8000, MULAW), AudioFormat(16000)],
+        [AudioFormat(8000, MULAW)],
+    )
+    assert negotiated.num_conversions() == 1
+    assert negotiated.synthesizer_format == AudioFormat(8000, MULAW)
+    converter = negotiated.create_input_converter()
+    assert (converter.from_format, converter.to_format) == (AudioFormat(8000, MULAW), AudioFormat(16000, LINEAR16))
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from barge_in import BargeInDetector
+from barge_in_benchmark import run_barge_in_benchmark, run_trial
+
+TRIALS = 50
+
+
+@pytest.mark.parametrize("echo_delay_seconds", [0.0, 0.04, 0.15, 0.3, 0.45])
+def test_detection_and_false_positive_bounds(echo_delay_seconds):
+    result = run_barge_in_benchmark(TRIALS, seed=1, echo_delay_seconds=echo_delay_seconds)
+    assert result["detection_rate"] >= 0.95
+    assert result["false_positive_rate"] <= 0.02
+    assert result["latency_ms"]["p50"] <= 100
+    # The tail is users who start before the echo delay has been estimated
+    assert result["latency_ms"]["p95"] <= 300
+
+
+def test_louder_echo_stays_below_the_false_positive_bound():
+    result = run_barge_in_benchmark(TRIALS, seed=2, echo_gain=0.6, echo_delay_seconds=0.15)
+    assert result["false_positive_rate"] <= 0.05
+
+
+@pytest.mark.parametrize("echo_delay_seconds", [0.04, 0.15, 0.3])
+def test_estimates_the_echo_delay(echo_delay_seconds, monkeypatch):
+    detectors = []
+    original_init = BargeInDetector.__init__
+
+    def init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        detectors.append(self)
+
+    monkeypatch.setattr(BargeInDetector, "__init__", init)
+    rng = random.Random(3)
+    for _ in range(5):
+        run_trial(rng, barge_in=False, echo_delay_seconds=echo_delay_seconds)
+    for detector in detectors:
+        assert detector.echo_delay == pytest.approx(echo_delay_seconds, abs=0.021)
@@ -0,0 +1,84 @@
+import zlib
+from types import SimpleNamespace
+
+import pytest
+
+from audio_format import MULAW, AudioFormat
+from base_transcriber import EndpointingConfig
+from conversation_checkpoint import (
+    _HEADER,
+    _section,
+    CHECKPOINT_VERSION,
+    FLAG_COMPRESSED,
+    MAGIC,
+    TAG_TRANSCRIPT,
+    CheckpointError,
+    read_checkpoint,
+    restore_conversation,
+    snapshot_conversation,
+)
+from replay_benchmark import create_replay_conversation
+
+SERVERS = SimpleNamespace(whisper_url="http://127.0.0.1:1/whisper", openai_base_url="http://127.0.0.1:1/v1", lemonfox_url="http://127.0.0.1:1/tts")
+
+
+def create_conversation():
+    return create_replay_conversation(SERVERS, min_silence_duration=2.0)
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_snapshot_restore_roundtrip(compress):
+    conversation = create_conversation()
+    conversation.negotiate_audio_formats([AudioFormat(8000, MULAW)])
+    conversation.transcript = "hello there"
+    conversation.is_human_speaking = True
+    conversation.agent.messages.append({"role": "user", "content": "héllo"})
+    transcriber = conversation.transcriber
+    transcriber.audio_buffer.extend(b"\1\2" * 100)
+    transcriber.buffer_duration = 0.5
+    transcriber.time_silent = 0.25
+    transcriber.speech_duration = 0.3
+    transcriber.config.endpointing_config = EndpointingConfig(min_silence_duration=0.7)
+
+    restored = restore_conversation(create_conversation(), snapshot_conversation(conversation, compress=compress))
+
+    assert restored.id == conversation.id
+    assert restored.transcript == "hello there"
+    assert restored.is_human_speaking
+    assert restored.agent.messages == conversation.agent.messages
+    assert restored.transcriber.audio_buffer == transcriber.audio_buffer
+    assert (restored.transcriber.buffer_duration, restored.transcriber.time_silent) == (0.5, 0.25)
+    assert restored.transcriber.speech_duration == 0.3
+    assert restored.transcriber.config.endpointing_config.min_silence_duration == 0.7
+    assert restored.transcriber.config.endpointing_config is not transcriber.config.endpointing_config
+    assert vars(restored.audio_formats) == vars(conversation.audio_formats)
+    assert restored.input_converter is not None
+
+
+def checkpoint(payload: bytes, flags: int = 0) -> bytes:
+    return _HEADER.pack(MAGIC, CHECKPOINT_VERSION, flags) + payload
+
+
+@pytest.mark.parametrize("data", [
+    b"IMC",
+    b"XXXX\x01\x00",
+    checkpoint(b"\x01\x00"),  # half a section header
+    checkpoint(_section(TAG_TRANSCRIPT, b"hello")[:-1]),  # body shorter than its length
+    checkpoint(b"not zlib", FLAG_COMPRESSED),
+    checkpoint(zlib.compress(_section(TAG_TRANSCRIPT, b"hello"))[:-3], FLAG_COMPRESSED),
+])
+def test_corrupt_checkpoints_raise_checkpoint_error(data):
+    with pytest.raises(CheckpointError):
+        read_checkpoint(data)
+
+
+def test_newer_version_is_rejected():
+    with pytest.raises(CheckpointError):
+        read_checkpoint(_HEADER.pack(MAGIC, CHECKPOINT_VERSION + 1, 0))
+
+
+def test_unknown_tags_are_skipped():
+    data = checkpoint(_section(200, b"from a newer writer") + _section(TAG_TRANSCRIPT, "hi".encode("utf-8")))
+    assert bytes(read_checkpoint(data)[TAG_TRANSCRIPT]) == b"hi"
+    conversation = restore_conversation(create_conversation(), data)
+    assert conversation.transcript == "hi"
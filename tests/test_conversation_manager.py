@@ -0,0 +1,102 @@
+import asyncio
+import queue
+
+from conversation_manager import ConversationManager, ConversationWorker, ShardedConversationManager
+
+
+class FakeConversation:
+    def __init__(self, conversation_id: str):
+        self.id = conversation_id
+        self.reaper = None
+        self.is_terminated = asyncio.Event()
+        self.terminate_calls = 0
+
+    async def start(self):
+        pass
+
+    def mark_terminated(self):
+        self.is_terminated.set()
+
+    async def wait_for_termination(self):
+        await self.is_terminated.wait()
+
+    async def terminate(self):
+        self.terminate_calls += 1
+        self.mark_terminated()
+
+
+def test_conversation_that_ends_on_its_own_is_reported_and_released():
+    async def run():
+        finished = []
+        manager = ConversationManager(on_conversation_finished=finished.append)
+        conversation_id = await manager.start_conversation(FakeConversation, "a")
+        conversation = manager.get_conversation(conversation_id)
+        # e.g. the caller hung up
+        conversation.mark_terminated()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        await manager.terminate_all()
+        return manager, conversation, finished
+
+    manager, conversation, finished = asyncio.run(run())
+    assert finished == ["a"]
+    assert manager.active_count() == 0
+    assert conversation.terminate_calls == 1
+    assert "a" not in manager.reaper.entries
+
+
+def test_explicit_terminate_is_reported_too():
+    async def run():
+        finished = []
+        manager = ConversationManager(on_conversation_finished=finished.append)
+        await manager.start_conversation(FakeConversation, "a")
+        await manager.terminate_conversation("a")
+        await asyncio.sleep(0)
+        await manager.terminate_all()
+        return finished
+
+    assert asyncio.run(run()) == ["a"]
+
+
+def create_worker() -> ConversationWorker:
+    worker = ConversationWorker(max_conversations=10)
+    # In-process queues, so the test doesn't depend on multiprocessing's feeder threads
+    worker.commands, worker.results, worker.events = queue.Queue(), queue.Queue(), queue.Queue()
+    return worker
+
+
+def test_sharded_manager_prunes_conversations_that_finished_on_their_worker():
+    sharded = ShardedConversationManager(num_workers=2)
+    source, target = create_worker(), create_worker()
+    sharded.workers = [source, target]
+    sharded.start_conversation(FakeConversation, conversation_id="ended", worker=source)
+    sharded.start_conversation(FakeConversation, conversation_id="migrated", worker=source)
+    # "migrated" moved to the other worker; its old worker then reports it finished
+    sharded.conversation_workers["migrated"] = target
+    source.events.put(("finished", "ended"))
+    source.events.put(("finished", "migrated"))
+
+    sharded.prune_finished()
+
+    assert sharded.conversation_workers == {"migrated": target}
+    assert list(sharded.conversation_factories) == ["migrated"]
+
+
+def test_terminating_checkpoint_drops_the_factory():
+    sharded = ShardedConversationManager(num_workers=1)
+    worker = create_worker()
+    sharded.workers = [worker]
+    sharded.start_conversation(FakeConversation, conversation_id="a", worker=worker)
+    worker.results.put((0, b"snapshot"))
+    assert sharded.checkpoint_conversation("a", terminate=True) == b"snapshot"
+    assert sharded.conversation_workers == {}
+    assert sharded.conversation_factories == {}
+
+
+def test_request_ignores_late_replies_to_earlier_requests():
+    worker = create_worker()
+    worker.next_request_id = 5
+    worker.results.put((3, "stale"))
+    worker.results.put((5, "fresh"))
+    assert worker.request("checkpoint", "a", False, timeout=1.0) == "fresh"
+    assert worker.commands.get_nowait() == ("checkpoint", 5, "a", False)
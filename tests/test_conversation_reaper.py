@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from conversation_reaper import ConversationReaper, TimerWheel
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr("conversation_reaper.time.monotonic", clock)
+    return clock
+
+
+class FakeConversation:
+    def __init__(self, id: str):
+        self.id = id
+        self.reaper = None
+        self.terminated = False
+
+    async def terminate(self):
+        self.terminated = True
+
+
+def test_wheel_expires_keys_at_their_deadline(clock):
+    wheel = TimerWheel(tick_seconds=1.0, num_slots=8)
+    wheel.schedule("a", 1003.0)
+    wheel.schedule("b", 1005.0)
+    assert wheel.advance(1002.5) == []
+    assert wheel.advance(1003.0) == ["a"]
+    assert wheel.advance(1010.0) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_wheel_moves_deadlines_in_both_directions(clock):
+    wheel = TimerWheel(tick_seconds=1.0, num_slots=8)
+    wheel.schedule("later", 1002.0)
+    wheel.schedule("later", 1006.0)  # pushed back
+    wheel.schedule("sooner", 1006.0)
+    wheel.schedule("sooner", 1001.0)  # brought forward
+    assert wheel.advance(1001.0) == ["sooner"]
+    assert wheel.advance(1005.0) == []
+    assert wheel.advance(1006.0) == ["later"]
+
+
+def test_wheel_handles_deadlines_beyond_one_rotation_and_cancel(clock):
+    wheel = TimerWheel(tick_seconds=1.0, num_slots=4)
+    wheel.schedule("far", 1010.0)
+    wheel.schedule("cancelled", 1002.0)
+    wheel.cancel("cancelled")
+    # "far" shares a slot with ticks 1002 and 1006 but only expires at 1010
+    assert wheel.advance(1009.0) == []
+    assert wheel.advance(1010.0) == ["far"]
+
+
+def test_reaper_terminates_idle_conversations(clock):
+    async def run():
+        reaper = ConversationReaper(idle_timeout=10.0, max_duration=None)
+        active, idle = FakeConversation("active"), FakeConversation("idle")
+        reaper.register(active)
+        reaper.register(idle)
+        clock.now += 8
+        reaper.touch("active")
+        clock.now += 4
+        assert reaper.check() == ["idle"]
+        await reaper.stop()
+        clock.now += 7
+        assert reaper.check() == ["active"]
+        await reaper.stop()
+        return reaper, active, idle
+
+    reaper, active, idle = asyncio.run(run())
+    assert active.terminated and idle.terminated
+    assert active.reaper is None
+    assert reaper.stats() == {"active": 0, "paused": 0, "reaped_idle": 2, "reaped_max_duration": 0}
+
+
+def test_paused_conversations_only_hit_the_max_duration(clock):
+    async def run():
+        reaper = ConversationReaper(idle_timeout=10.0, max_duration=30.0)
+        on_hold, resumed = FakeConversation("on_hold"), FakeConversation("resumed")
+        reaper.register(on_hold)
+        reaper.register(resumed)
+        reaper.pause("on_hold")
+        reaper.pause("resumed")
+        clock.now += 15
+        reaper.resume("resumed")  # the idle timeout starts again from here
+        assert reaper.check() == []
+        clock.now += 10
+        assert reaper.check() == ["resumed"]
+        clock.now += 5
+        assert reaper.check() == ["on_hold"]
+        await reaper.stop()
+        return reaper, on_hold
+
+    reaper, on_hold = asyncio.run(run())
+    assert on_hold.terminated
+    assert reaper.stats()["reaped_idle"] == 1
+    assert reaper.stats()["reaped_max_duration"] == 1
+
+
+def test_unregistered_conversations_are_not_reaped(clock):
+    async def run():
+        reaper = ConversationReaper(idle_timeout=10.0)
+        conversation = FakeConversation("gone")
+        reaper.register(conversation)
+        reaper.unregister("gone")
+        clock.now += 60
+        return reaper.check(), conversation
+
+    reaped, conversation = asyncio.run(run())
+    assert reaped == [] and not conversation.terminated
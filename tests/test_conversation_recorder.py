@@ -0,0 +1,100 @@
+import os
+import stat
+
+from audio_format import MULAW, AudioFormat
+from conversation_recorder import (
+    AGENT_TURN,
+    HUMAN_TURN,
+    INPUT_AUDIO,
+    INTERRUPT,
+    OUTPUT_AUDIO,
+    ConversationRecorder,
+    RecordingReader,
+    RecordingWriter,
+    index_path,
+)
+
+INPUT_FORMAT = AudioFormat(8000, MULAW)
+OUTPUT_FORMAT = AudioFormat(16000)
+
+
+def record(directory: str, conversation_id: str = "call", **writer_kwargs):
+    writer = RecordingWriter(directory, **writer_kwargs)
+    recorder = ConversationRecorder(writer, conversation_id, INPUT_FORMAT, OUTPUT_FORMAT)
+    recorder.record_input(b"\1" * 160)
+    recorder.mark_human_turn("hi there")
+    recorder.mark_agent_turn("héllo")
+    recorder.record_output(memoryview(b"\2" * 320))
+    recorder.record_input(b"\3" * 160)
+    recorder.mark_interrupt()
+    recorder.close()
+    writer.stop()
+    return writer
+
+
+def test_write_read_roundtrip(tmp_path):
+    # Small segments so the recording rotates across several files
+    writer = record(str(tmp_path), segment_bytes=256)
+    reader = RecordingReader(str(tmp_path), "call")
+    assert reader.audio(INPUT_AUDIO) == b"\1" * 160 + b"\3" * 160
+    assert reader.audio(OUTPUT_AUDIO) == b"\2" * 320
+    assert [(kind, text) for _, kind, text in reader.markers()] == [
+        (HUMAN_TURN, "hi there"),
+        (AGENT_TURN, "héllo"),
+        (INTERRUPT, ""),
+    ]
+    assert reader.audio_format(INPUT_AUDIO) == INPUT_FORMAT
+    assert reader.audio_format(OUTPUT_AUDIO) == OUTPUT_FORMAT
+    assert reader.metadata["segments"] > 1
+    # Seeking by time skips earlier records
+    last_timestamp = reader.timestamps[-2]
+    assert [kind for _, kind, _ in reader.records(start=last_timestamp)] == [INPUT_AUDIO, INTERRUPT]
+    reader.close()
+    assert writer.stats()["queued_bytes"] == 0
+    assert writer.stats()["bytes_written"] == 640 + len("hi there") + len("héllo".encode("utf-8"))
+
+
+def test_segments_are_scanned_without_an_index(tmp_path):
+    record(str(tmp_path))
+    os.remove(index_path(str(tmp_path), "call"))
+    reader = RecordingReader(str(tmp_path), "call")
+    assert reader.audio(INPUT_AUDIO) == b"\1" * 160 + b"\3" * 160
+    assert len(reader.markers()) == 3
+    reader.close()
+
+
+def test_recording_files_are_owner_only(tmp_path):
+    record(str(tmp_path))
+    for name in os.listdir(tmp_path):
+        assert stat.S_IMODE(os.stat(tmp_path / name).st_mode) & 0o077 == 0
+
+
+def test_conversation_id_cannot_escape_the_directory(tmp_path):
+    directory = tmp_path / "recordings"
+    record(str(directory), conversation_id="../../escaped")
+    assert sorted(os.listdir(tmp_path)) == ["recordings"]
+    reader = RecordingReader(str(directory), "../../escaped")
+    assert reader.audio(OUTPUT_AUDIO) == b"\2" * 320
+    reader.close()
+
+
+def test_audio_is_dropped_and_counted_when_the_queue_is_full(tmp_path):
+    writer = RecordingWriter(str(tmp_path), max_queued_bytes=400)
+    writer.start = lambda: None  # hold the writer thread back so the queue fills up
+    recorder = ConversationRecorder(writer, "call", INPUT_FORMAT, OUTPUT_FORMAT)
+    recorder.record_input(b"\1" * 160)
+    recorder.record_input(b"\1" * 160)
+    recorder.record_input(b"\1" * 160)  # 480 bytes would exceed the budget
+    recorder.mark_human_turn("markers are never dropped")
+    assert recorder.dropped_chunks == 1
+    assert writer.stats()["dropped_bytes"] == 160
+    assert writer.stats()["queued_bytes"] == 320
+
+    recorder.close()
+    RecordingWriter.start(writer)
+    writer.stop()
+    assert writer.stats()["queued_bytes"] == 0
+    reader = RecordingReader(str(tmp_path), "call")
+    assert reader.audio(INPUT_AUDIO) == b"\1" * 320
+    assert reader.markers()[0][2] == "markers are never dropped"
+    reader.close()
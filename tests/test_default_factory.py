@@ -0,0 +1,103 @@
+import asyncio
+
+from audio_format import AudioFormat
+from base_synthesizer import BaseSynthesizer, SynthesizerConfig
+from default_factory import DefaultAgentFactory, config_key
+
+
+class TrackedSynthesizerConfig(SynthesizerConfig):
+    def __init__(self, voice: str = "alloy", **kwargs):
+        super().__init__(**kwargs)
+        self.voice = voice
+
+
+class TrackedSynthesizer(BaseSynthesizer):
+    def __init__(self, synthesizer_config: TrackedSynthesizerConfig):
+        super().__init__(synthesizer_config)
+        self.prewarmed = False
+        self.torn_down = False
+
+    async def prewarm(self):
+        self.prewarmed = True
+
+    async def tear_down(self):
+        self.torn_down = True
+
+
+def create_factory(max_idle_per_config: int = 8) -> DefaultAgentFactory:
+    factory = DefaultAgentFactory(max_idle_per_config)
+    factory.register(TrackedSynthesizerConfig, TrackedSynthesizer)
+    return factory
+
+
+def test_config_key_compares_by_value():
+    assert config_key(TrackedSynthesizerConfig()) == config_key(TrackedSynthesizerConfig())
+    assert config_key(TrackedSynthesizerConfig(voice="echo")) != config_key(TrackedSynthesizerConfig())
+    assert config_key({"b": [1, TrackedSynthesizerConfig()], "a": 2}) == config_key({"a": 2, "b": (1, TrackedSynthesizerConfig())})
+
+
+def test_released_components_are_reused_for_an_equal_config():
+    async def run():
+        factory = create_factory()
+        synthesizer = factory.create_synthesizer(TrackedSynthesizerConfig())
+        assert await factory.release(synthesizer)
+        reused = factory.create_synthesizer(TrackedSynthesizerConfig())
+        other_voice = factory.create_synthesizer(TrackedSynthesizerConfig(voice="echo"))
+        return factory, synthesizer, reused, other_voice
+
+    factory, synthesizer, reused, other_voice = asyncio.run(run())
+    assert reused is synthesizer
+    assert other_voice is not synthesizer
+    assert factory.stats()["total"] == {"hits": 1, "requests": 3, "hit_rate": 1 / 3}
+
+
+def test_release_resets_the_component():
+    async def run():
+        factory = create_factory()
+        config = TrackedSynthesizerConfig()
+        synthesizer = factory.create_synthesizer(config)
+        synthesizer.streaming_conversation = object()
+        synthesizer.set_audio_format(AudioFormat(8000, "mulaw"))  # negotiated for the last call
+        await factory.release(synthesizer)
+        return config, synthesizer
+
+    config, synthesizer = asyncio.run(run())
+    assert synthesizer.streaming_conversation is None
+    assert (synthesizer.synthesizer_config.sampling_rate, synthesizer.synthesizer_config.audio_encoding) == (16000, "linear16")
+    # The pooled component had its own copy of the caller's config
+    assert synthesizer.synthesizer_config is not config
+    assert config.sampling_rate == 16000
+
+
+def test_components_beyond_max_idle_are_closed():
+    async def run():
+        factory = create_factory(max_idle_per_config=1)
+        first = factory.create_synthesizer(TrackedSynthesizerConfig())
+        second = factory.create_synthesizer(TrackedSynthesizerConfig())
+        await factory.release(first)
+        await factory.release(second)
+        not_pooled = TrackedSynthesizer(TrackedSynthesizerConfig())
+        return first, second, await factory.release(not_pooled)
+
+    first, second, released_not_pooled = asyncio.run(run())
+    assert not first.torn_down
+    assert second.torn_down
+    assert not released_not_pooled
+
+
+def test_prefill_prewarms_up_to_max_idle():
+    async def run():
+        factory = create_factory(max_idle_per_config=2)
+        config = TrackedSynthesizerConfig()
+        await factory.prefill(config, 5)
+        pool = factory.get_pool(config)
+        idle = list(pool.idle)
+        acquired = factory.create_synthesizer(config)
+        await factory.close()
+        return pool, idle, acquired
+
+    pool, idle, acquired = asyncio.run(run())
+    assert len(idle) == 2
+    assert all(synthesizer.prewarmed for synthesizer in idle)
+    assert acquired in idle and pool.hits == 1
+    assert pool.idle == [] and all(synthesizer.torn_down for synthesizer in idle if synthesizer is not acquired)
@@ -0,0 +1,90 @@
+import asyncio
+import math
+import struct
+
+import pytest
+
+from base_transcriber import BaseTranscriber, EndpointingConfig, TranscriberConfig
+from groq_transcriber import WhisperTranscriber, WhisperTranscriberConfig
+from provider_routing import RoutingTranscriber
+
+CHUNK_SECONDS = 0.02
+SAMPLES_PER_CHUNK = int(16000 * CHUNK_SECONDS)
+TONE = b"".join(struct.pack("<h", int(3000 * math.sin(i / 5))) for i in range(SAMPLES_PER_CHUNK))
+SILENCE = b"\0" * (SAMPLES_PER_CHUNK * 2)
+
+
+class EchoWhisperTranscriber(WhisperTranscriber):
+    async def transcribe_audio(self, audio: bytes) -> str:
+        return f"{len(audio)} bytes"
+
+
+class EchoBackend(BaseTranscriber):
+    async def process(self, audio_chunk: bytes):
+        return None
+
+    async def transcribe_audio(self, audio: bytes) -> str:
+        return f"{len(audio)} bytes"
+
+
+def create_whisper(endpointing_config):
+    return EchoWhisperTranscriber(WhisperTranscriberConfig(api_key="fake", endpointing_config=endpointing_config))
+
+
+def create_routing(endpointing_config):
+    config = TranscriberConfig(endpointing_config=endpointing_config)
+    return RoutingTranscriber(config, {"echo": EchoBackend(TranscriberConfig())})
+
+
+async def feed(transcriber, chunks):
+    """Results per chunk fed, as (index, message)."""
+    results = []
+    for i, chunk in enumerate(chunks):
+        result = await transcriber.process(chunk)
+        if result:
+            results.append((i, result["message"]))
+    return results
+
+
+@pytest.mark.parametrize("create_transcriber", [create_whisper, create_routing])
+def test_endpoints_once_after_min_silence_duration(create_transcriber):
+    transcriber = create_transcriber(EndpointingConfig(min_speech_duration=0.1, min_silence_duration=0.3))
+    leading, speech, pause, trailing = 10, 25, 5, 25
+    # Leading silence, speech with a short pause in it (shorter than min_silence_duration), then silence
+    chunks = [SILENCE] * leading + [TONE] * speech + [SILENCE] * pause + [TONE] * speech + [SILENCE] * trailing
+
+    async def run():
+        await transcriber.start()
+        return await feed(transcriber, chunks)
+
+    results = asyncio.run(run())
+    assert len(results) == 1
+    index, message = results[0]
+    silence_chunks = round(0.3 / CHUNK_SECONDS)
+    assert index == leading + 2 * speech + pause + silence_chunks - 1
+    # Leading silence was dropped but for the chunk just before speech; then the utterance and the silence that ended it
+    assert message == f"{(1 + 2 * speech + pause + silence_chunks) * len(TONE)} bytes"
+    assert transcriber.speech_duration == 0.0 and transcriber.time_silent == 0.0
+
+
+@pytest.mark.parametrize("create_transcriber", [create_whisper, create_routing])
+def test_silence_alone_never_endpoints(create_transcriber):
+    transcriber = create_transcriber(EndpointingConfig(min_speech_duration=0.1, min_silence_duration=0.3))
+
+    async def run():
+        await transcriber.start()
+        return await feed(transcriber, [SILENCE] * 100)
+
+    assert asyncio.run(run()) == []
+    assert len(transcriber.audio_buffer) <= len(SILENCE)  # only the most recent chunk is kept
+
+
+@pytest.mark.parametrize("create_transcriber", [create_whisper, create_routing])
+def test_speech_shorter_than_min_speech_duration_is_not_an_utterance(create_transcriber):
+    transcriber = create_transcriber(EndpointingConfig(min_speech_duration=0.2, min_silence_duration=0.1))
+
+    async def run():
+        await transcriber.start()
+        return await feed(transcriber, [TONE] * 3 + [SILENCE] * 20)
+
+    assert asyncio.run(run()) == []
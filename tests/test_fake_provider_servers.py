@@ -0,0 +1,36 @@
+import asyncio
+
+import aiohttp
+
+from fake_provider_servers import FakeProviderConfig, FakeProviderServers, start_fake_provider_servers_process
+
+
+async def request_speech(servers: FakeProviderServers):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(servers.lemonfox_url, json={"text": "hello"}) as response:
+            assert response.status == 200
+            await response.read()
+
+
+def test_counts_requests_in_process():
+    async def run():
+        async with FakeProviderServers(FakeProviderConfig()) as servers:
+            assert servers.port != 0
+            await request_speech(servers)
+            return await servers.fetch_request_counts()
+
+    assert asyncio.run(run())["tts"] == 1
+
+
+def test_counts_requests_served_by_a_child_process():
+    process, servers = start_fake_provider_servers_process(FakeProviderConfig())
+    try:
+        async def run():
+            await request_speech(servers)
+            await request_speech(servers)
+            return await servers.fetch_request_counts()
+
+        assert asyncio.run(run()) == {"transcriptions": 0, "chat_completions": 0, "tts": 2}
+    finally:
+        process.terminate()
+        process.join()
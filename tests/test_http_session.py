@@ -0,0 +1,86 @@
+import asyncio
+import socket
+
+from aiohttp import web
+
+from http_session import KeepAliveSession
+from startup_profiler import StartupProfiler, profile_import
+
+
+async def start_peer_recording_server(peers):
+    async def handle(request):
+        peers.append(request.transport.get_extra_info("peername"))
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_route("*", "/", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}/"
+
+
+def test_requests_share_one_connection():
+    async def run():
+        peers = []
+        runner, url = await start_peer_recording_server(peers)
+        session = KeepAliveSession()
+        try:
+            assert session.get() is session.get()
+            assert await session.prewarm(url)
+            for _ in range(2):
+                async with session.get().get(url) as response:
+                    await response.read()
+        finally:
+            await session.close()
+            await runner.cleanup()
+        return peers
+
+    peers = asyncio.run(run())
+    assert len(peers) == 3
+    assert len(set(peers)) == 1  # the prewarmed connection was reused
+
+
+def test_closed_session_is_recreated():
+    async def run():
+        session = KeepAliveSession()
+        first = session.get()
+        await session.close()
+        second = session.get()
+        await session.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.closed and first is not second
+
+
+def test_prewarm_reports_connection_failures():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+
+    async def run():
+        session = KeepAliveSession()
+        try:
+            return await session.prewarm(f"http://127.0.0.1:{port}/")
+        finally:
+            await session.close()
+
+    assert asyncio.run(run()) is False
+
+
+def test_profiler_keeps_the_first_occurrence_of_each_milestone():
+    profiler = StartupProfiler()
+    profiler.mark("second")
+    first_seen = profiler.milestones["second"]
+    profiler.mark("second")
+    profiler.milestones["first"] = -1.0
+    assert profiler.milestones["second"] == first_seen
+    assert list(profiler.report()) == ["first", "second"]
+
+
+def test_importing_the_session_module_does_not_import_aiohttp():
+    report = profile_import("http_session")
+    assert "error" not in report
+    assert report["imports_backend_clients"] == []
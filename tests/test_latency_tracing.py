@@ -0,0 +1,92 @@
+import asyncio
+import random
+import threading
+
+import pytest
+
+from base_synthesizer import SynthesisResult
+from latency_tracing import (
+    ENDPOINT_DETECTED,
+    FIRST_AUDIO_PLAYED,
+    TRANSCRIPT_RETURNED,
+    TURN_COMPLETE,
+    TURN_TOTAL,
+    LatencyHistogram,
+    LatencyTracer,
+    get_latency_tracer,
+)
+from lemonfox_synthesizer import LemonFoxSynthesizer, LemonFoxSynthesizerConfig
+from replay_benchmark import NullOutputDevice
+from streaming_conversation import StreamingConversation
+
+
+@pytest.mark.parametrize("quantile", [0.5, 0.9, 0.95, 0.99])
+def test_percentiles_are_within_the_histogram_precision(quantile):
+    rng = random.Random(1)
+    values = sorted(int(rng.lognormvariate(10, 1.5)) for _ in range(10000))
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    exact = values[int(round(quantile * len(values))) - 1]
+    # 7 sub-bucket bits keep values to within 1/64
+    assert histogram.percentile(quantile) == pytest.approx(exact, rel=1 / 64)
+
+
+def test_small_values_are_exact_and_extremes_are_kept():
+    histogram = LatencyHistogram()
+    for value in [3, 1, 2, -5]:
+        histogram.record(value)
+    assert histogram.percentile(0.5) == 1
+    assert histogram.percentile(1.0) == 3
+    assert histogram.max_value == 3
+    assert LatencyHistogram().percentile(0.99) == 0
+
+
+def test_merge_matches_recording_into_one_histogram():
+    rng = random.Random(2)
+    values = [rng.randint(0, 10_000_000) for _ in range(2000)]
+    combined, first, second = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i, value in enumerate(values):
+        combined.record(value)
+        (first if i % 2 else second).record(value)
+    first.merge(second)
+    assert first.counts == combined.counts
+    assert (first.total_count, first.total_sum, first.max_value) == (combined.total_count, combined.total_sum, combined.max_value)
+
+
+def test_stages_are_timed_from_the_closest_earlier_stage(monkeypatch):
+    clock = iter([0, 1_000_000, 5_000_000, 6_000_000])
+    monkeypatch.setattr("latency_tracing.time.perf_counter_ns", lambda: next(clock))
+    tracer = LatencyTracer()
+    tracer.mark("call", ENDPOINT_DETECTED)
+    tracer.mark("call", TRANSCRIPT_RETURNED)  # 1ms
+    tracer.mark("call", FIRST_AUDIO_PLAYED)  # 4ms after the transcript
+    tracer.mark("call", TURN_COMPLETE)  # 1ms later, 6ms in total
+    summary = tracer.summary()
+    assert summary[TRANSCRIPT_RETURNED]["max_ms"] == pytest.approx(1.0, rel=0.02)
+    assert summary[FIRST_AUDIO_PLAYED]["max_ms"] == pytest.approx(4.0, rel=0.02)
+    assert summary[TURN_TOTAL]["max_ms"] == pytest.approx(6.0, rel=0.02)
+
+
+def test_first_audio_is_marked_when_it_starts_playing():
+    """Audio queued behind the previous utterance counts as played once that one has finished."""
+
+    async def run():
+        tracer = get_latency_tracer()
+        tracer.reset()
+        synthesizer = LemonFoxSynthesizer(LemonFoxSynthesizerConfig(api_key="fake"))
+        conversation = StreamingConversation(NullOutputDevice(), None, None, synthesizer)
+
+        def one_second_of_audio():
+            async def chunks():
+                yield SynthesisResult.ChunkResult(b"\0" * synthesizer.get_byte_rate(), True)
+
+            return SynthesisResult(chunks(), lambda seconds: "")
+
+        await conversation.send_speech_to_output("first", one_second_of_audio(), threading.Event())
+        tracer.mark(conversation.id, ENDPOINT_DETECTED)
+        await conversation.send_speech_to_output("second", one_second_of_audio(), threading.Event())
+        return tracer.summary()[FIRST_AUDIO_PLAYED]
+
+    first_audio = asyncio.run(run())
+    assert first_audio["max_ms"] == pytest.approx(1000, abs=50)
@@ -0,0 +1,94 @@
+import asyncio
+import math
+import struct
+import threading
+
+from audio_format import AudioFormat
+from base_synthesizer import PauseAligner, SynthesisResult, TextAlignmentIndex, sentence_spans
+from lemonfox_synthesizer import LemonFoxSynthesizer, LemonFoxSynthesizerConfig
+from replay_benchmark import NullOutputDevice
+from streaming_conversation import StreamingConversation
+
+BYTE_RATE = 32000  # 16kHz linear16
+
+
+def tone(seconds: float) -> bytes:
+    return b"".join(struct.pack("<h", int(3000 * math.sin(i / 5))) for i in range(int(seconds * 16000)))
+
+
+def silence(seconds: float) -> bytes:
+    return b"\0" * (int(seconds * 16000) * 2)
+
+
+class RecordingAgent:
+    def __init__(self):
+        self.cut_off_message = None
+
+    def update_last_bot_message_on_cut_off(self, message: str):
+        self.cut_off_message = message
+
+
+def test_sentence_spans_skip_abbreviations_and_initials():
+    message = "Ask Dr. Smith or J. Doe. Then call e.g. tomorrow! Fine? yes."
+    sentences = [message[start:end].strip() for start, end in sentence_spans(message)]
+    assert sentences == ["Ask Dr. Smith or J. Doe.", "Then call e.g. tomorrow!", "Fine? yes."]
+
+
+def test_pause_aligner_maps_sentence_ends_to_pauses():
+    message = "One two three. Four five six seven eight nine. Ten eleven."
+    audio = tone(0.9) + silence(0.1) + tone(0.5) + silence(0.4) + tone(2.5) + silence(0.45) + tone(0.8)
+    alignment = TextAlignmentIndex(message, BYTE_RATE / 15)
+    aligner = PauseAligner(alignment, AudioFormat(16000))
+    for offset in range(0, len(audio), 4000):
+        aligner.feed(audio[offset:offset + 4000])
+    aligner.finish()
+
+    # The short pause inside the first sentence is not a sentence end
+    assert alignment.text_offsets == [0, 15, 47, len(message)]
+    assert alignment.audio_offsets[1:3] == [int(1.5 * BYTE_RATE), int(4.4 * BYTE_RATE)]
+    assert alignment.message_up_to(int(1.6 * BYTE_RATE)) == "One two three."
+
+
+def create_conversation():
+    synthesizer = LemonFoxSynthesizer(LemonFoxSynthesizerConfig(api_key="fake"))
+    return StreamingConversation(NullOutputDevice(), None, RecordingAgent(), synthesizer)
+
+
+def create_synthesis_result(synthesizer, message: str, seconds: float) -> SynthesisResult:
+    alignment = synthesizer.create_alignment_index(message)
+    alignment.add(int(seconds * BYTE_RATE), len(message))
+
+    async def chunks():
+        for _ in range(int(seconds * 4)):
+            yield SynthesisResult.ChunkResult(silence(0.25), False)
+
+    return SynthesisResult(chunks(), lambda s: synthesizer.get_message_cutoff_from_alignment(alignment, s), alignment)
+
+
+def test_interrupt_after_synthesis_cuts_at_playback_position():
+    async def run():
+        conversation = create_conversation()
+        message = "one two three four five six seven eight"
+        synthesis_result = create_synthesis_result(conversation.synthesizer, message, 2.0)
+        stop_event = threading.Event()
+        # All the audio is handed to the output device long before it has played
+        assert await conversation.send_speech_to_output(message, synthesis_result, stop_event) == (True, False)
+        await asyncio.sleep(0.5)
+        assert await conversation.broadcast_interrupt()
+        return conversation.agent.cut_off_message, stop_event.is_set()
+
+    cut_off_message, stopped = asyncio.run(run())
+    assert stopped
+    assert cut_off_message == "one two"  # a quarter of the way through, not all of it
+
+
+def test_utterance_is_not_interruptible_once_played():
+    async def run():
+        conversation = create_conversation()
+        message = "short reply"
+        synthesis_result = create_synthesis_result(conversation.synthesizer, message, 0.25)
+        await conversation.send_speech_to_output(message, synthesis_result, threading.Event())
+        await asyncio.sleep(0.35)
+        return conversation.interruptible_events.qsize(), await conversation.broadcast_interrupt(), conversation.agent.cut_off_message
+
+    assert asyncio.run(run()) == (0, False, None)
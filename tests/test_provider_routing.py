@@ -0,0 +1,97 @@
+import asyncio
+
+from base_synthesizer import BaseSynthesizer, SynthesisResult, SynthesizerConfig
+from provider_routing import CLOSED, HALF_OPEN, OPEN, RoutingSynthesizer
+
+
+class SlowSynthesizer(BaseSynthesizer):
+    """Yields an empty keep-alive chunk, then audio after `delay` seconds."""
+
+    def __init__(self, delay: float = 10.0):
+        super().__init__(SynthesizerConfig())
+        self.delay = delay
+
+    async def create_speech(self, message: str, chunk_size: int) -> SynthesisResult:
+        async def chunks():
+            yield SynthesisResult.ChunkResult(b"", False)
+            await asyncio.sleep(self.delay)
+            yield SynthesisResult.ChunkResult(b"\0" * 320, True)
+
+        return SynthesisResult(chunks(), lambda seconds: message)
+
+
+def create_half_open_router(delay: float = 10.0):
+    synthesizer = RoutingSynthesizer(SynthesizerConfig(), {"slow": SlowSynthesizer(delay)})
+    health = synthesizer.router.health["slow"]
+    health.state = HALF_OPEN
+    return synthesizer, health
+
+
+def test_closing_before_first_audio_releases_the_probe():
+    async def run():
+        synthesizer, health = create_half_open_router()
+        synthesis_result = await synthesizer.create_speech("hello", 320)
+        assert health.probe_in_flight
+        await synthesis_result.chunk_generator.__anext__()  # the empty chunk
+        await synthesis_result.chunk_generator.aclose()
+        return health
+
+    health = asyncio.run(run())
+    assert not health.probe_in_flight
+    assert health.state == HALF_OPEN
+    assert health.is_available()
+
+
+def test_cancelling_before_first_audio_releases_the_probe():
+    async def run():
+        synthesizer, health = create_half_open_router()
+        synthesis_result = await synthesizer.create_speech("hello", 320)
+
+        async def consume():
+            async for _ in synthesis_result.chunk_generator:
+                pass
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return health
+
+    health = asyncio.run(run())
+    assert not health.probe_in_flight
+    assert health.is_available()
+
+
+def test_first_audio_closes_the_breaker():
+    async def run():
+        synthesizer, health = create_half_open_router(delay=0.0)
+        synthesis_result = await synthesizer.create_speech("hello", 320)
+        async for _ in synthesis_result.chunk_generator:
+            pass
+        return health
+
+    health = asyncio.run(run())
+    assert health.state == CLOSED
+    assert not health.probe_in_flight
+
+
+def test_no_audio_reopens_the_breaker():
+    class SilentSynthesizer(BaseSynthesizer):
+        async def create_speech(self, message, chunk_size):
+            async def chunks():
+                yield SynthesisResult.ChunkResult(b"", True)
+
+            return SynthesisResult(chunks(), lambda seconds: message)
+
+    async def run():
+        synthesizer = RoutingSynthesizer(SynthesizerConfig(), {"silent": SilentSynthesizer(SynthesizerConfig())})
+        health = synthesizer.router.health["silent"]
+        health.state = HALF_OPEN
+        synthesis_result = await synthesizer.create_speech("hello", 320)
+        async for _ in synthesis_result.chunk_generator:
+            pass
+        return health
+
+    health = asyncio.run(run())
+    assert health.state == OPEN
+    assert not health.probe_in_flight
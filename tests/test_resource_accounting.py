@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+from resource_accounting import OK, SOFT_LIMIT, ConversationResourceAccount, ResourceLimits
+
+
+class FakeTranscriber:
+    def __init__(self, sampling_rate: int = 16000):
+        self.config = SimpleNamespace(sampling_rate=sampling_rate)
+        self.audio_buffer = bytearray()
+        self.buffer_duration = 0.0
+        self.force_endpoint = False
+
+    def get_byte_rate(self) -> int:
+        return self.config.sampling_rate * 2
+
+
+def create_account(messages=None, **limits):
+    agent = SimpleNamespace(messages=messages if messages is not None else [{"role": "system", "content": "system"}])
+    conversation = SimpleNamespace(id="test", agent=agent, transcriber=FakeTranscriber())
+    return ConversationResourceAccount(conversation, ResourceLimits(**limits)), conversation
+
+
+def test_history_bytes_follow_edits_and_pops():
+    account, conversation = create_account()
+    messages = conversation.agent.messages
+    messages.append({"role": "assistant", "content": "hello there"})
+    assert account.agent_history_bytes() == len("system") + len("hello there")
+    # The agent trims an interrupted reply in place
+    messages[-1]["content"] = "hello-"
+    assert account.agent_history_bytes() == len("system") + len("hello-")
+    # ...or pops it, and a new message of the same length takes its place
+    messages.pop()
+    messages.append({"role": "user", "content": "x"})
+    assert account.agent_history_bytes() == len("system") + 1
+
+
+def test_history_is_measured_in_utf8_bytes():
+    account, _ = create_account([{"role": "user", "content": "héllo 👋"}])
+    assert account.agent_history_bytes() == len("héllo 👋".encode("utf-8")) == 11
+
+
+def test_soft_limit_forces_endpoint_when_audio_holds_the_memory():
+    account, conversation = create_account(soft_limit_bytes=1000, hard_limit_bytes=100000)
+    conversation.transcriber.audio_buffer.extend(b"\0" * 2000)
+    assert account.enforce() == SOFT_LIMIT
+    assert conversation.transcriber.force_endpoint
+    conversation.transcriber.audio_buffer.clear()
+    assert account.enforce() == OK
+    assert account.soft_limit_hits == 1
+
+
+def test_hard_limit_truncates_history_and_audio_on_a_sample_boundary():
+    messages = [{"role": "system", "content": "system"}]
+    messages += [{"role": "user", "content": "x" * 100} for _ in range(10)]
+    account, conversation = create_account(messages, soft_limit_bytes=500, hard_limit_bytes=1001, min_history_messages=2)
+    transcriber = conversation.transcriber
+    transcriber.audio_buffer.extend(b"\1\2" * 500 + b"\1")
+    account.enforce()
+    assert len(conversation.agent.messages) == 3
+    assert conversation.agent.messages[0]["content"] == "system"
+    # Half the buffer is dropped, rounded down to whole samples so the rest stays aligned
+    assert len(transcriber.audio_buffer) == 501
+    assert transcriber.audio_buffer[:2] == b"\1\2"
+    assert transcriber.buffer_duration == 501 / 32000
+    assert account.hard_limit_hits == 1
+    assert account.status == SOFT_LIMIT